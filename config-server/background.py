@@ -0,0 +1,115 @@
+"""
+config-server 프로세스 안에서 도는 주기 작업(background thread) 관리.
+
+gunicorn worker마다 main.start_background_workers()가 호출되므로, 클러스터 전체에서 한 번만
+실행되어야 하는 작업(leader=True)은 Redis lease(SET NX EX)를 잡은 worker에서만 실행한다.
+reconcile_krb5.py처럼 main을 import만 하는 스크립트에서는 thread가 시작되지 않는다.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+
+from redis_client import r
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# lease 소유자일 때만 만료 시간을 연장한다 (GET 후 EXPIRE 사이에 다른 worker가 잡는 경우 방지)
+_RENEW_LEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_tasks_guard = threading.Lock()
+_tasks = {}
+
+
+def _lease_key(name: str) -> str:
+    return f"bg_leader:{name}"
+
+
+def hold_leader_lease(name: str, ttl_sec: int) -> bool:
+    """lease를 새로 잡거나 이미 가진 lease를 연장한다. Redis 장애 시 False."""
+    key = _lease_key(name)
+    try:
+        if r.set(key, WORKER_ID, nx=True, ex=ttl_sec):
+            return True
+        return bool(r.eval(_RENEW_LEASE_LUA, 1, key, WORKER_ID, ttl_sec))
+    except Exception:
+        return False
+
+
+def get_leader(name: str):
+    try:
+        return r.get(_lease_key(name))
+    except Exception:
+        return None
+
+
+def _task_loop(flask_app, name, interval_sec, fn, leader, wakeup):
+    ttl_sec = max(int(interval_sec * 3), 30)
+    while True:
+        wakeup.wait(interval_sec)
+        wakeup.clear()
+        if leader and not hold_leader_lease(name, ttl_sec):
+            continue
+        started = time.time()
+        try:
+            with flask_app.app_context():
+                fn()
+        except Exception:
+            flask_app.logger.exception(f"[BG] task {name} failed")
+        else:
+            flask_app.logger.debug(f"[BG] task {name} done in {time.time() - started:.2f}s")
+        if leader:
+            hold_leader_lease(name, ttl_sec)
+
+
+def start_periodic_task(flask_app, name: str, interval_sec: float, fn, leader: bool = False) -> None:
+    """fn을 interval_sec마다 app context 안에서 실행하는 daemon thread를 시작한다 (같은 이름은 한 번만)."""
+    with _tasks_guard:
+        if name in _tasks:
+            return
+        wakeup = threading.Event()
+        thread = threading.Thread(
+            target=_task_loop,
+            args=(flask_app, name, interval_sec, fn, leader, wakeup),
+            name=f"bg-{name}",
+            daemon=True,
+        )
+        _tasks[name] = wakeup
+        thread.start()
+    flask_app.logger.info(f"[BG] started task {name} interval={interval_sec}s leader={leader} worker={WORKER_ID}")
+
+
+def _worker_loop(flask_app, name, fn):
+    while True:
+        try:
+            with flask_app.app_context():
+                fn()
+        except Exception:
+            flask_app.logger.exception(f"[BG] worker {name} failed")
+            time.sleep(1)  # Redis 장애 등으로 연속 실패할 때 busy loop 방지
+
+
+def start_worker_thread(flask_app, name: str, fn) -> None:
+    """fn을 쉬지 않고 반복 호출하는 daemon thread를 시작한다 (queue consumer처럼 fn 안에서 block하는 용도)."""
+    with _tasks_guard:
+        if name in _tasks:
+            return
+        thread = threading.Thread(target=_worker_loop, args=(flask_app, name, fn), name=f"bg-{name}", daemon=True)
+        _tasks[name] = None
+        thread.start()
+    flask_app.logger.info(f"[BG] started worker {name} worker={WORKER_ID}")
+
+
+def wake_task(name: str) -> bool:
+    """이 프로세스에서 도는 주기 작업을 다음 interval을 기다리지 않고 바로 실행시킨다."""
+    wakeup = _tasks.get(name)
+    if wakeup is None:
+        return False
+    wakeup.set()
+    return True
@@ -1,13 +1,7 @@
-import os
 import json
-import redis
 from datetime import datetime
 
-REDIS_HOST = os.getenv("REDIS_HOST", "redis-bg-master.ailab-infra.svc.cluster.local")
-REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
-REDIS_DB = int(os.getenv("REDIS_DB", "0"))
-
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+from redis_client import r
 
 # ----------------------------
 # 이미지 메타데이터 관리
@@ -0,0 +1,163 @@
+"""
+비동기 Pod 삭제(teardown) job queue.
+
+/delete-pod가 async 모드로 호출되면 job을 Redis queue에 넣고 tracking_id를 바로 돌려준다.
+각 gunicorn worker의 consumer thread가 queue에서 job을 꺼내 teardown을 수행하고,
+실패하면 지수 backoff로 재시도한다.
+
+- queue(delete_jobs:queue) → processing(delete_jobs:processing): BLMOVE로 한 consumer만 가져간다.
+- 가져간 job에는 lease(lease_until)를 걸고, lease가 지난 processing job은 worker가 죽은 것으로 보고
+  requeue_expired()가 queue로 되돌린다. BLMOVE와 lease 기록 사이에 되돌리지 않도록 두 주기 연속으로
+  같은 시도 횟수에서 만료일 때만 되돌린다.
+- 재시도 대기 job은 delete_jobs:delayed sorted set(score=다시 실행할 시각)에 두었다가 promote_due()가 queue로 옮긴다.
+- job 상태는 delete_job:<tracking_id>에 JSON으로 남고, pod_status와 같이 1시간 뒤 만료된다.
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from redis_client import r
+
+JOB_TTL_SEC = 3600  # 완료/실패 후에도 조회 가능하도록 1시간 유지
+
+QUEUE_KEY = "delete_jobs:queue"
+PROCESSING_KEY = "delete_jobs:processing"
+DELAYED_KEY = "delete_jobs:delayed"
+EXPIRING_KEY = "delete_jobs:expiring"  # {tracking_id: 직전 requeue_expired()에서 lease 만료로 본 시도 횟수}
+
+TERMINAL_STAGES = ("deleted", "failed")
+
+
+def _job_key(tracking_id: str) -> str:
+    return f"delete_job:{tracking_id}"
+
+
+def _pod_key(pod_name: str) -> str:
+    return f"delete_job_by_pod:{pod_name}"
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def get_job(tracking_id: str) -> Optional[dict]:
+    raw = r.get(_job_key(tracking_id))
+    if raw is None:
+        return None
+    return json.loads(raw)
+
+
+def update_job(tracking_id: str, **fields) -> dict:
+    job = get_job(tracking_id) or {"tracking_id": tracking_id}
+    job.update(fields)
+    job["updated_at"] = _now_iso()
+    r.set(_job_key(tracking_id), json.dumps(job), ex=JOB_TTL_SEC)
+    return job
+
+
+def is_pending(pod_name: str) -> bool:
+    """pod_name의 삭제 job이 아직 끝나지 않았는지."""
+    tracking_id = r.get(_pod_key(pod_name))
+    if tracking_id is None:
+        return False
+    return (get_job(tracking_id) or {}).get("stage") not in TERMINAL_STAGES
+
+
+def enqueue(pod_name: str) -> tuple:
+    """
+    pod_name 삭제 job을 queue에 넣는다. 같은 Pod의 job이 이미 진행 중이면 그 job을 돌려준다.
+
+    Returns:
+        (tracking_id, created)
+    """
+    tracking_id = uuid.uuid4().hex
+    if not r.set(_pod_key(pod_name), tracking_id, nx=True, ex=JOB_TTL_SEC):
+        existing = r.get(_pod_key(pod_name))
+        if existing and (get_job(existing) or {}).get("stage") not in TERMINAL_STAGES:
+            return existing, False
+        r.set(_pod_key(pod_name), tracking_id, ex=JOB_TTL_SEC)
+
+    update_job(
+        tracking_id,
+        pod_name=pod_name,
+        stage="queued",
+        message="삭제 대기 중",
+        attempts=0,
+        created_at=_now_iso(),
+    )
+    r.lpush(QUEUE_KEY, tracking_id)
+    return tracking_id, True
+
+
+def claim_next(timeout_sec: float, lease_sec: int) -> Optional[dict]:
+    """queue에서 job 하나를 processing으로 옮기고 lease를 건다. timeout_sec 안에 없으면 None."""
+    tracking_id = r.blmove(QUEUE_KEY, PROCESSING_KEY, timeout_sec, "RIGHT", "LEFT")
+    if tracking_id is None:
+        return None
+    job = get_job(tracking_id)
+    if job is None:
+        # 상태가 만료된 job은 더 진행할 수 없다.
+        r.lrem(PROCESSING_KEY, 0, tracking_id)
+        return None
+    return update_job(
+        tracking_id,
+        attempts=int(job.get("attempts", 0)) + 1,
+        lease_until=time.time() + lease_sec,
+    )
+
+
+def finish(tracking_id: str, pod_name: str) -> None:
+    r.lrem(PROCESSING_KEY, 0, tracking_id)
+    if r.get(_pod_key(pod_name)) == tracking_id:
+        r.delete(_pod_key(pod_name))
+
+
+def schedule_retry(tracking_id: str, delay_sec: float) -> None:
+    pipe = r.pipeline()
+    pipe.lrem(PROCESSING_KEY, 0, tracking_id)
+    pipe.zadd(DELAYED_KEY, {tracking_id: time.time() + delay_sec})
+    pipe.execute()
+
+
+def promote_due() -> int:
+    """재시도 시각이 된 job을 queue로 옮긴다."""
+    moved = 0
+    for tracking_id in r.zrangebyscore(DELAYED_KEY, "-inf", time.time()):
+        # ZREM이 1을 돌려준 호출만 옮겨서 중복 enqueue를 막는다.
+        if r.zrem(DELAYED_KEY, tracking_id):
+            r.lpush(QUEUE_KEY, tracking_id)
+            moved += 1
+    return moved
+
+
+def requeue_expired() -> int:
+    """
+    lease가 지난 processing job(처리하던 worker가 죽은 경우)을 queue로 되돌린다.
+
+    claim_next()는 BLMOVE 뒤에 lease를 쓰므로, 막 옮겨진 job은 잠깐 이전 시도의 lease(또는 lease 없음)로 보인다.
+    그래서 처음 만료로 본 job은 EXPIRING_KEY에 시도 횟수와 함께 표시만 하고, 다음 호출에서도 같은 시도 횟수로
+    만료일 때 되돌린다. 그 사이에 claim된 job은 attempts가 늘고 새 lease가 걸려 있어 건너뛴다.
+    """
+    moved = 0
+    now = time.time()
+    seen = r.hgetall(EXPIRING_KEY)
+    expiring = {}
+    for tracking_id in r.lrange(PROCESSING_KEY, 0, -1):
+        job = get_job(tracking_id)
+        if job is not None and float(job.get("lease_until") or 0) > now:
+            continue
+        attempts = str((job or {}).get("attempts", 0))
+        if seen.get(tracking_id) != attempts:
+            expiring[tracking_id] = attempts
+            continue
+        if r.lrem(PROCESSING_KEY, 1, tracking_id) and job is not None:
+            r.lpush(QUEUE_KEY, tracking_id)
+            moved += 1
+    pipe = r.pipeline()
+    pipe.delete(EXPIRING_KEY)
+    if expiring:
+        pipe.hset(EXPIRING_KEY, mapping=expiring)
+    pipe.execute()
+    return moved
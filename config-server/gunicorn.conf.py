@@ -0,0 +1,54 @@
+import os
+import shutil
+import time
+
+bind = "0.0.0.0:8000"
+workers = 4
+# /pods/<username>/status/stream(SSE)이 연결마다 요청 처리 단위를 오래 붙잡으므로 thread worker를 쓴다.
+worker_class = "gthread"
+threads = 16
+timeout = 700
+
+
+def on_starting(server):
+    # 이전 실행이 남긴 multiprocess metrics 파일이 섞이지 않도록 master 시작 시 비운다.
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+    # schema migration은 worker fork 전에 master에서 한 번만 실행한다.
+    # 코드가 기대는 column/table(lease_state, gpu_device_allocations 등)이 없으면 요청마다 실패하므로
+    # migration이 실패하면 서버를 띄우지 않는다. 다만 MySQL이 잠깐 내려간 동안 모든 replica가 crash loop에
+    # 빠지지 않도록 MIGRATION_RETRY_SEC 동안은 backoff하며 다시 시도한다. 기존 중복 행 때문에 UNIQUE key만
+    # 못 붙인 경우는 migrations가 그 버전을 기록하지 않고 계속 진행한다 (다음 시작 때 다시 시도).
+    import migrations
+    retry_sec = float(os.environ.get("MIGRATION_RETRY_SEC", "120"))
+    deadline = time.monotonic() + retry_sec
+    delay = 2.0
+    while True:
+        try:
+            applied = migrations.run_migrations()
+            break
+        except Exception:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                server.log.exception("schema migration failed, refusing to start")
+                raise
+            server.log.warning(f"schema migration failed, retrying in {min(delay, remaining):.0f}s", exc_info=True)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 30.0)
+    server.log.info(f"schema migrations applied: {applied or 'none'}")
+
+
+def post_worker_init(worker):
+    # 주기 작업 thread는 fork 이후 각 worker 안에서 시작해야 한다.
+    from main import start_background_workers
+    start_background_workers()
+
+
+def child_exit(server, worker):
+    # 죽은 worker의 livesum gauge 값이 /metrics 합계에 남지 않게 한다.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,247 @@
+"""
+GPU idle reaper.
+
+/create-pod로 만든 Pod는 /delete-pod를 부르기 전까지 GPU를 잡고 있으므로, 버려진 세션을 찾아 회수한다.
+leader worker의 주기 작업(run_idle_reaper)이 다음을 수행한다.
+
+1. GPU를 쓰는 사용자 Pod(standby 제외, idle-reaper=exempt 라벨 제외)마다 최근 IDLE_REAPER_IDLE_SEC 동안의
+   - 할당된 GPU index(/dev/nvidiaN hostPath)의 DCGM_FI_DEV_GPU_UTIL 최댓값. dcgm-exporter device 라벨(nvidiaN)로
+     GPU를 구분하고, 노드마다 node score와 같은 Prometheus(prom_url_for)에 조회한다.
+   - cAdvisor container_cpu_usage_seconds_total 평균 사용 core 수 (PROM_URL에 한 번)
+   를 조회한다. 둘 다 임계값 미만이면 idle이다. metric이 없으면 idle로 보지 않는다.
+2. 처음 idle로 보인 Pod에는 경고(Pod Warning event + 선택적 IDLE_REAPER_WARN_CMD exec)를 남긴다.
+3. 경고 후 IDLE_REAPER_GRACE_SEC가 지나도록 계속 idle이면 commit_and_save_user_image()로 이미지를 저장한 뒤
+   비동기 삭제 job(delete_jobs)으로 teardown한다. 이미지 저장이 실패하면 회수하지 않고 다음 주기에 다시 시도한다.
+4. 회수한 Pod 수와 GPU-hours(GPU 수 × idle로 붙잡고 있던 시간)를 Redis에 누적한다.
+"""
+import json
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Tuple
+
+import requests
+from flask import current_app as app
+from kubernetes import client
+
+import delete_jobs
+from metrics import track_outbound
+from pipeline import map_bounded
+from redis_client import r
+from utils import commit_and_save_user_image, exec_in_pod, is_pod_ready, load_k8s, prom_url_for, query_gpu_util_max
+
+EXEMPT_LABEL = "idle-reaper"  # idle-reaper=exempt 라벨이 붙은 Pod는 회수하지 않는다
+WARNED_ANNOTATION = "ailab.dgu/idle-warned-at"
+
+_WARNED_KEY = "idle_reaper:warned"  # hash {pod_name: 경고 시각(epoch)}
+_STATS_KEY = "idle_reaper:stats"
+_EVENTS_KEY = "idle_reaper:events"
+_EVENTS_MAX = 500
+
+_GPU_DEVICE_RE = re.compile(r"^/dev/nvidia(\d+)$")
+
+
+def pod_gpu_indices(pod) -> Tuple[int, ...]:
+    """Pod가 hostPath로 mount한 /dev/nvidiaN의 N 목록."""
+    indices = []
+    for vol in pod.spec.volumes or []:
+        if vol.host_path is None:
+            continue
+        m = _GPU_DEVICE_RE.match(vol.host_path.path or "")
+        if m:
+            indices.append(int(m.group(1)))
+    return tuple(sorted(indices))
+
+
+def _gpu_util_max(nodes: Iterable[str], window_sec: int) -> Dict[Tuple[str, int], float]:
+    """
+    {(node, gpu index): window 동안의 GPU util 최댓값}. 노드마다 prom_url_for(node)에 동시에 조회한다.
+    조회가 실패한 노드의 GPU는 결과에 없으므로 idle로 보지 않는다.
+    """
+    timeout = app.config["HTTP_TIMEOUT_SEC"]
+    out = {}
+    for node, utils_by_gpu, err in map_bounded(
+        lambda n: query_gpu_util_max(n, window_sec, prom_url_for(n), timeout),
+        sorted(set(nodes)),
+        app.config["NODE_SCORE_PARALLELISM"],
+    ):
+        if err is not None:
+            app.logger.warning(f"[IDLE REAPER] GPU util query failed node={node}: {err}")
+            continue
+        out.update({(node, idx): util for idx, util in utils_by_gpu.items()})
+    return out
+
+
+def _cpu_cores_avg(namespace: str, window_sec: int) -> Dict[str, float]:
+    """{pod 이름: window 동안의 평균 CPU 사용 core 수}. cAdvisor metric은 클러스터 Prometheus(PROM_URL)에 있다."""
+    query = f'sum by (pod) (rate(container_cpu_usage_seconds_total{{namespace="{namespace}",container!="",container!="POD"}}[{window_sec}s]))'
+    with track_outbound("prometheus"):
+        resp = requests.get(
+            f"{app.config['PROM_URL']}/api/v1/query",
+            params={"query": query},
+            timeout=app.config["HTTP_TIMEOUT_SEC"],
+        )
+        resp.raise_for_status()
+    result = resp.json()["data"]["result"]
+    return {item["metric"]["pod"]: float(item["value"][1]) for item in result if "pod" in item["metric"]}
+
+
+def _warn(v1, pod, namespace: str, idle_sec: int, grace_sec: int) -> None:
+    name = pod.metadata.name
+    message = (
+        f"GPU와 CPU 사용이 {idle_sec // 60}분 넘게 없어 {grace_sec // 60}분 뒤 이미지를 저장하고 Pod를 회수합니다. "
+        f"계속 쓰려면 작업을 다시 시작하세요."
+    )
+    now = datetime.now(timezone.utc)
+    try:
+        v1.create_namespaced_event(namespace, client.CoreV1Event(
+            metadata=client.V1ObjectMeta(generate_name=f"{name}.idle-"),
+            involved_object=client.V1ObjectReference(
+                kind="Pod", name=name, namespace=namespace, uid=pod.metadata.uid,
+            ),
+            reason="IdleWarning",
+            message=message,
+            type="Warning",
+            count=1,
+            first_timestamp=now,
+            last_timestamp=now,
+            source=client.V1EventSource(component="ailab-idle-reaper"),
+        ))
+        v1.patch_namespaced_pod(name, namespace, {"metadata": {"annotations": {WARNED_ANNOTATION: now.isoformat()}}})
+    except client.exceptions.ApiException as e:
+        app.logger.warning(f"[IDLE REAPER] warning event failed pod={name}: {e.reason}")
+
+    warn_cmd = app.config["IDLE_REAPER_WARN_CMD"]
+    if warn_cmd:
+        try:
+            exec_in_pod(name, namespace, [warn_cmd, message], timeout_sec=30)
+        except Exception as e:
+            app.logger.warning(f"[IDLE REAPER] warn command failed pod={name}: {e}")
+
+
+def _clear_warning(v1, name: str, namespace: str) -> None:
+    r.hdel(_WARNED_KEY, name)
+    try:
+        v1.patch_namespaced_pod(name, namespace, {"metadata": {"annotations": {WARNED_ANNOTATION: None}}})
+    except client.exceptions.ApiException as e:
+        if e.status != 404:
+            app.logger.warning(f"[IDLE REAPER] clear warning annotation failed pod={name}: {e.reason}")
+
+
+def _record_reclaim(event: dict) -> None:
+    day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    pipe = r.pipeline()
+    pipe.hincrby(_STATS_KEY, "reclaimed_pods", 1)
+    pipe.hincrbyfloat(_STATS_KEY, "reclaimed_gpu_hours", event["gpu_hours"])
+    pipe.hincrbyfloat(_STATS_KEY, f"gpu_hours:{day}", event["gpu_hours"])
+    pipe.lpush(_EVENTS_KEY, json.dumps(event))
+    pipe.ltrim(_EVENTS_KEY, 0, _EVENTS_MAX - 1)
+    pipe.execute()
+
+
+def run_idle_reaper() -> dict:
+    """idle Pod 경고/회수 1회. leader worker에서 IDLE_REAPER_INTERVAL_SEC마다 실행된다."""
+    ns = app.config["NAMESPACE"]
+    idle_sec = app.config["IDLE_REAPER_IDLE_SEC"]
+    grace_sec = app.config["IDLE_REAPER_GRACE_SEC"]
+    gpu_threshold = app.config["IDLE_REAPER_GPU_UTIL_THRESHOLD"]
+    cpu_threshold = app.config["IDLE_REAPER_CPU_CORES_THRESHOLD"]
+
+    load_k8s()
+    v1 = client.CoreV1Api()
+    pods = v1.list_namespaced_pod(
+        namespace=ns,
+        label_selector=f"managed-by=ailab-infra,pool-state!=standby,{EXEMPT_LABEL}!=exempt",
+    ).items
+
+    gpu_util = _gpu_util_max((p.spec.node_name for p in pods if p.spec.node_name and pod_gpu_indices(p)), idle_sec)
+    cpu_cores = _cpu_cores_avg(ns, idle_sec)
+    warned = {k: float(v) for k, v in r.hgetall(_WARNED_KEY).items()}
+    now = time.time()
+    summary = {"checked": 0, "idle": 0, "warned": 0, "reclaimed": 0}
+    live = set()
+
+    for pod in pods:
+        name = pod.metadata.name
+        live.add(name)
+        indices = pod_gpu_indices(pod)
+        node = pod.spec.node_name
+        if not indices or not node or pod.metadata.deletion_timestamp or not is_pod_ready(pod):
+            continue
+        # 막 뜬 Pod는 window 전체에 대한 metric이 없으므로 판단하지 않는다.
+        if now - pod.metadata.creation_timestamp.timestamp() < idle_sec:
+            continue
+        summary["checked"] += 1
+
+        gpu_utils = [gpu_util.get((node, i)) for i in indices]
+        cpu = cpu_cores.get(name)
+        is_idle = (
+            None not in gpu_utils and cpu is not None
+            and max(gpu_utils) < gpu_threshold and cpu < cpu_threshold
+        )
+        if not is_idle:
+            if name in warned:
+                app.logger.info(f"[IDLE REAPER] activity resumed pod={name}")
+                _clear_warning(v1, name, ns)
+            continue
+        summary["idle"] += 1
+
+        warned_at = warned.get(name)
+        if warned_at is None:
+            app.logger.info(f"[IDLE REAPER] idle pod={name} node={node} gpus={list(indices)} — warning")
+            r.hset(_WARNED_KEY, name, now)
+            _warn(v1, pod, ns, idle_sec, grace_sec)
+            summary["warned"] += 1
+            continue
+        if now - warned_at < grace_sec:
+            continue
+
+        labels = pod.metadata.labels or {}
+        username = labels.get("username")
+        if not username:
+            continue
+        app.logger.info(f"[IDLE REAPER] reclaiming pod={name} user={username} — saving image")
+        if not commit_and_save_user_image(username, name, ns):
+            app.logger.warning(f"[IDLE REAPER] image save failed, reclaim postponed pod={name}")
+            continue
+
+        tracking_id, _ = delete_jobs.enqueue(name)
+        held_sec = idle_sec + (now - warned_at)
+        event = {
+            "pod_name": name,
+            "username": username,
+            "node": node,
+            "num_gpu": len(indices),
+            "idle_sec": int(held_sec),
+            "gpu_hours": round(len(indices) * held_sec / 3600, 3),
+            "tracking_id": tracking_id,
+            "reclaimed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _record_reclaim(event)
+        r.hdel(_WARNED_KEY, name)
+        summary["reclaimed"] += 1
+        app.logger.info(f"[IDLE REAPER] reclaimed pod={name} gpu_hours={event['gpu_hours']} tracking_id={tracking_id}")
+
+    # 이미 사라진 Pod의 경고 기록 정리
+    stale = [name for name in warned if name not in live]
+    if stale:
+        r.hdel(_WARNED_KEY, *stale)
+
+    app.logger.info(f"[IDLE REAPER] run done {summary}")
+    return summary
+
+
+def get_report(recent: int = 50) -> dict:
+    stats = r.hgetall(_STATS_KEY)
+    daily = {k.split(":", 1)[1]: round(float(v), 3) for k, v in stats.items() if k.startswith("gpu_hours:")}
+    return {
+        "reclaimed_pods": int(stats.get("reclaimed_pods", 0)),
+        "reclaimed_gpu_hours": round(float(stats.get("reclaimed_gpu_hours", 0.0)), 3),
+        "gpu_hours_by_day": dict(sorted(daily.items())),
+        "warned": {
+            name: datetime.fromtimestamp(float(ts), timezone.utc).isoformat()
+            for name, ts in r.hgetall(_WARNED_KEY).items()
+        },
+        # LRANGE 0 -1은 전체 목록이므로 recent<=0은 빈 목록으로 처리한다
+        "recent": [json.loads(e) for e in r.lrange(_EVENTS_KEY, 0, recent - 1)] if recent > 0 else [],
+    }
@@ -0,0 +1,224 @@
+"""
+GPU 노드 이미지 사전 pull(pre-pull) controller.
+
+build_pod_spec()은 imagePullPolicy: IfNotPresent를 쓰므로, 어떤 노드에서 어떤 이미지로 처음 뜨는 Pod는
+/create-pod 안에서 이미지 pull 시간을 전부 기다린다. 이를 줄이기 위해
+
+1. /create-pod가 WAS 사용자 설정의 image를 후보 gpu_nodes마다, 실제로 쓴 이미지(load_user_image 결과)를
+   배치된 노드에 Redis sorted set(prepull:images:<node>)으로 기록하고,
+2. leader worker의 주기 작업(run_prepull)이 노드의 kubelet 이미지 목록(node.status.images)과 비교해
+   없는 이미지만 짧게 끝나는 pre-pull Pod로 받아 두며,
+3. 노드별 coverage(기대 이미지 중 이미 있는 비율)를 Redis에 남겨 /prepull/coverage로 보여준다.
+
+user-<username>:latest처럼 docker load로만 존재하는 로컬 이미지는 registry에서 받을 수 없으므로 기록하지 않는다.
+kubelet은 node.status.images에 크기순 상위 일부(기본 50개)만 보고하므로, 최근 pre-pull에 성공한 이미지도 존재로 간주한다.
+"""
+import hashlib
+import json
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from flask import current_app as app
+from kubernetes import client
+
+from redis_client import r
+from utils import load_k8s
+
+PREPULL_APP_LABEL = "ailab-prepull"
+IMAGE_ANNOTATION = "ailab.dgu/prepull-image"
+
+_NODES_KEY = "prepull:nodes"
+_COVERAGE_KEY = "prepull:coverage"
+
+_LOCAL_USER_IMAGE_RE = re.compile(r"^user-[a-z_][a-z0-9_-]*:latest$")
+
+
+def _images_key(node: str) -> str:
+    return f"prepull:images:{node}"
+
+
+def _done_key(node: str) -> str:
+    return f"prepull:done:{node}"
+
+
+def normalize_image_ref(image: str) -> str:
+    """'ubuntu' → 'docker.io/library/ubuntu:latest' 처럼 kubelet이 보고하는 이름 형태로 맞춘다."""
+    ref = image.strip()
+    if "@" in ref:
+        name, digest = ref.split("@", 1)
+        return f"{normalize_image_ref(name).rsplit(':', 1)[0]}@{digest}"
+    first = ref.split("/", 1)[0]
+    if "/" not in ref or ("." not in first and ":" not in first and first != "localhost"):
+        ref = f"docker.io/{ref}"
+    if ref.startswith("docker.io/") and ref.count("/") == 1:
+        ref = ref.replace("docker.io/", "docker.io/library/", 1)
+    if ":" not in ref.rsplit("/", 1)[-1]:
+        ref += ":latest"
+    return ref
+
+
+def is_pullable(image: Optional[str]) -> bool:
+    return bool(image) and not _LOCAL_USER_IMAGE_RE.match(image)
+
+
+def record_image_use(nodes: Iterable[str], image: Optional[str]) -> None:
+    """nodes에서 image가 쓰일 것/쓰였음을 기록한다. Redis 장애는 Pod 생성을 막지 않는다."""
+    if not is_pullable(image):
+        return
+    now = time.time()
+    try:
+        pipe = r.pipeline()
+        for node in nodes:
+            if not node:
+                continue
+            pipe.sadd(_NODES_KEY, node)
+            pipe.zadd(_images_key(node), {image: now})
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def wanted_images(ttl_sec: float) -> Dict[str, Set[str]]:
+    """최근 ttl_sec 안에 쓰인 {node: {image}}. 오래된 기록은 이때 정리한다."""
+    out = {}
+    cutoff = time.time() - ttl_sec
+    for node in r.smembers(_NODES_KEY):
+        key = _images_key(node)
+        r.zremrangebyscore(key, "-inf", cutoff)
+        images = set(r.zrange(key, 0, -1))
+        if images:
+            out[node] = images
+        else:
+            r.srem(_NODES_KEY, node)
+    return out
+
+
+def _prepull_pod_name(node: str, image: str) -> str:
+    digest = hashlib.sha1(f"{node}|{image}".encode()).hexdigest()[:10]
+    return f"ailab-prepull-{digest}"
+
+
+def _prepull_pod_manifest(node: str, image: str, namespace: str, deadline_sec: int) -> dict:
+    name = _prepull_pod_name(node, image)
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "labels": {"app": PREPULL_APP_LABEL, "prepull-node": node},
+            "annotations": {IMAGE_ANNOTATION: image},
+        },
+        "spec": {
+            "nodeName": node,
+            "restartPolicy": "Never",
+            "activeDeadlineSeconds": deadline_sec,
+            "containers": [
+                {
+                    "name": "prepull",
+                    "image": image,
+                    "imagePullPolicy": "IfNotPresent",
+                    "command": ["/bin/sh", "-c", "exit 0"],
+                    "resources": {
+                        "requests": {"cpu": "10m", "memory": "16Mi"},
+                        "limits": {"cpu": "100m", "memory": "64Mi"},
+                    },
+                }
+            ],
+        },
+    }
+
+
+def _node_present_images(node_obj) -> Set[str]:
+    present = set()
+    for img in (node_obj.status.images or []):
+        for name in (img.names or []):
+            present.add(normalize_image_ref(name))
+    return present
+
+
+def run_prepull() -> dict:
+    """
+    노드별 기대 이미지와 실제 이미지 목록을 비교해 빠진 이미지를 pre-pull Pod로 받고 coverage를 기록한다.
+    leader worker에서 PREPULL_INTERVAL_SEC마다 실행된다.
+    """
+    ns = app.config["NAMESPACE"]
+    ttl = app.config["PREPULL_IMAGE_TTL_SEC"]
+    max_per_node = app.config["PREPULL_MAX_PODS_PER_NODE"]
+
+    wanted = wanted_images(ttl)
+    load_k8s()
+    v1 = client.CoreV1Api()
+
+    # 끝난 pre-pull Pod 정리: 성공한 이미지는 kubelet 보고 목록에 없어도 존재로 기억한다.
+    pulling: Dict[str, Set[str]] = {}
+    for pod in v1.list_namespaced_pod(namespace=ns, label_selector=f"app={PREPULL_APP_LABEL}").items:
+        node = pod.spec.node_name
+        image = (pod.metadata.annotations or {}).get(IMAGE_ANNOTATION)
+        phase = pod.status.phase
+        if phase in ("Succeeded", "Failed"):
+            # 이미지에 /bin/sh가 없어 컨테이너만 실패한 경우도 imageID가 채워져 있으면 pull은 끝난 것이다.
+            pulled = phase == "Succeeded" or any(cs.image_id for cs in (pod.status.container_statuses or []))
+            if pulled and node and image:
+                r.zadd(_done_key(node), {normalize_image_ref(image): time.time()})
+            else:
+                app.logger.warning(f"[PREPULL] pull failed node={node} image={image} reason={pod.status.reason}")
+            try:
+                v1.delete_namespaced_pod(pod.metadata.name, ns)
+            except client.exceptions.ApiException as e:
+                if e.status != 404:
+                    raise
+        elif node and image:
+            pulling.setdefault(node, set()).add(image)
+
+    nodes = {n.metadata.name: n for n in v1.list_node().items}
+    report = {}
+    for node, images in wanted.items():
+        node_obj = nodes.get(node)
+        if node_obj is None:
+            app.logger.debug(f"[PREPULL] node {node} not in cluster, skipped")
+            continue
+
+        done_key = _done_key(node)
+        r.zremrangebyscore(done_key, "-inf", time.time() - ttl)
+        present = _node_present_images(node_obj) | set(r.zrange(done_key, 0, -1))
+
+        missing = sorted(i for i in images if normalize_image_ref(i) not in present)
+        in_flight = pulling.get(node, set())
+        slots = max(0, max_per_node - len(in_flight))
+        for image in missing:
+            if image in in_flight:
+                continue
+            if slots <= 0:
+                break
+            try:
+                v1.create_namespaced_pod(
+                    namespace=ns,
+                    body=_prepull_pod_manifest(node, image, ns, app.config["PREPULL_POD_DEADLINE_SEC"]),
+                )
+                in_flight.add(image)
+                slots -= 1
+                app.logger.info(f"[PREPULL] pulling image={image} node={node}")
+            except client.exceptions.ApiException as e:
+                if e.status != 409:
+                    app.logger.warning(f"[PREPULL] pre-pull pod create failed node={node} image={image}: {e.reason}")
+
+        cached = len(images) - len(missing)
+        report[node] = {
+            "wanted": sorted(images),
+            "missing": missing,
+            "pulling": sorted(in_flight),
+            "cached": cached,
+            "coverage": round(cached / len(images), 3) if images else 1.0,
+        }
+
+    payload = {"nodes": report, "updated_at": datetime.now(timezone.utc).isoformat()}
+    r.set(_COVERAGE_KEY, json.dumps(payload))
+    return payload
+
+
+def get_coverage_report() -> Optional[dict]:
+    raw = r.get(_COVERAGE_KEY)
+    if raw is None:
+        return None
+    return json.loads(raw)
@@ -1,7 +1,8 @@
-from flask import Flask, request, jsonify, Blueprint
+from flask import Flask, request, jsonify, Blueprint, Response, stream_with_context
 import fcntl
 import re
 import time
+import threading
 from typing import List, Optional
 from kubernetes import client, config as k8s_config, watch
 import pymysql
@@ -17,14 +18,31 @@ load_dotenv()
 import base64
 import crypt
 import json
+import shlex
 import subprocess
 
 from error import infra_error, k8s_error_fields
-from pod_status import set_pod_creation_status, get_pod_creation_status
+from pod_status import (
+    set_pod_creation_status, get_pod_creation_status, get_latency_histograms, stream_pod_creation_status,
+)
+from pipeline import Stage, PipelineError, run_pipeline, call_in_background, map_bounded
+from background import start_periodic_task, start_worker_thread
+import warm_pool
+import image_prepull
+import delete_jobs
+import idle_reaper
+import single_flight
+from nodeport_pool import NodePortBitmap
+import node_scores
+import pod_index
+import scheduler
+import service_ports
+import metrics
+from metrics import track_outbound, record_outbound_error, POD_CREATIONS_IN_FLIGHT, CONFIG_WEBHOOK_LOOKUPS
 
 from utils import (
     get_db_connection, is_pod_ready, get_pod_failure_reason, get_existing_pod, generate_pod_name, delete_pod_util,
-    LockedFile, get_node_gpu_score,
+    LockedFile, get_node_gpu_scores, query_gpu_device_loads, prom_url_for,
     ensure_etc_layout, ensure_sudoers_file,
     read_passwd_lines, write_passwd_lines,
     read_group_lines, write_group_lines,
@@ -34,12 +52,13 @@ from utils import (
     parse_shadow_line, format_shadow_entry,
     create_user_home_directory,
     delete_user_home_directory,
-    select_best_node_from_prometheus,
     resolve_k8s_node_name,
     load_user_image,
     commit_and_save_user_image,
     create_nodeport_services,
+    create_gateway_routes,
     delete_nodeport_services,
+    exec_in_pod,
 )
 
 app = Flask(__name__)
@@ -63,8 +82,85 @@ app.config.from_mapping({
     "PROM_URL": "http://monitoring-kube-prometheus-prometheus.monitoring:9090",
     "WAS_URL_TEMPLATE": "http://admin-prod.default/api/requests/config/{username}",
     "HTTP_TIMEOUT_SEC": 3.0,
+    # 노드 GPU score cache 갱신 주기(DCGM scrape 주기에 맞춤)와, 이보다 오래된 cache는 쓰지 않고 직접 조회하는 기준
+    "NODE_SCORE_REFRESH_SEC": float(os.getenv("NODE_SCORE_REFRESH_SEC", "15")),
+    "NODE_SCORE_MAX_AGE_SEC": float(os.getenv("NODE_SCORE_MAX_AGE_SEC", "60")),
+    # score에 쓰는 DCGM 값: 구간(PromQL duration, 비우면 순간값)과 통계(avg | quantile).
+    # RECORDING_RULES면 Chart의 PrometheusRule이 미리 계산한 series(utils.gpu_score_rule_name)를 읽는다.
+    "NODE_SCORE_WINDOW":          os.getenv("NODE_SCORE_WINDOW", "5m"),
+    "NODE_SCORE_STAT":            os.getenv("NODE_SCORE_STAT", "avg"),
+    "NODE_SCORE_QUANTILE":        float(os.getenv("NODE_SCORE_QUANTILE", "0.9")),
+    "NODE_SCORE_RECORDING_RULES": os.getenv("NODE_SCORE_RECORDING_RULES", "false").lower() == "true",
+    # score 조회 방식. batch: 모든 후보를 PromQL 한 번으로, per_node: 노드마다 PROM_URL_TEMPLATE(예: 노드별 federation
+    # "http://prometheus-{node}.monitoring:9090", 비우면 PROM_URL)에 동시에 조회하고 전체 기한 안에 못 받은 노드는 inf.
+    "NODE_SCORE_QUERY_MODE":      os.getenv("NODE_SCORE_QUERY_MODE", "batch"),
+    "PROM_URL_TEMPLATE":          os.getenv("PROM_URL_TEMPLATE", ""),
+    "NODE_SCORE_DEADLINE_SEC":    float(os.getenv("NODE_SCORE_DEADLINE_SEC", "3.0")),
+    "NODE_SCORE_PARALLELISM":     int(os.getenv("NODE_SCORE_PARALLELISM", "16")),
+    # 노드 선택 policy(score/spread/pack)와, live Pod의 GPU/CPU/memory 약속량으로 후보를 거를지 여부
+    "SCHEDULER_POLICY":          os.getenv("SCHEDULER_POLICY", "score"),
+    "SCHEDULER_CAPACITY_FILTER": os.getenv("SCHEDULER_CAPACITY_FILTER", "true").lower() == "true",
     "POD_READY_MAX_WAIT_SEC": 300,
 
+    # build_pod_spec 준비 단계(노드명 정규화/이미지 로드/계정 조회 등)를 동시에 돌릴 thread 수
+    "POD_SPEC_PIPELINE_WORKERS": int(os.getenv("POD_SPEC_PIPELINE_WORKERS", "4")),
+
+    # 비동기 /delete-pod job consumer (worker마다 consumer thread 수)
+    "DELETE_JOB_CONSUMERS":      int(os.getenv("DELETE_JOB_CONSUMERS", "2")),
+    "DELETE_JOB_MAX_ATTEMPTS":   int(os.getenv("DELETE_JOB_MAX_ATTEMPTS", "5")),
+    "DELETE_JOB_RETRY_BASE_SEC": int(os.getenv("DELETE_JOB_RETRY_BASE_SEC", "10")),
+    # 한 번의 teardown(삭제 대기 60초 + farm SSH 재시도)보다 충분히 길어야 한다
+    "DELETE_JOB_LEASE_SEC":      int(os.getenv("DELETE_JOB_LEASE_SEC", "300")),
+
+    # GPU idle reaper — IDLE_SEC 동안 할당 GPU util 최댓값과 평균 CPU core가 임계값 미만이면 경고,
+    # 그 뒤 GRACE_SEC 동안 계속 idle이면 이미지를 저장하고 회수한다.
+    "IDLE_REAPER_ENABLED":             os.getenv("IDLE_REAPER_ENABLED", "false").lower() == "true",
+    "IDLE_REAPER_INTERVAL_SEC":        int(os.getenv("IDLE_REAPER_INTERVAL_SEC", "300")),
+    "IDLE_REAPER_IDLE_SEC":            int(os.getenv("IDLE_REAPER_IDLE_SEC", "7200")),
+    "IDLE_REAPER_GRACE_SEC":           int(os.getenv("IDLE_REAPER_GRACE_SEC", "1800")),
+    "IDLE_REAPER_GPU_UTIL_THRESHOLD":  float(os.getenv("IDLE_REAPER_GPU_UTIL_THRESHOLD", "5")),
+    "IDLE_REAPER_CPU_CORES_THRESHOLD": float(os.getenv("IDLE_REAPER_CPU_CORES_THRESHOLD", "0.1")),
+    # 경고 시 Pod 안에서 실행할 명령 (인자로 경고 문구를 받음, 비어 있으면 k8s event만 남김)
+    "IDLE_REAPER_WARN_CMD":            os.getenv("IDLE_REAPER_WARN_CMD", ""),
+
+    # 같은 사용자의 /create-pod가 겹치면 뒤 요청은 앞 요청의 결과를 이만큼 기다린다
+    # (POD_READY_MAX_WAIT_SEC보다 길고 gunicorn timeout보다 짧게)
+    "CREATE_POD_JOIN_WAIT_SEC":  int(os.getenv("CREATE_POD_JOIN_WAIT_SEC", "420")),
+
+    # /pods/<username>/status/stream 연결 하나를 최대로 유지하는 시간과 keepalive 주기.
+    # 연결마다 gthread thread 하나를 잡으므로 짧게 두고 클라이언트가 다시 연결하게 한다.
+    "POD_STATUS_STREAM_MAX_SEC":       int(os.getenv("POD_STATUS_STREAM_MAX_SEC", "120")),
+    "POD_STATUS_STREAM_HEARTBEAT_SEC": int(os.getenv("POD_STATUS_STREAM_HEARTBEAT_SEC", "15")),
+    # worker 하나에서 동시에 유지할 stream 수 (gunicorn threads보다 작게 두어 일반 요청 thread를 남긴다)
+    "POD_STATUS_STREAM_MAX_CONCURRENT": int(os.getenv("POD_STATUS_STREAM_MAX_CONCURRENT", "4")),
+
+    # /pods/bulk-delete에서 동시에 정리할 Pod 수
+    "BULK_DELETE_MAX_PARALLEL":  int(os.getenv("BULK_DELETE_MAX_PARALLEL", "8")),
+
+    # NodePort 할당 범위 (kube-apiserver --service-node-port-range와 같아야 함)
+    "NODEPORT_MIN": 30000,
+    "NODEPORT_MAX": 32767,
+    # allocate_nodeports()의 빈 포트 후보 bitmap을 DB/클러스터 상태로 다시 채우는 주기
+    "NODEPORT_BITMAP_REFRESH_SEC": int(os.getenv("NODEPORT_BITMAP_REFRESH_SEC", "30")),
+    # stale NodePort 할당 행 정리(leader 주기 작업) 간격
+    "NODEPORT_RECONCILE_INTERVAL_SEC": int(os.getenv("NODEPORT_RECONCILE_INTERVAL_SEC", "120")),
+    # 할당 직후 reserved 행의 lease 길이 (POD_READY_MAX_WAIT_SEC + Service 생성보다 길게)와,
+    # 만료된 reserved 행을 회수하는 주기
+    "NODEPORT_LEASE_TTL_SEC":              int(os.getenv("NODEPORT_LEASE_TTL_SEC", "600")),
+    "NODEPORT_LEASE_RECLAIM_INTERVAL_SEC": int(os.getenv("NODEPORT_LEASE_RECLAIM_INTERVAL_SEC", "30")),
+
+    # Pod 접속 방식
+    #   nodeport: ssh/jupyter/추가 포트 모두 Pod마다 NodePort Service
+    #   gateway:  ssh는 공용 ContainerSSH(/config webhook), jupyter는 공용 ingress(host=<username>.<도메인>)로 받고
+    #             NodePort는 WAS의 additional_ports에만 할당
+    "POD_ACCESS_MODE":          os.getenv("POD_ACCESS_MODE", "nodeport"),
+    "GATEWAY_JUPYTER_DOMAIN":   os.getenv("GATEWAY_JUPYTER_DOMAIN", ""),
+    "GATEWAY_INGRESS_CLASS":    os.getenv("GATEWAY_INGRESS_CLASS", "nginx"),
+    "GATEWAY_TLS_SECRET":       os.getenv("GATEWAY_TLS_SECRET", ""),
+    # 사용자에게 안내할 공용 ContainerSSH 주소
+    "GATEWAY_SSH_HOST":         os.getenv("GATEWAY_SSH_HOST", ""),
+    "GATEWAY_SSH_PORT":         int(os.getenv("GATEWAY_SSH_PORT", "22")),
+
     # Default resources
     "DEFAULT_CPU_REQUEST": "1000m",
     "DEFAULT_MEM_REQUEST": "1024Mi",
@@ -93,6 +189,28 @@ app.config.from_mapping({
     # image store
     "IMAGE_STORE_DIR": "/image-store/images",
 
+    # warm standby pool — profile(node/image/GPU 수/limit)별로 미리 띄워 둔 Pod를 /create-pod가 가져다 쓴다.
+    # 이미지가 POOL_STANDBY=true 대기 모드와 WARM_POOL_PERSONALIZE_CMD 개인화 스크립트를 지원해야 한다.
+    # KRB5_REALM이 설정되면 쓰지 않는다 (standby Pod는 uid를 모르므로 /run/user/<uid> ccache를 mount할 수 없다).
+    "WARM_POOL_ENABLED":             os.getenv("WARM_POOL_ENABLED", "false").lower() == "true",
+    "WARM_POOL_MIN_PER_PROFILE":     int(os.getenv("WARM_POOL_MIN_PER_PROFILE", "0")),
+    "WARM_POOL_MAX_PER_PROFILE":     int(os.getenv("WARM_POOL_MAX_PER_PROFILE", "2")),
+    "WARM_POOL_DEMAND_WINDOW_SEC":   int(os.getenv("WARM_POOL_DEMAND_WINDOW_SEC", "3600")),
+    # 최근 window 요청 수 × factor(올림)를 목표 standby 수로 삼는다 (min/max로 제한)
+    "WARM_POOL_DEMAND_FACTOR":       float(os.getenv("WARM_POOL_DEMAND_FACTOR", "0.25")),
+    "WARM_POOL_REFILL_INTERVAL_SEC": int(os.getenv("WARM_POOL_REFILL_INTERVAL_SEC", "30")),
+    "WARM_POOL_PERSONALIZE_CMD":     os.getenv("WARM_POOL_PERSONALIZE_CMD", "/usr/local/bin/personalize.sh"),
+    # claim 때 사용자 env를 기록하는 login shell profile. exec env로 넘긴 값은 이후 SSH attach 세션에 남지 않는다.
+    "WARM_POOL_ENV_FILE":            os.getenv("WARM_POOL_ENV_FILE", "/etc/profile.d/ailab-user-env.sh"),
+
+    # GPU 노드 이미지 pre-pull controller
+    "PREPULL_ENABLED":           os.getenv("PREPULL_ENABLED", "false").lower() == "true",
+    "PREPULL_INTERVAL_SEC":      int(os.getenv("PREPULL_INTERVAL_SEC", "300")),
+    # 이 기간 동안 한 번도 쓰이지 않은 (node, image)는 더 이상 받아 두지 않는다
+    "PREPULL_IMAGE_TTL_SEC":     int(os.getenv("PREPULL_IMAGE_TTL_SEC", str(7 * 24 * 3600))),
+    "PREPULL_MAX_PODS_PER_NODE": int(os.getenv("PREPULL_MAX_PODS_PER_NODE", "1")),
+    "PREPULL_POD_DEADLINE_SEC":  int(os.getenv("PREPULL_POD_DEADLINE_SEC", "1800")),
+
     "NVIDIA_AUX_DEVICES": [
         "nvidiactl", "nvidia-uvm", "nvidia-uvm-tools", "nvidia-modeset"
     ],
@@ -108,6 +226,29 @@ app.config.from_mapping({
     "BASHRC_PATH": BASE_ETC_DIR + "/bashrc",
 })
 
+if app.config["SCHEDULER_POLICY"] not in scheduler.POLICIES:
+    raise RuntimeError(f"unknown SCHEDULER_POLICY: {app.config['SCHEDULER_POLICY']!r}")
+if app.config["NODE_SCORE_WINDOW"] and not re.fullmatch(r"\d+[smhdwy]", app.config["NODE_SCORE_WINDOW"]):
+    raise RuntimeError(f"invalid NODE_SCORE_WINDOW: {app.config['NODE_SCORE_WINDOW']!r}")
+if app.config["NODE_SCORE_QUERY_MODE"] not in ("batch", "per_node"):
+    raise RuntimeError(f"unknown NODE_SCORE_QUERY_MODE: {app.config['NODE_SCORE_QUERY_MODE']!r}")
+if app.config["NODE_SCORE_STAT"] not in ("avg", "quantile"):
+    raise RuntimeError(f"unknown NODE_SCORE_STAT: {app.config['NODE_SCORE_STAT']!r}")
+if not 0 < app.config["NODE_SCORE_QUANTILE"] < 1:
+    raise RuntimeError(f"NODE_SCORE_QUANTILE must be in (0, 1): {app.config['NODE_SCORE_QUANTILE']}")
+if app.config["POD_ACCESS_MODE"] not in ("nodeport", "gateway"):
+    raise RuntimeError(f"unknown POD_ACCESS_MODE: {app.config['POD_ACCESS_MODE']!r}")
+if app.config["POD_ACCESS_MODE"] == "gateway" and not app.config["GATEWAY_JUPYTER_DOMAIN"]:
+    raise RuntimeError("POD_ACCESS_MODE=gateway에는 GATEWAY_JUPYTER_DOMAIN이 필요함")
+
+if app.config["WARM_POOL_ENABLED"] and app.config["KRB5_REALM"]:
+    # Pod volume은 생성 후 바꿀 수 없어 claim 때 사용자 uid의 ccache만 골라 mount할 방법이 없다.
+    # host /run/user 전체를 standby Pod에 mount하면 claim한 사용자가 다른 사용자의 ccache를 읽을 수 있다.
+    app.logger.warning("[WARM POOL] disabled because KRB5_REALM is set (per-uid ccache cannot be bound at claim)")
+    app.config["WARM_POOL_ENABLED"] = False
+
+metrics.init_app(app)
+
 @app.route("/health", methods=["GET"])
 def health():
     """
@@ -129,6 +270,31 @@ def health():
     """
     return "OK", 200
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """
+    config-server 자체 Prometheus metrics
+
+    모든 gunicorn worker의 값을 합쳐서 반환한다. route별 요청 latency/status, 외부 호출(k8s, MySQL, Redis,
+    Prometheus, WAS, NAS SSH, farm SSH) latency/오류 수, 진행 중인 Pod 생성 수, NodePort pool 점유율,
+    계정 파일 크기를 포함한다.
+
+    ---
+    tags:
+    - System
+
+    summary: Prometheus metrics
+
+    produces:
+      - text/plain
+
+    responses:
+      200:
+        description: Prometheus text exposition format
+    """
+    body, content_type = metrics.render_metrics()
+    return body, 200, {"Content-Type": content_type}
+
 def load_k8s():
     try:
         k8s_config.load_incluster_config()
@@ -163,14 +329,7 @@ class PodSpecBuildError(Exception):
 
 # ////////////////////// 포트 할당 //////////////////////
 
-# reconcile 쓰로틀: 마지막 실행 시각(Unix timestamp). 앱 시작 시 0으로 초기화.
-_last_reconcile_ts: float = 0.0
-# 최소 실행 간격(초). allocate_nodeports() 호출 시 in-flight pod 오탐을 방지하기 위해
-# 5분 간격으로 제한한다. (allocate -> Service 생성까지 통상 30초 이내이므로 충분한 여유)
-_RECONCILE_INTERVAL_SEC: int = 300
-
-
-def reconcile_nodeport_allocations(namespace: str) -> int:
+def reconcile_nodeport_allocations(namespace: Optional[str] = None) -> dict:
     """
     MySQL의 nodeport_allocations 테이블과 실제 k8s NodePort Service 상태를 동기화.
 
@@ -181,93 +340,158 @@ def reconcile_nodeport_allocations(namespace: str) -> int:
           MySQL에 포트가 점유된 채로 남아 포트 고갈 발생 가능.
 
     동기화 방향: k8s -> MySQL  (k8s가 단일 진실 소스)
-        - k8s에 실제 존재하는 NodePort Service의 pod_name 목록 조회.
-        - MySQL에는 있지만 k8s에 없는 pod_name 행을 stale로 판단해 삭제.
+        - MySQL에는 있지만 다음 어디에도 없는 pod_name 행을 stale로 판단해 한 문장으로 삭제.
+            1. NodePort Service (app=ailab-nodeport, pod_name 라벨)
+            2. Pod (managed-by=ailab-infra) — Service 생성 전 Ready 대기 중인 Pod 보호
+        - lease가 남아 있는 reserved 행(할당 직후 Pod 생성 전)은 건드리지 않는다.
+          만료된 reserved 행은 reclaim_expired_nodeport_leases()가 더 자주 따로 회수한다.
+        - gpu_device_allocations도 같은 기준으로 정리한다 (NODEPORT_LEASE_TTL_SEC 안에 만든 행은 보호).
+          반대로 /dev/nvidiaN을 마운트했지만 행이 없는 live Pod(이 table 이전에 만든 Pod 등)는 행을 채워 넣어
+          allocate_gpu_devices()가 그 GPU를 다시 내주지 않게 한다.
+
+    leader worker의 주기 작업(NODEPORT_RECONCILE_INTERVAL_SEC)과 POST /nodeport/reconcile에서 호출된다.
+    k8s 조회가 실패하면 아무것도 지우지 않고 예외를 올린다.
 
     Args:
-        namespace: NodePort Service가 존재하는 k8s 네임스페이스
+        namespace: NodePort Service가 존재하는 k8s 네임스페이스 (기본 NAMESPACE)
 
     Returns:
-        int: 삭제된 stale 행 수 (0이면 동기화 불필요 또는 쓰로틀로 스킵)
+        dict: {db_pods, protected_reserved, stale_pods, deleted_rows, backfilled_gpu_rows}
     """
-    global _last_reconcile_ts
-
-    # ── 쓰로틀 체크: 마지막 실행으로부터 _RECONCILE_INTERVAL_SEC 이내면 스킵 ──
-    now = time.time()
-    elapsed = now - _last_reconcile_ts
-    if elapsed < _RECONCILE_INTERVAL_SEC:
-        app.logger.debug(
-            f"[RECONCILE] skipped (throttle: {int(_RECONCILE_INTERVAL_SEC - elapsed)}s remaining)"
-        )
-        return 0
-
+    namespace = namespace or app.config["NAMESPACE"]
     app.logger.info(f"[RECONCILE] start namespace={namespace}")
-    # 쓰로틀 기준 시각: 성공/실패와 무관하게 "시도" 단위로 갱신한다.
-    _last_reconcile_ts = time.time()
 
-    # ── 1. k8s에서 실제 살아있는 NodePort Service의 pod_name 집합 조회 ──
-    #    label_selector로 config-server가 관리하는 Service만 필터링.
+    # ── 1. k8s와 in-flight 기록에서 살아있는 pod_name 집합 조회 ──
     #    (app=ailab-nodeport 라벨은 create_nodeport_services()에서 부여)
     load_k8s()  # utils.load_k8s — main.py 상단 import에서 가져옴
     v1 = client.CoreV1Api()
 
-    try:
-        services = v1.list_namespaced_service(
-            namespace=namespace,
-            label_selector="app=ailab-nodeport"
-        )
-    except Exception as e:
-        # k8s API 실패 시 reconcile 스킵. 포트 할당은 계속하고 다음 주기에 재시도.
-        app.logger.warning("[RECONCILE] k8s API call failed, skipping reconcile: %s", e, exc_info=True)
-        return 0
-
-    # Service 메타데이터의 pod_name 라벨에서 살아있는 pod 이름 수집
+    services = v1.list_namespaced_service(namespace=namespace, label_selector="app=ailab-nodeport")
     live_pod_names = {
         svc.metadata.labels["pod_name"]
         for svc in services.items
         if svc.metadata.labels and "pod_name" in svc.metadata.labels
     }
-    app.logger.debug(f"[RECONCILE] live pods in k8s: {live_pod_names}")
+    pods = v1.list_namespaced_pod(namespace=namespace, label_selector="managed-by=ailab-infra")
+    live_pod_names |= {pod.metadata.name for pod in pods.items}
 
     # ── 2. MySQL에서 현재 점유 중인 pod_name 목록 조회 ──
     conn = get_db_connection()
-    deleted_count = 0
-
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT DISTINCT pod_name FROM nodeport_allocations")
+            cur.execute(
+                "SELECT pod_name FROM nodeport_allocations "
+                "UNION SELECT pod_name FROM gpu_device_allocations"
+            )
             db_pod_names = {row[0] for row in cur.fetchall()}
-            app.logger.debug(f"[RECONCILE] pods in MySQL: {db_pod_names}")
+            # GPU 행은 lease가 없으므로 NodePort lease TTL 안에 만들어진 행을 같은 식으로 보호한다.
+            cur.execute(
+                "SELECT pod_name FROM nodeport_allocations "
+                "WHERE lease_state='reserved' AND lease_expires_at > NOW() "
+                "UNION SELECT pod_name FROM gpu_device_allocations "
+                "WHERE created_at > NOW() - INTERVAL %s SECOND",
+                (app.config["NODEPORT_LEASE_TTL_SEC"],),
+            )
+            reserved_pod_names = {row[0] for row in cur.fetchall()}
+            backfilled = _backfill_gpu_device_allocations(cur, pods.items)
+        conn.commit()
+    finally:
+        conn.close()
 
-            # k8s에는 없지만 MySQL에는 남아있는 stale pod_name 계산
-            stale_pod_names = db_pod_names - live_pod_names
+    # k8s에는 없지만 MySQL에는 남아있는 stale pod_name
+    stale_pod_names = sorted(db_pod_names - live_pod_names - reserved_pod_names)
+    deleted = 0
+    if stale_pod_names:
+        app.logger.info(f"[RECONCILE] stale pods to remove: {stale_pod_names}")
+        deleted = release_nodeports_bulk(stale_pod_names)
+
+    summary = {
+        "db_pods": len(db_pod_names),
+        "protected_reserved": len(reserved_pod_names - live_pod_names),
+        "stale_pods": stale_pod_names,
+        "deleted_rows": deleted,
+        "backfilled_gpu_rows": backfilled,
+    }
+    app.logger.info(f"[RECONCILE] done db_pods={summary['db_pods']} deleted_rows={deleted}")
+    return summary
 
-            if not stale_pod_names:
-                app.logger.info("[RECONCILE] no stale entries, DB is in sync")
-                return 0
 
-            app.logger.info(f"[RECONCILE] stale pods to remove: {stale_pod_names}")
+def _backfill_gpu_device_allocations(cur, pods) -> int:
+    """GPU device를 마운트한 live Pod 중 gpu_device_allocations 행이 없는 Pod의 행을 채운다. 추가한 행 수를 반환한다."""
+    cur.execute("SELECT DISTINCT pod_name FROM gpu_device_allocations")
+    recorded = {row[0] for row in cur.fetchall()}
+    rows = []
+    for pod in pods:
+        if pod.metadata.name in recorded or pod.metadata.deletion_timestamp or not pod.spec.node_name:
+            continue
+        username = (pod.metadata.labels or {}).get("username", "")
+        for idx in idle_reaper.pod_gpu_indices(pod):
+            rows.append((username, pod.metadata.name, pod.spec.node_name.lower(), idx))
+    if not rows:
+        return 0
+    # 예전 방식으로 같은 GPU를 나눠 쓰는 Pod가 있으면 먼저 기록된 Pod만 남는다 (UNIQUE key).
+    added = cur.executemany(
+        "INSERT IGNORE INTO gpu_device_allocations (username, pod_name, node_name, gpu_index) "
+        "VALUES (%s,%s,%s,%s)",
+        rows,
+    )
+    app.logger.info(f"[RECONCILE] backfilled gpu device rows={added}")
+    return added
 
-            # stale pod의 모든 NodePort 할당 행을 삭제
-            for pod in stale_pod_names:
-                cur.execute(
-                    "DELETE FROM nodeport_allocations WHERE pod_name=%s",
-                    (pod,)
-                )
-                deleted_count += cur.rowcount
-                app.logger.info(f"[RECONCILE] removed {cur.rowcount} rows for stale pod={pod}")
 
-        conn.commit()
-        app.logger.info(f"[RECONCILE] done, total deleted={deleted_count}")
-        return deleted_count
+@app.route("/nodeport/reconcile", methods=["POST"])
+def trigger_nodeport_reconcile():
+    """
+    NodePort 할당 reconcile 즉시 실행
 
-    except Exception:
-        app.logger.exception("[RECONCILE] failed, rolling back")
-        conn.rollback()
-        # reconcile 실패는 non-fatal. allocate_nodeports()는 stale 제거 없이 계속 진행.
-        return 0
-    finally:
-        conn.close()
+    주기 작업(NODEPORT_RECONCILE_INTERVAL_SEC)을 기다리지 않고 stale NodePort 할당 행을 바로 정리한다.
+    Service도 Pod도 없고 lease가 남은 reserved 행도 아닌 pod_name의 행만 지운다.
+
+    ---
+    tags:
+    - NodePort
+
+    summary: NodePort 할당 reconcile 즉시 실행
+
+    responses:
+      200:
+        description: reconcile 완료
+        schema:
+          type: object
+          properties:
+            db_pods:
+              type: integer
+            protected_reserved:
+              type: integer
+            stale_pods:
+              type: array
+              items:
+                type: string
+            deleted_rows:
+              type: integer
+      500:
+        description: k8s/DB 조회 실패 (아무것도 지우지 않음)
+        schema:
+          $ref: '#/definitions/ErrorResponse'
+    """
+    try:
+        summary = reconcile_nodeport_allocations()
+    except client.exceptions.ApiException as e:
+        app.logger.exception("[RECONCILE] on-demand reconcile failed")
+        return jsonify(infra_error(
+            "RECONCILE_NODEPORTS",
+            "K8S_LIST_FAILED",
+            str(e),
+            **k8s_error_fields(e),
+        )), 500
+    except Exception as e:
+        app.logger.exception("[RECONCILE] on-demand reconcile failed")
+        return jsonify(infra_error(
+            "RECONCILE_NODEPORTS",
+            "NODEPORT_RECONCILE_FAILED",
+            str(e),
+        )), 500
+    return jsonify(summary), 200
 
 
 def get_cluster_reserved_nodeports() -> set:
@@ -278,7 +502,14 @@ def get_cluster_reserved_nodeports() -> set:
     고정 NodePort로 배포된 자기 자신이나 수동으로 생성된 Service가 점유한
     포트는 DB만 봐서는 알 수 없다. 그런 포트가 available로 잘못 계산되면
     이후 Service 생성 단계에서 "already allocated"로 실패한다.
+
+    평소에는 Service watch로 유지되는 집합(service_ports)을 바로 쓰고,
+    watch가 동기화 전이거나 stale일 때만 모든 Service를 직접 list한다.
     """
+    reserved = service_ports.reserved_ports()
+    if reserved is not None:
+        return set(reserved)
+    app.logger.info(f"[NODEPORT] service watch not healthy ({service_ports.get_state()}), listing services")
     load_k8s()
     v1 = client.CoreV1Api()
     reserved = set()
@@ -289,6 +520,64 @@ def get_cluster_reserved_nodeports() -> set:
     return reserved
 
 
+_nodeport_bitmap: Optional[NodePortBitmap] = None
+_nodeport_bitmap_guard = threading.Lock()
+# node_port UNIQUE key 확인 결과. key가 있으면 계속 쓰고, 없으면 _NODEPORT_UNIQUE_RECHECK_SEC마다 다시 확인한다
+# (중복 행 정리 후 다음 migration 실행이 key를 추가할 수 있다). None이면 아직 확인 전.
+_nodeport_unique_key: Optional[bool] = None
+_nodeport_unique_checked_at = 0.0
+_NODEPORT_UNIQUE_RECHECK_SEC = 300
+
+_MYSQL_DUP_ENTRY = 1062
+
+
+def _get_nodeport_bitmap() -> NodePortBitmap:
+    global _nodeport_bitmap
+    with _nodeport_bitmap_guard:
+        if _nodeport_bitmap is None:
+            _nodeport_bitmap = NodePortBitmap(app.config["NODEPORT_MIN"], app.config["NODEPORT_MAX"])
+        return _nodeport_bitmap
+
+
+def _refresh_nodeport_bitmap(bitmap: NodePortBitmap, cur) -> None:
+    """DB에 기록된 포트와 클러스터에서 이미 쓰이는 NodePort로 bitmap을 다시 채운다."""
+    cur.execute("SELECT node_port FROM nodeport_allocations")
+    used = {row[0] for row in cur.fetchall()}
+    try:
+        used |= get_cluster_reserved_nodeports()
+    except Exception:
+        app.logger.warning(
+            "[NODEPORT] failed to query live k8s nodeport usage, "
+            "falling back to DB-only availability check",
+            exc_info=True,
+        )
+    bitmap.reset(used)
+    app.logger.debug(f"[NODEPORT] bitmap refreshed used={len(used)} free={bitmap.free_count()}")
+
+
+def _ensure_nodeport_unique_key(cur) -> bool:
+    """
+    행 단위 INSERT claim이 안전하려면 node_port에 UNIQUE key가 있어야 한다 (migrations 0003이 추가).
+    migration이 실패해 key가 없으면 False를 반환해 named lock 방식으로 할당하게 한다.
+    """
+    global _nodeport_unique_key, _nodeport_unique_checked_at
+    if _nodeport_unique_key or (
+        _nodeport_unique_key is False
+        and time.monotonic() - _nodeport_unique_checked_at < _NODEPORT_UNIQUE_RECHECK_SEC
+    ):
+        return _nodeport_unique_key
+    cur.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='nodeport_allocations' "
+        "AND COLUMN_NAME='node_port' AND NON_UNIQUE=0 AND SEQ_IN_INDEX=1"
+    )
+    _nodeport_unique_key = cur.fetchone() is not None
+    _nodeport_unique_checked_at = time.monotonic()
+    if not _nodeport_unique_key:
+        app.logger.error("[NODEPORT] no UNIQUE key on nodeport_allocations.node_port, allocations will be serialized")
+    return _nodeport_unique_key
+
+
 def allocate_nodeports(username, pod_name, node_name, ports):
     """
     ports:
@@ -297,84 +586,172 @@ def allocate_nodeports(username, pod_name, node_name, ports):
         {"internal_port": 8888, "usage_purpose": "jupyter"},
         ...
     ]
+
+    테이블 전체를 FOR UPDATE로 잠그지 않는다. 프로세스 로컬 bitmap(NodePortBitmap)에서 빈 포트 후보를 골라
+    바로 INSERT하고, 다른 요청이 먼저 가져간 포트는 node_port UNIQUE key 충돌(duplicate entry)로 걸러
+    다음 후보로 넘어간다. 따라서 서로 다른 Pod의 할당은 병렬로 진행되고 비용은 요청 포트 수에 비례한다.
+    bitmap은 NODEPORT_BITMAP_REFRESH_SEC마다 DB와 클러스터 Service 상태로 다시 채운다. 후보가 바닥나면
+    "Not enough NodePorts"를 올리기 전에 한 번 더 다시 채워, 그 사이 해제된 포트를 쓸 수 있게 한다.
     """
     app.logger.info(f"[NODEPORT] allocate start username={username} pod={pod_name} node={node_name}")
     app.logger.debug(f"[NODEPORT] requested ports={ports}")
 
-    # 포트 할당 전에 MySQL과 k8s 실제 상태를 동기화한다.
-    # stale 행이 정리되어야 available 포트 계산이 정확해짐/
-    # 5분 쓰로틀 적용 — in-flight pod 오탐 방지 및 k8s/DB 부하 줄어듬
-    reconcile_nodeport_allocations(namespace=app.config["NAMESPACE"])
+    # stale 행 정리는 leader 주기 작업(reconcile_nodeport_allocations)이 따로 한다.
+    # 새 행은 reserved 상태와 만료 시각(NODEPORT_LEASE_TTL_SEC)을 갖고 들어가므로, 아직 Pod가 없어도
+    # reconcile이 지우지 않는다. Service 생성 후 bind_nodeports()가 bound로 바꾼다.
+
+    if not ports:
+        # gateway 모드에서 additional_ports가 없는 Pod — DB에 기록할 것이 없다.
+        return []
 
+    bitmap = _get_nodeport_bitmap()
     conn = get_db_connection() #DB 연결
+    claimed = []
+    serialized = False
 
     try:
         with conn.cursor() as cur: #DB 커서 생성 (python pymysql 라이브러리)
-
-            cur.execute("SELECT node_port FROM nodeport_allocations FOR UPDATE")
-            used = {row[0] for row in cur.fetchall()}
-
-            try:
-                used |= get_cluster_reserved_nodeports()
-            except Exception:
-                app.logger.warning(
-                    "[NODEPORT] failed to query live k8s nodeport usage, "
-                    "falling back to DB-only availability check",
-                    exc_info=True,
-                )
-
-            app.logger.debug(f"[NODEPORT] used ports count={len(used)}")
-            available = [
-                p for p in range(30000, 32768)
-                if p not in used
-            ]
-
-            app.logger.debug(f"[NODEPORT] available ports count={len(available)}")
-
-            if len(available) < len(ports):
-                raise ValueError("Not enough NodePorts")
+            if not _ensure_nodeport_unique_key(cur):
+                # UNIQUE key가 없으면 중복 INSERT를 DB가 막아주지 못하므로 named lock으로 직렬화하고
+                # lock 안에서 bitmap을 DB 상태와 정확히 맞춘다.
+                cur.execute("SELECT GET_LOCK('nodeport_allocations', 30)")
+                if cur.fetchone()[0] != 1:
+                    raise RuntimeError("nodeport allocation lock timeout")
+                serialized = True
+                _refresh_nodeport_bitmap(bitmap, cur)
+            elif bitmap.is_stale(app.config["NODEPORT_BITMAP_REFRESH_SEC"]):
+                _refresh_nodeport_bitmap(bitmap, cur)
 
             result_ports = []
+            conflicts = 0
+            refreshed_on_exhaustion = serialized  # 직렬화 모드는 방금 DB와 맞췄으므로 다시 읽지 않는다
 
-            for idx, port in enumerate(ports):
+            for port in ports:
                 app.logger.debug(f"[NODEPORT] assigning internal_port={port['internal_port']}")
 
-                node_port = available[idx]
-                app.logger.info(f"[NODEPORT] allocated {port['internal_port']} -> {node_port}")
-
-                cur.execute("""
-                    INSERT INTO nodeport_allocations
-                    (username, pod_name, node_name, internal_port, node_port, purpose)
-                    VALUES (%s,%s,%s,%s,%s,%s)
-                """, (
-                    username,
-                    pod_name,
-                    node_name,
-                    port["internal_port"],
-                    node_port,
-                    port.get("usage_purpose", "custom")
-                ))
+                while True:
+                    node_port = bitmap.take()
+                    if node_port is None and not refreshed_on_exhaustion:
+                        # 해제된 포트는 refresh 전까지 bitmap에 사용 중으로 남으므로, 한 번 다시 채워 보고 판단한다.
+                        # 이 transaction에서 INSERT한 행도 보이므로 이미 잡은 포트는 사용 중으로 남는다.
+                        app.logger.info("[NODEPORT] bitmap exhausted, refreshing once before giving up")
+                        _refresh_nodeport_bitmap(bitmap, cur)
+                        refreshed_on_exhaustion = True
+                        node_port = bitmap.take()
+                    if node_port is None:
+                        raise ValueError("Not enough NodePorts")
+                    try:
+                        cur.execute("""
+                            INSERT INTO nodeport_allocations
+                            (username, pod_name, node_name, internal_port, node_port, purpose,
+                             lease_state, lease_expires_at)
+                            VALUES (%s,%s,%s,%s,%s,%s,'reserved', NOW() + INTERVAL %s SECOND)
+                        """, (
+                            username,
+                            pod_name,
+                            node_name,
+                            port["internal_port"],
+                            node_port,
+                            port.get("usage_purpose", "custom"),
+                            app.config["NODEPORT_LEASE_TTL_SEC"],
+                        ))
+                    except pymysql.err.IntegrityError as e:
+                        if e.args[0] != _MYSQL_DUP_ENTRY:
+                            bitmap.release(node_port)
+                            raise
+                        # 다른 worker/Pod가 먼저 가져간 포트 — bitmap에는 사용 중으로 남기고 다음 후보
+                        conflicts += 1
+                        continue
+                    claimed.append(node_port)
+                    break
 
+                app.logger.info(f"[NODEPORT] allocated {port['internal_port']} -> {node_port}")
                 result_ports.append({
                     "internal_port": port["internal_port"],
                     "external_port": node_port,
                     "usage_purpose": port.get("usage_purpose", "custom")
                 })
-            app.logger.info(f"[NODEPORT] allocation success total={len(result_ports)}")
             conn.commit() #Commit changes to stable storage.
+            app.logger.info(f"[NODEPORT] allocation success total={len(result_ports)} conflicts={conflicts}")
             return result_ports #Return the allocated ports.
 
     except ValueError:
         conn.rollback()
+        for node_port in claimed:
+            bitmap.release(node_port)
         raise
     except Exception:
         app.logger.exception(f"[NODEPORT] allocation failed pod={pod_name}")
         conn.rollback()
+        for node_port in claimed:
+            bitmap.release(node_port)
         raise
     finally:
+        if serialized:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT RELEASE_LOCK('nodeport_allocations')")
+            except Exception:
+                pass
         conn.close()
     
+@app.route("/nodeport/status", methods=["GET"])
+def get_nodeport_status():
+    """
+    NodePort 할당 상태 조회
+
+    이 worker의 할당 후보 bitmap과 클러스터 NodePort watch(service_ports)의 상태를 반환한다.
+    watch.healthy가 false면 allocate_nodeports()는 Service를 직접 list하고, 그것도 실패하면 DB 기록만으로 판단한다.
+
+    ---
+    tags:
+    - NodePort
+
+    summary: NodePort 할당 상태
+
+    responses:
+      200:
+        description: 조회 성공
+        schema:
+          type: object
+          properties:
+            range:
+              type: object
+            bitmap:
+              type: object
+              properties:
+                free:
+                  type: integer
+                age_sec:
+                  type: number
+            watch:
+              type: object
+              properties:
+                synced:
+                  type: boolean
+                healthy:
+                  type: boolean
+                staleness_sec:
+                  type: number
+                services_with_nodeports:
+                  type: integer
+                reserved_nodeports:
+                  type: integer
+    """
+    bitmap = _get_nodeport_bitmap()
+    loaded = bitmap.loaded_at is not None
+    return jsonify({
+        "range": {"min": app.config["NODEPORT_MIN"], "max": app.config["NODEPORT_MAX"]},
+        "bitmap": {
+            "free": bitmap.free_count() if loaded else None,
+            "age_sec": round(time.monotonic() - bitmap.loaded_at, 1) if loaded else None,
+        },
+        "watch": service_ports.get_state(),
+    }), 200
+
+
 def release_nodeports(pod_name):
+    """Pod의 NodePort 할당 행과 GPU device 할당 행(gpu_device_allocations)을 한 transaction으로 삭제한다."""
     app.logger.info(f"[NODEPORT] release start pod={pod_name}")
     conn = get_db_connection()
     try:
@@ -385,6 +762,10 @@ def release_nodeports(pod_name):
                 "DELETE FROM nodeport_allocations WHERE pod_name=%s",
                 (pod_name,)
             )
+            cur.execute(
+                "DELETE FROM gpu_device_allocations WHERE pod_name=%s",
+                (pod_name,)
+            )
 
         conn.commit()
         app.logger.info(f"[NODEPORT] release complete pod={pod_name}")
@@ -395,77 +776,413 @@ def release_nodeports(pod_name):
         conn.close()
 
 
-@app.route("/create-pod", methods=["POST"])
-def create_pod():
+def create_pod_services(username, ns, pod_name, allocated_ports) -> None:
     """
-    사용자 컨테이너 Pod 생성 API
+    Pod가 Ready가 된 뒤 외부 접속 경로를 만든다.
+    allocated_ports의 NodePort Service와, gateway 모드면 ssh/jupyter용 ClusterIP Service·Ingress를 만든다.
+    """
+    create_nodeport_services(username, ns, pod_name, allocated_ports)
+    if app.config["POD_ACCESS_MODE"] == "gateway":
+        create_gateway_routes(
+            username, ns, pod_name,
+            jupyter_host=f"{username}.{app.config['GATEWAY_JUPYTER_DOMAIN']}",
+            ingress_class=app.config["GATEWAY_INGRESS_CLASS"],
+            tls_secret=app.config["GATEWAY_TLS_SECRET"],
+        )
 
-    이 API는 Kubernetes에 사용자 Pod를 생성합니다.
 
-    동작 과정
+def _pod_access_fields(username) -> dict:
+    """gateway 모드일 때 응답에 더할 공용 SSH/Jupyter 접속 정보. nodeport 모드면 빈 dict (기존 응답 그대로)."""
+    if app.config["POD_ACCESS_MODE"] != "gateway":
+        return {}
+    scheme = "https" if app.config["GATEWAY_TLS_SECRET"] else "http"
+    return {
+        "access": {
+            "mode": "gateway",
+            "ssh": {
+                "host": app.config["GATEWAY_SSH_HOST"],
+                "port": app.config["GATEWAY_SSH_PORT"],
+                "username": username,
+            },
+            "jupyter_url": f"{scheme}://{username}.{app.config['GATEWAY_JUPYTER_DOMAIN']}/",
+        }
+    }
 
-    1. WAS 서버에서 사용자 설정 조회
-    2. GPU 노드 중 가장 적합한 노드 선택
-    3. NodePort 자동 할당
-    4. Pod 생성
-    5. Service 생성
 
-    ---
-    tags:
-    - Pod
+def bind_nodeports(pod_name) -> None:
+    """
+    Service까지 만들어진 Pod의 할당 행을 reserved → bound로 바꿔 lease 만료 대상에서 뺀다.
+    실패해도 Pod 생성은 계속한다. lease가 만료되면 reclaim_expired_nodeport_leases()가 Service를 확인하고 bound로 바꾼다.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            bound = cur.execute(
+                "UPDATE nodeport_allocations SET lease_state='bound', lease_expires_at=NULL "
+                "WHERE pod_name=%s AND lease_state='reserved'",
+                (pod_name,),
+            )
+        conn.commit()
+        app.logger.info(f"[NODEPORT] bound pod={pod_name} rows={bound}")
+    except Exception:
+        conn.rollback()
+        app.logger.warning(f"[NODEPORT] bind failed pod={pod_name}, left to lease reclaim", exc_info=True)
+    finally:
+        conn.close()
 
-    summary: 사용자 Pod 생성
 
-    description: |
-        특정 사용자 환경을 Kubernetes Pod로 생성합니다.
+def reclaim_expired_nodeport_leases(namespace: Optional[str] = None) -> dict:
+    """
+    lease가 만료된 reserved 행을 회수한다. leader 주기 작업(NODEPORT_LEASE_RECLAIM_INTERVAL_SEC)이다.
 
-    consumes:
-    - application/json
+    - 그 사이 Service가 만들어졌으면(bind 전에 worker가 죽은 경우 등) bound로 바꾼다.
+    - 나머지는 Pod 생성이 실패/중단된 할당이므로 바로 삭제해 포트를 돌려준다.
+    만료된 행이 없으면 index 조회 한 번으로 끝나고 k8s는 호출하지 않는다.
+    """
+    namespace = namespace or app.config["NAMESPACE"]
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT pod_name FROM nodeport_allocations "
+                "WHERE lease_state='reserved' AND lease_expires_at <= NOW()"
+            )
+            expired = sorted(row[0] for row in cur.fetchall())
+            if not expired:
+                return {"expired_pods": 0, "bound_rows": 0, "reclaimed_rows": 0}
 
-    produces:
-    - application/json
+            load_k8s()
+            services = client.CoreV1Api().list_namespaced_service(
+                namespace=namespace, label_selector="app=ailab-nodeport"
+            )
+            with_service = {
+                svc.metadata.labels["pod_name"]
+                for svc in services.items
+                if svc.metadata.labels and "pod_name" in svc.metadata.labels
+            }
+            to_bind = [p for p in expired if p in with_service]
+            to_reclaim = [p for p in expired if p not in with_service]
+
+            bound = reclaimed = 0
+            # WHERE에 lease 조건을 다시 걸어, 조회 후 bind_nodeports()가 먼저 바꾼 행은 건드리지 않는다.
+            if to_bind:
+                placeholders = ",".join(["%s"] * len(to_bind))
+                bound = cur.execute(
+                    "UPDATE nodeport_allocations SET lease_state='bound', lease_expires_at=NULL "
+                    f"WHERE pod_name IN ({placeholders}) AND lease_state='reserved'",
+                    to_bind,
+                )
+            if to_reclaim:
+                placeholders = ",".join(["%s"] * len(to_reclaim))
+                reclaimed = cur.execute(
+                    "DELETE FROM nodeport_allocations "
+                    f"WHERE pod_name IN ({placeholders}) AND lease_state='reserved' AND lease_expires_at <= NOW()",
+                    to_reclaim,
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-    parameters:
+    app.logger.info(
+        f"[NODEPORT] lease reclaim expired_pods={len(expired)} bound_rows={bound} reclaimed_rows={reclaimed}"
+    )
+    return {"expired_pods": len(expired), "bound_rows": bound, "reclaimed_rows": reclaimed}
 
-      - in: body
-        name: body
-        required: true
-        schema:
-          $ref: '#/definitions/CreatePodRequest'
 
-    responses:
+def get_pod_nodeports(pod_name):
+    """Pod에 할당된 NodePort를 allocate_nodeports()와 같은 형식으로 조회한다."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT internal_port, node_port, purpose FROM nodeport_allocations "
+                "WHERE pod_name=%s ORDER BY internal_port",
+                (pod_name,),
+            )
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    return [
+        {"internal_port": internal_port, "external_port": node_port, "usage_purpose": purpose}
+        for internal_port, node_port, purpose in rows
+    ]
 
-      201:
-        description: Pod 생성 성공
-        schema:
-          $ref: '#/definitions/CreatePodResponse'
-      400:
-        description: username 누락
-        schema:
-          $ref: '#/definitions/ErrorResponse'
-      409:
-        description: 동일 Pod 이미 존재
-        schema:
-          $ref: '#/definitions/ErrorResponse'
-      500:
-        description: 서버 내부 오류
-        schema:
-          $ref: '#/definitions/ErrorResponse'
-    """
-    data = request.get_json(force=True)
-    username = data.get("username")
 
-    app.logger.info(f"[CREATE POD] request received - username={username}")
-    if username:
-        set_pod_creation_status(username, "started", "요청 접수")
+def release_nodeports_bulk(pod_names) -> int:
+    """여러 Pod의 NodePort·GPU device 할당 row를 삭제하고 삭제된 row 수(두 table 합)를 반환한다."""
+    pod_names = list(pod_names)
+    if not pod_names:
+        return 0
+    app.logger.info(f"[NODEPORT] bulk release start pods={len(pod_names)}")
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            placeholders = ",".join(["%s"] * len(pod_names))
+            deleted = cur.execute(
+                f"DELETE FROM nodeport_allocations WHERE pod_name IN ({placeholders})",
+                pod_names,
+            )
+            deleted += cur.execute(
+                f"DELETE FROM gpu_device_allocations WHERE pod_name IN ({placeholders})",
+                pod_names,
+            )
+        conn.commit()
+        app.logger.info(f"[NODEPORT] bulk release complete rows={deleted}")
+        return deleted
+    except Exception:
+        conn.rollback()
+        app.logger.exception("[NODEPORT] bulk release failed")
+        raise
+    finally:
+        conn.close()
 
-    if not username:
-        app.logger.warning("[CREATE POD] username missing in request")
-        return jsonify(infra_error(
-            "VALIDATE_REQUEST",
-            "INVALID_CREATE_POD_REQUEST",
-            "username required",
-        )), 400
+
+# ////////////////////// GPU device 할당 //////////////////////
+
+def _node_gpu_loads(node_name: str) -> Optional[dict]:
+    """노드의 {gpu index: load}. DCGM 조회가 실패하면 node_scores cache의 GPU 개수로 load 0을 채우고, 그것도 없으면 None."""
+    try:
+        loads = query_gpu_device_loads(node_name, prom_url_for(node_name), app.config["HTTP_TIMEOUT_SEC"])
+        if loads:
+            return loads
+        app.logger.warning(f"[GPU DEVICE] no per-GPU DCGM metrics for node={node_name}")
+    except Exception as e:
+        app.logger.warning(f"[GPU DEVICE] per-GPU load query failed node={node_name}: {e}")
+    counts = node_scores.lookup_gpu_counts([node_name], app.config["NODE_SCORE_MAX_AGE_SEC"])
+    count = (counts or {}).get(node_name)
+    if not count:
+        return None
+    return {idx: 0.0 for idx in range(count)}
+
+
+def allocate_gpu_devices(username, pod_name, node_name, num_gpu) -> List[int]:
+    """
+    node_name에서 비어 있는 GPU index num_gpu개를 골라 gpu_device_allocations에 기록하고 반환한다.
+
+    - 후보는 DCGM이 보고하는 GPU 중 다른 Pod가 점유하지 않은 것이고, GPU별 load가 낮은 순(같으면 index 순)으로 고른다.
+    - allocate_nodeports()와 같이 테이블을 잠그지 않는다. 동시에 같은 GPU를 고르면 (node_name, gpu_index)
+      UNIQUE key 충돌로 걸러 다음 후보로 넘어간다.
+    - pod_name에 이미 기록된 GPU가 있으면(warm pool standby Pod를 claim한 경우) 그 index를 그대로 쓴다.
+    - 노드의 GPU 구성을 알 수 없으면(DCGM, cache 모두 없음) 이 노드에 기록된 index를 뺀 가장 작은 index부터
+      같은 방식으로 기록해 쓴다. 기록 없이 0..num_gpu-1을 내주면 다른 Pod와 같은 GPU를 mount할 수 있기 때문이다.
+
+    Raises:
+        ValueError: 빈 GPU가 num_gpu개보다 적을 때
+    """
+    if not num_gpu:
+        return []
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT gpu_index FROM gpu_device_allocations WHERE pod_name=%s ORDER BY gpu_index",
+                (pod_name,),
+            )
+            existing = [row[0] for row in cur.fetchall()]
+            if existing:
+                if username:
+                    cur.execute(
+                        "UPDATE gpu_device_allocations SET username=%s WHERE pod_name=%s",
+                        (username, pod_name),
+                    )
+                    conn.commit()
+                app.logger.info(f"[GPU DEVICE] reusing pod={pod_name} node={node_name} gpus={existing}")
+                return existing
+
+            cur.execute("SELECT gpu_index FROM gpu_device_allocations WHERE node_name=%s", (node_name,))
+            used = {row[0] for row in cur.fetchall()}
+
+            loads = _node_gpu_loads(node_name)
+            if loads is None:
+                # GPU 개수를 모르므로 기록된 index를 피해 앞에서부터 채운다 (후보는 최소 num_gpu개)
+                app.logger.warning(
+                    f"[GPU DEVICE] GPU layout unknown for node={node_name}, using lowest unrecorded indices pod={pod_name}"
+                )
+                loads = {idx: 0.0 for idx in range(len(used) + num_gpu)}
+            candidates = sorted((idx for idx in loads if idx not in used), key=lambda idx: (loads[idx], idx))
+
+            claimed = []
+            for idx in candidates:
+                if len(claimed) == num_gpu:
+                    break
+                try:
+                    cur.execute(
+                        "INSERT INTO gpu_device_allocations (username, pod_name, node_name, gpu_index) "
+                        "VALUES (%s,%s,%s,%s)",
+                        (username, pod_name, node_name, idx),
+                    )
+                except pymysql.err.IntegrityError as e:
+                    if e.args[0] != _MYSQL_DUP_ENTRY:
+                        raise
+                    # 조회 후 다른 요청이 먼저 가져간 GPU — 다음 후보
+                    continue
+                claimed.append(idx)
+
+            if len(claimed) < num_gpu:
+                raise ValueError(
+                    f"Not enough free GPUs on node {node_name} (requested={num_gpu}, free={len(claimed)})"
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    claimed.sort()
+    app.logger.info(
+        f"[GPU DEVICE] allocated pod={pod_name} node={node_name} gpus={claimed} "
+        f"loads={ {idx: loads[idx] for idx in claimed} }"
+    )
+    return claimed
+
+
+def release_gpu_devices(pod_name) -> None:
+    """Pod의 GPU device 할당 행을 삭제한다. NodePort 행까지 지울 때는 release_nodeports()가 함께 지운다."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            released = cur.execute("DELETE FROM gpu_device_allocations WHERE pod_name=%s", (pod_name,))
+        conn.commit()
+        app.logger.info(f"[GPU DEVICE] released pod={pod_name} rows={released}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@app.route("/create-pod", methods=["POST"])
+@POD_CREATIONS_IN_FLIGHT.track_inprogress()
+def create_pod():
+    """
+    사용자 컨테이너 Pod 생성 API
+
+    이 API는 Kubernetes에 사용자 Pod를 생성합니다.
+
+    동작 과정
+
+    0. 같은 사용자의 생성 요청이 이미 진행 중이면 그 결과를 기다려 그대로 반환 (joined=true),
+       Running 상태의 사용자 Pod가 이미 있으면 새로 만들지 않고 그 Pod를 반환 (200, status=exists)
+    1. WAS 서버에서 사용자 설정 조회
+    2. GPU 노드 중 가장 적합한 노드 선택
+    3. NodePort 자동 할당
+    4. Pod 생성
+    5. Service 생성
+
+    ---
+    tags:
+    - Pod
+
+    summary: 사용자 Pod 생성
+
+    description: |
+        특정 사용자 환경을 Kubernetes Pod로 생성합니다.
+
+    consumes:
+    - application/json
+
+    produces:
+    - application/json
+
+    parameters:
+
+      - in: body
+        name: body
+        required: true
+        schema:
+          $ref: '#/definitions/CreatePodRequest'
+
+    responses:
+
+      200:
+        description: 이미 Running 중인 사용자 Pod 반환 (status=exists)
+        schema:
+          $ref: '#/definitions/CreatePodResponse'
+      201:
+        description: Pod 생성 성공
+        schema:
+          $ref: '#/definitions/CreatePodResponse'
+      400:
+        description: username 누락
+        schema:
+          $ref: '#/definitions/ErrorResponse'
+      409:
+        description: 동일 Pod 이미 존재
+        schema:
+          $ref: '#/definitions/ErrorResponse'
+      500:
+        description: 서버 내부 오류
+        schema:
+          $ref: '#/definitions/ErrorResponse'
+    """
+    data = request.get_json(force=True)
+    username = data.get("username")
+
+    app.logger.info(f"[CREATE POD] request received - username={username}")
+
+    if not username:
+        app.logger.warning("[CREATE POD] username missing in request")
+        return jsonify(infra_error(
+            "VALIDATE_REQUEST",
+            "INVALID_CREATE_POD_REQUEST",
+            "username required",
+        )), 400
+
+    # 같은 사용자의 겹친 요청(더블 클릭, WAS 재시도)은 한 번만 생성하고 나머지는 그 결과를 받는다.
+    flight, joined = single_flight.lead_or_join(f"create_pod:{username}", app.config["CREATE_POD_JOIN_WAIT_SEC"])
+    if flight is None:
+        if joined is None:
+            app.logger.warning(f"[CREATE POD] in-flight creation did not finish in time - username={username}")
+            return jsonify(infra_error(
+                "JOIN_CREATE_POD",
+                "CREATE_POD_IN_PROGRESS",
+                "another creation for this user is still in progress",
+            )), 409
+        app.logger.info(f"[CREATE POD] joined in-flight creation - username={username}")
+        return jsonify({**joined["body"], "joined": True}), joined["status_code"]
+
+    try:
+        response, status_code = _existing_pod_response(username) or _create_pod(username)
+        flight.publish({"status_code": status_code, "body": response.get_json()})
+        return response, status_code
+    finally:
+        flight.release()
+
+
+def _existing_pod_response(username):
+    """
+    사용자의 Running Pod가 이미 있으면 (응답, 200)을, 없으면 None을 반환한다.
+    삭제 job이 진행 중인 Pod는 곧 사라지므로 없는 것으로 본다.
+    """
+    ns = app.config["NAMESPACE"]
+    try:
+        pod_name = get_existing_pod(ns, username)
+        if pod_name is None or delete_jobs.is_pending(pod_name):
+            return None
+        pod = client.CoreV1Api().read_namespaced_pod(pod_name, ns)
+        ports = get_pod_nodeports(pod_name)
+    except Exception:
+        app.logger.warning(f"[CREATE POD] existing pod lookup failed, creating new - username={username}", exc_info=True)
+        return None
+
+    app.logger.info(f"[CREATE POD] returning existing pod={pod_name} - username={username}")
+    return jsonify({
+        "status": "exists",
+        "node": pod.spec.node_name,
+        "pod_name": pod_name,
+        "ports": ports,
+        **_pod_access_fields(username),
+    }), 200
+
+
+def _create_pod(username):
+    """create_pod()에서 single-flight leader가 된 요청의 실제 생성 과정."""
+    set_pod_creation_status(username, "started", "요청 접수")
 
     ns = app.config["NAMESPACE"]
 
@@ -503,13 +1220,42 @@ def create_pod():
 
         return rollback
 
+    def check_pod_exists(v1, pod_name):
+        try:
+            v1.read_namespaced_pod(pod_name, ns)
+            return True
+        except client.exceptions.ApiException as e:
+            if e.status != 404:
+                raise
+            return False
+
     try:
+        pod_name = generate_pod_name(username)
+        app.logger.info(f"[CREATE POD] generated pod_name={pod_name}")
+
+        # pod_name 중복 확인은 WAS 응답과 무관하므로 WAS 조회와 동시에 진행한다.
+        try:
+            load_k8s()
+            v1 = client.CoreV1Api()
+        except Exception as e:
+            app.logger.exception("[CREATE POD] k8s client setup failed")
+            return jsonify(infra_error(
+                "CHECK_EXISTING_POD",
+                "K8S_CLIENT_SETUP_FAILED",
+                str(e),
+                pod_name=pod_name,
+            )), 500
+        exists_future = call_in_background(check_pod_exists, v1, pod_name)
+
         # WAS 조회
         was_url = app.config["WAS_URL_TEMPLATE"].format(username=username)
         app.logger.info(f"[CREATE POD] requesting user config from WAS: {was_url}")
 
         try:
-            resp = requests.get(was_url, timeout=app.config["HTTP_TIMEOUT_SEC"])
+            with track_outbound("was"):
+                resp = requests.get(was_url, timeout=app.config["HTTP_TIMEOUT_SEC"])
+                if resp.status_code >= 400:
+                    record_outbound_error("was", f"http_{resp.status_code}")
             user_info = resp.json()
         except requests.RequestException as e:
             app.logger.exception("[CREATE POD] WAS request failed")
@@ -547,42 +1293,25 @@ def create_pod():
 
         app.logger.debug(f"[CREATE POD] user_info received: {user_info}")
 
-        pod_name = generate_pod_name(username)
-        app.logger.info(f"[CREATE POD] generated pod_name={pod_name}")
-
-        # pod_name 중복 확인
-        try:
-            load_k8s()
-            v1 = client.CoreV1Api()
-        except Exception as e:
-            app.logger.exception("[CREATE POD] k8s client setup failed")
-            return jsonify(infra_error(
-                "CHECK_EXISTING_POD",
-                "K8S_CLIENT_SETUP_FAILED",
-                str(e),
-                pod_name=pod_name,
-            )), 500
-
         try:
-            v1.read_namespaced_pod(pod_name, ns)
-            app.logger.warning(f"[CREATE POD] pod already exists: {pod_name}")
-            return jsonify(infra_error(
-                "CHECK_EXISTING_POD",
-                "POD_ALREADY_EXISTS",
-                "pod already exists",
-                pod_name=pod_name,
-            )), 409
-        except client.exceptions.ApiException as e:
-            if e.status != 404:
-                app.logger.exception("[CREATE POD] pod existence check failed")
+            if exists_future.result():
+                app.logger.warning(f"[CREATE POD] pod already exists: {pod_name}")
                 return jsonify(infra_error(
                     "CHECK_EXISTING_POD",
-                    "POD_CHECK_FAILED",
-                    e.body,
+                    "POD_ALREADY_EXISTS",
+                    "pod already exists",
                     pod_name=pod_name,
-                    **k8s_error_fields(e),
-                )), 500
+                )), 409
             app.logger.debug("[CREATE POD] pod does not exist yet")
+        except client.exceptions.ApiException as e:
+            app.logger.exception("[CREATE POD] pod existence check failed")
+            return jsonify(infra_error(
+                "CHECK_EXISTING_POD",
+                "POD_CHECK_FAILED",
+                e.body,
+                pod_name=pod_name,
+                **k8s_error_fields(e),
+            )), 500
         except Exception as e:
             app.logger.exception("[CREATE POD] pod existence check failed")
             return jsonify(infra_error(
@@ -592,7 +1321,18 @@ def create_pod():
                 pod_name=pod_name,
             )), 500
 
-        # Prometheus 기반 노드 선택
+        # WAS 설정 이미지를 후보 GPU 노드마다 pre-pull 대상으로 기록
+        image_prepull.record_image_use(
+            [str(n["node_name"]).strip().lower() for n in user_info.get("gpu_nodes", []) if n.get("node_name")],
+            user_info.get("image"),
+        )
+
+        # 사용자 이미지 로드(docker load)는 노드와 무관하므로 노드 선택과 겹쳐서 미리 시작한다.
+        image_future = None
+        if user_info.get("image"):
+            image_future = call_in_background(load_user_image, username, user_info["image"])
+
+        # 노드 선택 (scheduler: capacity filter + policy)
         gpu_nodes = user_info.get("gpu_nodes", [])
         node_list = [
             str(n["node_name"]).strip().lower()
@@ -635,10 +1375,10 @@ def create_pod():
         set_pod_creation_status(username, "selecting_node", "GPU 노드 선택 중")
 
         try:
-            best_node = select_best_node_from_prometheus(
+            best_node = scheduler.select_node(
                 node_list,
-                app.config["PROM_URL"],
-                app.config["HTTP_TIMEOUT_SEC"]
+                {node: _node_resources(user_info, node)[2] for node in node_list},
+                _warm_pool_profile_keys(user_info, node_list) if app.config["WARM_POOL_ENABLED"] else None,
             )
         except Exception as e:
             app.logger.exception("[CREATE POD] node selection failed")
@@ -651,20 +1391,40 @@ def create_pod():
             )), 500
         app.logger.info(f"[CREATE POD] selected best node: {best_node}")
 
+        if app.config["WARM_POOL_ENABLED"] and best_node:
+            try:
+                warm = _create_from_warm_pool(username, user_info, best_node, image_future)
+            except Exception:
+                app.logger.warning("[CREATE POD] warm pool path failed, falling back to cold start", exc_info=True)
+                warm = None
+            if warm is not None:
+                warm_pod_name, warm_node, warm_ports = warm
+                app.logger.info(f"[CREATE POD] success (warm pool) - pod={warm_pod_name}, node={warm_node}")
+                set_pod_creation_status(username, "ready", f"생성 완료 (node={warm_node})", node=warm_node)
+                return jsonify({
+                    "status": "created",
+                    "node": warm_node,
+                    "pod_name": warm_pod_name,
+                    "ports": warm_ports,
+                    "warm_pool": True,
+                    **_pod_access_fields(username),
+                }), 201
+
         # Pod spec 생성
         app.logger.info("[CREATE POD] building pod spec")
-        set_pod_creation_status(username, "building_pod_spec", f"pod spec 생성 중 (node={best_node})")
+        set_pod_creation_status(username, "building_pod_spec", f"pod spec 생성 중 (node={best_node})", node=best_node)
 
         try:
             if not best_node:
                 raise ValueError(
-                    "no suitable node selected (check gpu_nodes and Prometheus metrics)"
+                    "no suitable node selected (check gpu_nodes, Prometheus metrics and GPU capacity)"
                 )
             spec_wrapper, allocated_ports = build_pod_spec(
                 username,
                 user_info,
                 best_node,
-                pod_name
+                pod_name,
+                image_future=image_future,
             )
         except PodSpecBuildError as e:
             set_pod_creation_status(username, "failed", "pod spec 생성 실패")
@@ -698,6 +1458,10 @@ def create_pod():
 
         pod_spec = spec_wrapper["config"]["kubernetes"]["pod"]
         app.logger.info("[CREATE POD] pod spec built")
+        image_prepull.record_image_use(
+            [pod_spec["spec"]["nodeName"]],
+            pod_spec["spec"]["containers"][0]["image"],
+        )
 
         try:
             load_k8s()
@@ -802,7 +1566,7 @@ def create_pod():
         app.logger.info("[CREATE POD] creating NodePort services")
         set_pod_creation_status(username, "creating_services", "NodePort 서비스 생성 중")
         try:
-            create_nodeport_services(username, ns, pod_name, allocated_ports)
+            create_pod_services(username, ns, pod_name, allocated_ports)
         except client.exceptions.ApiException as e:
             app.logger.exception("[CREATE POD] service creation failed")
             set_pod_creation_status(username, "failed", "서비스 생성 실패")
@@ -828,15 +1592,17 @@ def create_pod():
             )), 500
 
         app.logger.info("[CREATE POD] services created successfully")
+        bind_nodeports(pod_name)
 
         app.logger.info(f"[CREATE POD] success - pod={pod_name}, node={best_node}")
-        set_pod_creation_status(username, "ready", f"생성 완료 (node={best_node})")
+        set_pod_creation_status(username, "ready", f"생성 완료 (node={best_node})", node=best_node)
 
         return jsonify({
             "status": "created",
             "node": best_node,
             "pod_name": pod_name,
-            "ports": allocated_ports
+            "ports": allocated_ports,
+            **_pod_access_fields(username),
         }), 201
 
     except Exception as e:
@@ -850,6 +1616,109 @@ def create_pod():
         )), 500
 
 
+def _containerssh_attach_config(username: str, pod_name: str) -> dict:
+    """ContainerSSH가 기존 Pod의 shell container에 attach하도록 하는 /config 응답."""
+    ns = app.config["NAMESPACE"]
+    return {
+        "config": {
+            "backend": "kubernetes",
+            "kubernetes": {
+                "connection": {
+                    "host": "https://kubernetes.default.svc",
+                    "cacertFile": "/var/run/secrets/kubernetes.io/serviceaccount/ca.crt",
+                    "bearerTokenFile": "/var/run/secrets/kubernetes.io/serviceaccount/token",
+                },
+                "pod": {
+                    "attach": {
+                        "podName": pod_name,
+                        "namespace": ns,
+                        "container": "shell",
+                    }
+                },
+            },
+        },
+        "environment": {
+            "USER": {"value": username, "sensitive": False},
+        },
+        "metadata": {},
+        "files": {},
+    }
+
+
+@app.route("/config", methods=["POST"])
+def containerssh_config():
+    """
+    ContainerSSH config webhook
+
+    SSH 로그인마다 ContainerSSH가 호출한다. 사용자의 Running Pod가 있으면 그 Pod에 attach하는 설정을 반환한다.
+    Pod 조회는 watch로 유지되는 메모리 index(pod_index)에서 하므로 API server를 거치지 않는다.
+    index가 아직 동기화되지 않았거나 watch가 끊긴 직후에만 get_existing_pod()로 직접 조회한다.
+    Running Pod가 없거나 비동기 삭제 job이 진행 중이면 빈 config를 반환한다 (ContainerSSH 기본 설정 사용).
+    Pod 생성은 /create-pod가 담당한다.
+
+    ---
+    tags:
+    - ContainerSSH
+
+    summary: ContainerSSH config webhook (기존 Pod attach)
+
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            username:
+              type: string
+              example: alice
+
+    responses:
+      200:
+        description: "ContainerSSH config 응답 (Pod가 있으면 config.kubernetes.pod.attach, 없으면 빈 config)"
+      500:
+        description: index 미동기화 상태에서 Kubernetes 조회 실패
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    username = data.get("username")
+    empty = {"config": {}, "environment": {}, "metadata": {}, "files": {}}
+    if not username:
+        return jsonify(empty), 200
+
+    pod_name = pod_index.lookup(username)
+    if pod_name is pod_index.NOT_SYNCED:
+        CONFIG_WEBHOOK_LOOKUPS.labels("api").inc()
+        try:
+            pod_name = get_existing_pod(app.config["NAMESPACE"], username)
+        except Exception as e:
+            app.logger.exception(f"[CONFIG] pod lookup failed user={username}")
+            return jsonify(infra_error(
+                "CONTAINERSSH_CONFIG",
+                "POD_LOOKUP_FAILED",
+                str(e),
+            )), 500
+    else:
+        CONFIG_WEBHOOK_LOOKUPS.labels("index_hit" if pod_name else "index_miss").inc()
+
+    if not pod_name:
+        app.logger.info(f"[CONFIG] no running pod user={username}")
+        return jsonify(empty), 200
+
+    # 비동기 삭제 job이 진행 중인 Pod는 곧 사라지므로 attach시키지 않는다.
+    # Redis 조회가 실패하면 로그인을 막지 않도록 삭제 중이 아닌 것으로 본다.
+    try:
+        deleting = delete_jobs.is_pending(pod_name)
+    except Exception:
+        app.logger.warning(f"[CONFIG] delete job lookup failed pod={pod_name}", exc_info=True)
+        deleting = False
+    if deleting:
+        app.logger.info(f"[CONFIG] pod is being deleted user={username} pod={pod_name}")
+        return jsonify(empty), 200
+
+    app.logger.info(f"[CONFIG] attach user={username} pod={pod_name}")
+    return jsonify(_containerssh_attach_config(username, pod_name)), 200
+
+
 @app.route("/pods/<username>/status", methods=["GET"])
 def get_pod_status(username):
     """
@@ -862,9 +1731,11 @@ def get_pod_status(username):
       - unknown            : 생성 이력 없음 (한 번도 /create-pod를 호출한 적 없음)
       - started             : 요청 접수
       - selecting_node      : GPU 노드 선택 중 (Prometheus 스코어링)
-      - building_pod_spec   : pod spec 생성 시작 (바로 아래 두 단계로 넘어가는 과도 상태)
+      - building_pod_spec   : pod spec 생성 시작 (바로 아래 단계들로 넘어가는 과도 상태)
+      - allocating_gpu      : GPU device(/dev/nvidiaN) 할당 중 (GPU를 요청한 경우에만 거침)
       - allocating_nodeport : NodePort 할당 중
       - deploying_krb5      : farm 노드에 krb5 keytab 배포 중 (KRB5_REALM 설정 시에만 거침)
+      - personalizing       : warm pool의 standby pod를 사용자용으로 개인화 중 (WARM_POOL_ENABLED 시에만 거침)
       - creating_pod        : k8s에 pod 생성 요청 중
       - waiting_ready       : 이미지 pull / 컨테이너 기동 대기 중 (보통 가장 오래 걸리는 단계)
       - creating_services   : NodePort Service 생성 중
@@ -899,8 +1770,10 @@ def get_pod_status(username):
                 - started
                 - selecting_node
                 - building_pod_spec
+                - allocating_gpu
                 - allocating_nodeport
                 - deploying_krb5
+                - personalizing
                 - creating_pod
                 - waiting_ready
                 - creating_services
@@ -931,12 +1804,204 @@ def get_pod_status(username):
     return jsonify({"username": username, **status}), 200
 
 
-def _normalize_gid_list(raw_gid) -> List[int]:
-    if raw_gid is None:
-        return []
-    if isinstance(raw_gid, list):
-        values = raw_gid
-    else:
+_pod_status_stream_slots = threading.BoundedSemaphore(app.config["POD_STATUS_STREAM_MAX_CONCURRENT"])
+
+
+@app.route("/pods/<username>/status/stream", methods=["GET"])
+def stream_pod_status(username):
+    """
+    사용자 Pod 생성 진행 상황 스트림 (Server-Sent Events)
+
+    /pods/<username>/status를 polling하는 대신, stage가 바뀔 때마다 `event: status`로 같은 JSON을 push한다.
+    연결 직후 현재 상태를 한 번 보내고, ready/failed를 보내면 서버가 연결을 닫는다.
+    현재 상태가 이미 ready/failed면 follow=true일 때만 연결을 유지해 다음 /create-pod 진행 상황을 기다린다.
+    변화가 없을 때는 POD_STATUS_STREAM_HEARTBEAT_SEC마다 `: keepalive` comment를 보내고,
+    POD_STATUS_STREAM_MAX_SEC가 지나면 `event: timeout` 후 닫는다.
+    worker마다 동시 stream이 POD_STATUS_STREAM_MAX_CONCURRENT개를 넘으면 503과 Retry-After를 돌려준다.
+
+    ---
+    tags:
+    - Pod
+
+    summary: Pod 생성 진행 상황 스트림 (SSE)
+
+    produces:
+      - text/event-stream
+
+    parameters:
+      - in: path
+        name: username
+        required: true
+        type: string
+      - in: query
+        name: follow
+        required: false
+        type: boolean
+        description: 현재 상태가 최종 단계여도 다음 생성 요청을 기다림
+
+    responses:
+      200:
+        description: "text/event-stream. 각 event의 data는 /pods/<username>/status 응답과 같은 JSON"
+      500:
+        description: 서버 내부 오류
+      503:
+        description: 동시 stream 수 초과 (Retry-After 후 다시 연결하거나 /pods/<username>/status를 polling)
+    """
+    if not _pod_status_stream_slots.acquire(blocking=False):
+        app.logger.warning(f"[POD STATUS] stream limit reached username={username}")
+        resp = jsonify(infra_error(
+            "STREAM_POD_STATUS",
+            "POD_STATUS_STREAM_LIMIT",
+            f"too many status streams (max {app.config['POD_STATUS_STREAM_MAX_CONCURRENT']} per worker)",
+        ))
+        resp.headers["Retry-After"] = str(app.config["POD_STATUS_STREAM_HEARTBEAT_SEC"])
+        return resp, 503
+
+    follow = str(request.args.get("follow", "")).lower() in ("1", "true", "yes")
+    try:
+        events = stream_pod_creation_status(
+            username,
+            max_sec=app.config["POD_STATUS_STREAM_MAX_SEC"],
+            heartbeat_sec=app.config["POD_STATUS_STREAM_HEARTBEAT_SEC"],
+            follow=follow,
+        )
+        # 첫 event(현재 상태)까지는 응답 전에 받아서 Redis 오류를 500으로 돌려준다.
+        first = next(events)
+    except Exception as e:
+        _pod_status_stream_slots.release()
+        app.logger.exception("[POD STATUS] stream subscribe failed")
+        return jsonify(infra_error(
+            "STREAM_POD_STATUS",
+            "POD_STATUS_STREAM_FAILED",
+            str(e),
+        )), 500
+
+    def generate():
+        yield f"event: status\ndata: {json.dumps({'username': username, **first})}\n\n"
+        try:
+            for data in events:
+                if data is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: status\ndata: {json.dumps({'username': username, **data})}\n\n"
+                if data.get("stage") in ("ready", "failed"):
+                    return
+        except Exception:
+            app.logger.exception("[POD STATUS] stream interrupted")
+            yield "event: error\ndata: {}\n\n"
+            return
+        finally:
+            events.close()  # 클라이언트가 끊어도 Redis 구독을 바로 정리
+        if first.get("stage") not in ("ready", "failed") or follow:
+            yield "event: timeout\ndata: {}\n\n"
+
+    resp = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # generator가 시작되기 전에 끊겨도 호출되도록 finally 대신 close hook에서 구독과 slot을 정리한다.
+    @resp.call_on_close
+    def _release_stream():
+        events.close()
+        _pod_status_stream_slots.release()
+
+    return resp
+
+
+@app.route("/metrics/pod-creation", methods=["GET"])
+def get_pod_creation_metrics():
+    """
+    Pod 생성 단계별 소요 시간 histogram 조회
+
+    /create-pod 요청마다 set_pod_creation_status()가 남긴 단계 전환 시각으로 각 단계의 소요 시간을 구해,
+    요청이 ready/failed로 끝날 때 (stage, node, outcome)별 histogram에 누적한다.
+    stage=total은 요청 전체(started → ready/failed) 소요 시간이다.
+    노드가 정해지기 전에 끝난 요청은 node=unknown으로 집계된다.
+
+    ---
+    tags:
+    - Pod
+
+    summary: Pod 생성 단계별 latency histogram 조회
+
+    parameters:
+      - in: query
+        name: stage
+        required: false
+        type: string
+        description: 예) waiting_ready, total
+      - in: query
+        name: node
+        required: false
+        type: string
+      - in: query
+        name: outcome
+        required: false
+        type: string
+        enum: [ready, failed]
+
+    responses:
+      200:
+        description: 조회 성공
+        schema:
+          type: object
+          properties:
+            since:
+              type: string
+              description: 처음 집계를 시작한 시각 (ISO8601 UTC)
+            series:
+              type: array
+              items:
+                type: object
+                properties:
+                  stage:
+                    type: string
+                  node:
+                    type: string
+                  outcome:
+                    type: string
+                  count:
+                    type: integer
+                  sum_sec:
+                    type: number
+                  avg_sec:
+                    type: number
+                  p50_sec:
+                    type: number
+                  p90_sec:
+                    type: number
+                  p99_sec:
+                    type: number
+                  buckets:
+                    type: array
+                    description: 누적 bucket (le 이하 건수)
+      500:
+        description: 서버 내부 오류
+    """
+    try:
+        report = get_latency_histograms(
+            stage=request.args.get("stage"),
+            node=request.args.get("node"),
+            outcome=request.args.get("outcome"),
+        )
+    except Exception as e:
+        app.logger.exception("[POD METRICS] lookup failed")
+        return jsonify(infra_error(
+            "GET_POD_CREATION_METRICS",
+            "POD_METRICS_LOOKUP_FAILED",
+            str(e),
+        )), 500
+
+    return jsonify(report), 200
+
+
+def _normalize_gid_list(raw_gid) -> List[int]:
+    if raw_gid is None:
+        return []
+    if isinstance(raw_gid, list):
+        values = raw_gid
+    else:
         values = [raw_gid]
     out = []
     for value in values:
@@ -1023,30 +2088,11 @@ def _rollback_user(name: str) -> None:
     write_group_lines(cleaned)
 
 
-def build_pod_spec(
-    username: str,
-    user_info: dict,
-    target_node: str,
-    pod_name: str
-):
-    app.logger.info(f"[POD SPEC] start user={username} node={target_node}")
-    app.logger.debug(f"[POD SPEC] user_info={user_info}")
-    ns = app.config["NAMESPACE"]
-
+def _lookup_user_identity(username: str, user_info: dict) -> dict:
+    """passwd/group 파일에서 Pod에 주입할 사용자 uid/gid/group 정보를 읽는다."""
     # subPath mounts require the source files to already exist on the NFS share.
     ensure_etc_layout()
 
-    canonical = resolve_k8s_node_name(target_node)
-    if not canonical:
-        raise ValueError(f"unknown kubernetes node: {target_node!r}")
-    if canonical != target_node:
-        app.logger.info(
-            f"[POD SPEC] nodeName will use canonical {canonical!r} (was {target_node!r})"
-        )
-    target_node = canonical
-
-    image = load_user_image(username, user_info["image"])
-
     # passwd가 uid/gid의 단일 진실 소스 — WAS 값은 무시
     passwd_rec = None
     for _line in read_passwd_lines():
@@ -1075,14 +2121,102 @@ def build_pod_spec(
     else:
         gid_list = _normalize_gid_list(user_info.get("gid"))
 
-    gpu_nodes = user_info.get("gpu_nodes", [])
-    
-    # 기본 포트
-    ports = [
+    return {
+        "uid": uid,
+        "primary_gid": primary_gid,
+        "primary_group_name": primary_group_name,
+        "user_groups_env": _build_user_groups_env(username, primary_group_name, primary_gid, gid_list),
+    }
+
+
+def _resolve_target_node(target_node: str) -> str:
+    canonical = resolve_k8s_node_name(target_node)
+    if not canonical:
+        raise ValueError(f"unknown kubernetes node: {target_node!r}")
+    if canonical != target_node:
+        app.logger.info(
+            f"[POD SPEC] nodeName will use canonical {canonical!r} (was {target_node!r})"
+        )
+    return canonical
+
+
+def _node_resources(user_info: dict, target_node: str):
+    """WAS gpu_nodes에서 target node의 (cpu_limit, memory_limit, num_gpu)를 찾는다. 없으면 기본값."""
+    cpu_limit = app.config["DEFAULT_CPU_LIMIT"]
+    memory_limit = app.config["DEFAULT_MEM_LIMIT"]
+    num_gpu = 0
+
+    tn_key = target_node.lower()
+    for node in user_info.get("gpu_nodes", []):
+        if (node.get("node_name") or "").lower() == tn_key:
+            cpu_limit = node.get("cpu_limit", cpu_limit)
+            memory_limit = node.get("memory_limit", memory_limit)
+            num_gpu = node.get("num_gpu", 0)
+            break
+    return cpu_limit, memory_limit, num_gpu
+
+
+def _gpu_device_volumes(gpu_indices: List[int]):
+    """GPU device file(/dev/nvidiaN + 보조 device) hostPath volume과 volumeMount 목록. gpu_indices는 allocate_gpu_devices() 결과."""
+    gpu_volume_mounts = []
+    gpu_volumes = []
+
+    if gpu_indices:
+        for i in gpu_indices:
+            gpu_volume_mounts.append({
+                "name": f"nvidia{i}",
+                "mountPath": f"/dev/nvidia{i}"
+            })
+            gpu_volumes.append({
+                "name": f"nvidia{i}",
+                "hostPath": {
+                    "path": f"/dev/nvidia{i}",
+                    "type": "CharDevice"
+                }
+            })
+
+        for dev in app.config["NVIDIA_AUX_DEVICES"]:
+            mount_name = dev.replace("-", "")
+            gpu_volume_mounts.append({
+                "name": mount_name,
+                "mountPath": f"/dev/{dev}"
+            })
+            gpu_volumes.append({
+                "name": mount_name,
+                "hostPath": {
+                    "path": f"/dev/{dev}",
+                    "type": "CharDevice"
+                }
+            })
+    return gpu_volume_mounts, gpu_volumes
+
+
+def build_pod_spec(
+    username: str,
+    user_info: dict,
+    target_node: str,
+    pod_name: str,
+    image_future=None,
+):
+    """
+    Pod spec을 만들고 GPU device와 NodePort를 선점한다.
+
+    서로 독립적인 준비 단계(노드명 정규화, 사용자 이미지 로드, passwd/group 조회)는
+    pipeline.run_pipeline()으로 동시에 실행하고, GPU device 할당, NodePort 할당, krb5 배포는 세 단계가 모두 끝난 뒤 순서대로 실행한다.
+    image_future가 주어지면 호출자가 미리 시작해 둔 load_user_image() 결과를 기다려 쓴다.
+    """
+    app.logger.info(f"[POD SPEC] start user={username} node={target_node}")
+    app.logger.debug(f"[POD SPEC] user_info={user_info}")
+    ns = app.config["NAMESPACE"]
+
+    # 기본 포트 — gateway 모드에서는 공용 ContainerSSH/ingress로 받으므로 NodePort를 할당하지 않는다.
+    base_ports = [
         {"internal_port": 22, "usage_purpose": "ssh"},
         {"internal_port": 8888, "usage_purpose": "jupyter"},
     ]
-    app.logger.debug(f"[POD SPEC] base ports={ports}")
+    gateway_mode = app.config["POD_ACCESS_MODE"] == "gateway"
+    ports = [] if gateway_mode else list(base_ports)
+    app.logger.debug(f"[POD SPEC] base ports={ports} gateway_mode={gateway_mode}")
 
     # WAS 추가 포트
     additional_ports = user_info.get("additional_ports", [])
@@ -1095,60 +2229,93 @@ def build_pod_spec(
         for p in additional_ports
     )
     app.logger.info(f"[POD SPEC] enable_vnc={enable_vnc}")
-    # 포트 할당
-    set_pod_creation_status(username, "allocating_nodeport", "NodePort 할당 중")
-    allocated_ports = allocate_nodeports(
-        username=username,
-        pod_name=pod_name,
-        node_name=target_node,
-        ports=ports
-    )
+
+    def _allocate_gpus(deps):
+        node = deps["resolve_node"]
+        _, _, num_gpu = _node_resources(user_info, node)
+        if num_gpu:
+            set_pod_creation_status(username, "allocating_gpu", f"GPU 할당 중 (node={node})", node=node)
+        return allocate_gpu_devices(username, pod_name, node, num_gpu)
+
+    def _allocate(deps):
+        # 포트 할당 — 노드명 정규화와 계정 조회가 끝난 뒤에만 실행해 ValueError 경로에서는 선점이 없도록 한다.
+        set_pod_creation_status(username, "allocating_nodeport", "NodePort 할당 중")
+        return allocate_nodeports(
+            username=username,
+            pod_name=pod_name,
+            node_name=deps["resolve_node"],
+            ports=ports
+        )
+
+    def _deploy_krb5(deps):
+        # keytab은 컨테이너에 마운트하지 않는다 — farm 노드에만 배포하고 호스트가 갱신한 TGT만 공유한다.
+        # 이 배포가 실패하면 allocate_nodeports 단계가 rollback되어 nodeport 해제 + Pod 미생성으로 처리된다.
+        node = deps["resolve_node"]
+        set_pod_creation_status(username, "deploying_krb5", f"krb5 배포 중 (node={node})", node=node)
+        _deploy_krb5_to_farm(username, deps["identity"]["uid"], node)
+
+    stages = [
+        Stage("resolve_node", lambda deps: _resolve_target_node(target_node)),
+        Stage(
+            "load_image",
+            lambda deps: image_future.result() if image_future is not None
+            else load_user_image(username, user_info["image"]),
+        ),
+        Stage("identity", lambda deps: _lookup_user_identity(username, user_info)),
+        # GPU가 모자라면(ValueError) NodePort를 잡기 전에 실패하도록 allocate_nodeports보다 먼저 둔다.
+        # 이미지 로드도 기다려, docker load 실패가 선점 없이 원래 예외로 올라가고 krb5 배포가 그 뒤에 실행되게 한다.
+        Stage(
+            "allocate_gpus", _allocate_gpus,
+            deps=("resolve_node", "load_image", "identity"),
+            rollback=lambda _gpus: release_gpu_devices(pod_name),
+        ),
+        Stage(
+            "allocate_nodeports", _allocate,
+            deps=("resolve_node", "identity", "allocate_gpus"),
+            rollback=lambda _ports: release_nodeports(pod_name),
+        ),
+    ]
+    if app.config["KRB5_REALM"]:
+        stages.append(Stage("deploy_krb5", _deploy_krb5, deps=("allocate_nodeports", "identity")))
+
     try:
-        app.logger.info(f"[POD SPEC] allocated_ports={allocated_ports}")
-        cpu_limit = app.config["DEFAULT_CPU_LIMIT"]
-        memory_limit = app.config["DEFAULT_MEM_LIMIT"]
-        num_gpu = 0
-    
-        tn_key = target_node.lower()
-        for node in gpu_nodes:
-            if (node.get("node_name") or "").lower() == tn_key:
-                cpu_limit = node.get("cpu_limit", cpu_limit)
-                memory_limit = node.get("memory_limit", memory_limit)
-                num_gpu = node.get("num_gpu", 0)
-                break
-    
+        results = run_pipeline(
+            stages,
+            max_workers=app.config["POD_SPEC_PIPELINE_WORKERS"],
+            tag=f"[POD SPEC] pod={pod_name}",
+        )
+    except PipelineError as e:
+        if "allocate_nodeports" not in e.rollback:
+            # NodePort 선점 전에 실패 — 기존과 같이 원래 예외(ValueError면 400)를 그대로 올린다.
+            # GPU만 잡은 뒤 실패했으면 그 행은 rollback에서 이미 지웠다.
+            raise e.cause
+        app.logger.warning(
+            "[POD SPEC] failed after nodeport allocation; released rows pod=%s — %s",
+            pod_name, e.cause,
+        )
+        raise PodSpecBuildError(
+            str(e.cause),
+            progress={
+                "nodeportsReleased": e.rollback["allocate_nodeports"],
+                "gpuDevicesReleased": e.rollback.get("allocate_gpus", False),
+            },
+        ) from e.cause
+
+    target_node = results["resolve_node"]
+    image = results["load_image"]
+    identity = results["identity"]
+    uid = identity["uid"]
+    primary_gid = identity["primary_gid"]
+    primary_group_name = identity["primary_group_name"]
+    allocated_ports = results["allocate_nodeports"]
+    gpu_indices = results["allocate_gpus"]
+
+    try:
+        app.logger.info(f"[POD SPEC] allocated_ports={allocated_ports} gpu_indices={gpu_indices}")
+        cpu_limit, memory_limit, num_gpu = _node_resources(user_info, target_node)
         app.logger.info(f"[POD SPEC] resources cpu={cpu_limit} mem={memory_limit} gpu={num_gpu}")
-    
-        gpu_volume_mounts = []
-        gpu_volumes = []
-
-        if num_gpu > 0:
-            for i in range(num_gpu):
-                gpu_volume_mounts.append({
-                    "name": f"nvidia{i}",
-                    "mountPath": f"/dev/nvidia{i}"
-                })
-                gpu_volumes.append({
-                    "name": f"nvidia{i}",
-                    "hostPath": {
-                        "path": f"/dev/nvidia{i}",
-                        "type": "CharDevice"
-                    }
-                })
 
-            for dev in app.config["NVIDIA_AUX_DEVICES"]:
-                mount_name = dev.replace("-", "")
-                gpu_volume_mounts.append({
-                    "name": mount_name,
-                    "mountPath": f"/dev/{dev}"
-                })
-                gpu_volumes.append({
-                    "name": mount_name,
-                    "hostPath": {
-                        "path": f"/dev/{dev}",
-                        "type": "CharDevice"
-                    }
-                })
+        gpu_volume_mounts, gpu_volumes = _gpu_device_volumes(gpu_indices)
 
         # NFS user-share 전체를 /home에 마운트 — 유저 격리는 chmod 700으로 처리
         # image-store PVC(pvc-image-store)는 제거 — 해당 PV의 NFS subdir가
@@ -1168,11 +2335,6 @@ def build_pod_spec(
         volumes.extend(gpu_volumes)
 
         if app.config["KRB5_REALM"]:
-            # keytab은 컨테이너에 마운트하지 않는다 — farm 노드에만 배포하고 호스트가 갱신한 TGT만 공유한다.
-            # 이 배포가 실패하면 예외가 아래 except로 전달되어 nodeport 롤백 + Pod 미생성으로 처리된다.
-            set_pod_creation_status(username, "deploying_krb5", f"krb5 배포 중 (node={target_node})")
-            _deploy_krb5_to_farm(username, uid, target_node)
-
             # rpc-gssd가 호스트에서 ccache를 읽을 수 있도록 Pod와 호스트가 /run/user/<uid> 공유
             volume_mounts.append({
                 "name": "krb5-ccache",
@@ -1222,7 +2384,7 @@ def build_pod_spec(
                                                         "containerPort": m["internal_port"],
                                                         "protocol": "TCP"
                                                     }
-                                                    for m in allocated_ports
+                                                    for m in (base_ports if gateway_mode else []) + allocated_ports
                                                 ],
                                                 "env": [
                                                     {"name": "USER", "value": username},
@@ -1234,7 +2396,7 @@ def build_pod_spec(
                                                     {"name": "GID", "value": str(primary_gid)},
                                                     {"name": "HOME", "value": f"/home/{username}"},
                                                     {"name": "SHELL", "value": "/bin/bash"},
-                                                    {"name": "USER_GROUPS", "value": _build_user_groups_env(username, primary_group_name, primary_gid, gid_list)},
+                                                    {"name": "USER_GROUPS", "value": identity["user_groups_env"]},
                                                     *([{"name": "ENABLE_VNC", "value": "true"}] if enable_vnc else []),
                                                     *([
                                                         {"name": "KRB5_REALM",          "value": app.config["KRB5_REALM"]},
@@ -1274,10 +2436,11 @@ def build_pod_spec(
             pod_name, e,
             exc_info=True,
         )
-        rollback = {"nodeportsReleased": False}
+        rollback = {"nodeportsReleased": False, "gpuDevicesReleased": False}
         try:
             release_nodeports(pod_name)
             rollback["nodeportsReleased"] = True
+            rollback["gpuDevicesReleased"] = True
         except Exception:
             app.logger.warning(
                 "[POD SPEC] nodeport release failed during rollback pod=%s",
@@ -1286,242 +2449,990 @@ def build_pod_spec(
             )
         raise PodSpecBuildError(str(e), progress=rollback) from e
 
-# //////////////////////// Pod 삭제 //////////////////////
+# ////////////////////// Warm standby pool //////////////////////
+
+def _standby_pod_manifest(profile: dict, pod_name: str, gpu_indices: List[int]) -> dict:
+    """사용자 정보 없이 profile만으로 만드는 standby Pod manifest.
+    /home은 모든 사용자에게 같은 NFS 루트라 그대로 둔다. krb5 ccache는 uid를 몰라 mount할 수 없으므로
+    KRB5_REALM이 설정되면 warm pool 자체를 쓰지 않는다.
+    GPU는 refill 때 allocate_gpu_devices()로 미리 잡아 두고, claim한 사용자의 build_pod_spec()이 같은 행을 이어 쓴다."""
+    ns = app.config["NAMESPACE"]
+    gpu_volume_mounts, gpu_volumes = _gpu_device_volumes(gpu_indices)
+
+    volume_mounts = [
+        {"name": "nfs-home", "mountPath": "/home", "readOnly": False},
+        *gpu_volume_mounts,
+    ]
+    volumes = [
+        {
+            "name": "nfs-home",
+            "hostPath": {"path": app.config["FARM_HOME_MOUNT_ROOT"], "type": "Directory"},
+        },
+        *gpu_volumes,
+    ]
+
+    return {
+        "metadata": {
+            "name": pod_name,
+            "namespace": ns,
+            "labels": {
+                "app": "ailab-guest",
+                "managed-by": "ailab-infra",
+                "pod_name": pod_name,
+                warm_pool.STATE_LABEL: warm_pool.STATE_STANDBY,
+                warm_pool.PROFILE_LABEL: warm_pool.profile_key(profile),
+            },
+            "annotations": {
+                warm_pool.PROFILE_ANNOTATION: json.dumps(profile, sort_keys=True),
+            },
+        },
+        "spec": {
+            "nodeName": profile["node"],
+            "containers": [
+                {
+                    "name": "shell",
+                    "image": profile["image"],
+                    "imagePullPolicy": "IfNotPresent",
+                    "stdin": True,
+                    "tty": True,
+                    "env": [
+                        {"name": "POOL_STANDBY", "value": "true"},
+                        {"name": "SHELL", "value": "/bin/bash"},
+                    ],
+                    "resources": {
+                        "requests": {
+                            "cpu": app.config["DEFAULT_CPU_REQUEST"],
+                            "memory": app.config["DEFAULT_MEM_REQUEST"]
+                        },
+                        "limits": {
+                            "cpu": profile["cpu_limit"],
+                            "memory": profile["memory_limit"]
+                        }
+                    },
+                    "volumeMounts": volume_mounts,
+                }
+            ],
+            "volumes": volumes,
+            "restartPolicy": "Never",
+        },
+    }
+
+
+def refill_warm_pool() -> None:
+    """profile별 목표 standby 수(최근 수요 기반)에 맞춰 standby Pod를 만들거나 지운다. leader worker에서만 실행."""
+    ns = app.config["NAMESPACE"]
+    load_k8s()
+    v1 = client.CoreV1Api()
+
+    by_key = {}
+    for pod in warm_pool.list_pool_pods(v1, ns):
+        key = (pod.metadata.labels or {}).get(warm_pool.PROFILE_LABEL)
+        by_key.setdefault(key, []).append(pod)
+
+    for key, profile in warm_pool.known_profiles().items():
+        demand = warm_pool.demand_count(key, app.config["WARM_POOL_DEMAND_WINDOW_SEC"])
+        target = warm_pool.target_size(
+            demand,
+            app.config["WARM_POOL_DEMAND_FACTOR"],
+            app.config["WARM_POOL_MIN_PER_PROFILE"],
+            app.config["WARM_POOL_MAX_PER_PROFILE"],
+        )
+
+        healthy = []
+        for pod in by_key.pop(key, []):
+            reason = get_pod_failure_reason(pod)
+            if reason:
+                app.logger.warning(f"[WARM POOL] deleting failed standby pod={pod.metadata.name}: {reason}")
+                delete_pod_util(pod.metadata.name, ns)
+            else:
+                healthy.append(pod)
+
+        if len(healthy) < target:
+            for _ in range(target - len(healthy)):
+                pod_name = generate_pod_name("standby")
+                try:
+                    gpu_indices = allocate_gpu_devices("", pod_name, profile["node"], profile["num_gpu"])
+                except ValueError as e:
+                    app.logger.info(f"[WARM POOL] skip standby for profile={key}: {e}")
+                    break
+                try:
+                    v1.create_namespaced_pod(namespace=ns, body=_standby_pod_manifest(profile, pod_name, gpu_indices))
+                except Exception:
+                    release_gpu_devices(pod_name)
+                    raise
+                app.logger.info(
+                    f"[WARM POOL] created standby pod={pod_name} profile={key} node={profile['node']} gpus={gpu_indices}"
+                )
+        elif len(healthy) > target:
+            # Ready가 아닌 것부터, 그다음 오래된 것부터 줄인다.
+            healthy.sort(key=lambda p: (is_pod_ready(p), p.metadata.creation_timestamp))
+            for pod in healthy[:len(healthy) - target]:
+                app.logger.info(f"[WARM POOL] scaling down standby pod={pod.metadata.name} profile={key}")
+                delete_pod_util(pod.metadata.name, ns)
+
+        if demand == 0 and target == 0:
+            warm_pool.forget_profile(key)
+
+    # 더 이상 추적하지 않는 profile의 standby Pod 정리
+    for key, pods in by_key.items():
+        for pod in pods:
+            app.logger.info(f"[WARM POOL] deleting standby pod of unknown profile pod={pod.metadata.name}")
+            delete_pod_util(pod.metadata.name, ns)
+
+
+def _personalize_command(env: List[dict]) -> List[str]:
+    """
+    claim한 standby Pod에서 실행할 명령. 사용자 env를 WARM_POOL_ENV_FILE(login shell profile)에 export로 기록한 뒤
+    같은 env로 WARM_POOL_PERSONALIZE_CMD를 실행한다. exec로 넘긴 env는 container env가 아니므로,
+    이후 ContainerSSH attach 세션은 이 파일을 통해 cold start Pod와 같은 값을 본다.
+    """
+    exports = "".join(f"export {e['name']}={shlex.quote(str(e['value']))}\n" for e in env)
+    env_args = " ".join(shlex.quote(f"{e['name']}={e['value']}") for e in env)
+    env_file = shlex.quote(app.config["WARM_POOL_ENV_FILE"])
+    script = (
+        f"umask 022 && printf %s {shlex.quote(exports)} > {env_file} && "
+        f"exec env {env_args} {shlex.quote(app.config['WARM_POOL_PERSONALIZE_CMD'])}"
+    )
+    return ["sh", "-c", script]
+
+
+def _warm_pool_profile(user_info: dict, node: str, image: str) -> dict:
+    cpu_limit, memory_limit, num_gpu = _node_resources(user_info, node)
+    return warm_pool.pool_profile(node, image, num_gpu, cpu_limit, memory_limit)
+
+
+def _warm_pool_profile_keys(user_info: dict, node_list: List[str]) -> dict:
+    """
+    {node(소문자): 이 요청이 claim할 standby Pod의 profile key}. scheduler capacity filter가 그 standby Pod를 빈 자원으로 본다.
+    사용자 저장 이미지는 아직 모르므로 기본 이미지로 계산한다 (저장 이미지면 claim하지 않고 cold start의 GPU 할당이 다시 확인한다).
+    """
+    if not user_info.get("image"):
+        return {}
+    return {
+        node.lower(): warm_pool.profile_key(_warm_pool_profile(user_info, node.lower(), user_info["image"]))
+        for node in node_list
+    }
+
+
+def _create_from_warm_pool(username: str, user_info: dict, target_node: str, image_future=None):
+    """
+    standby Pod를 가져와 사용자용으로 개인화한다.
+
+    Returns:
+        (pod_name, node, allocated_ports) 또는 None (사용할 standby Pod가 없거나 개인화 실패 — 호출자는 cold start로 진행)
+    """
+    ns = app.config["NAMESPACE"]
+
+    node = resolve_k8s_node_name(target_node)
+    if not node or not user_info.get("image"):
+        return None
+    image = image_future.result() if image_future is not None else load_user_image(username, user_info["image"])
+    if image != user_info["image"]:
+        # 사용자 저장 이미지는 사용자마다 달라 pool로 공유할 수 없다.
+        return None
+
+    profile = _warm_pool_profile(user_info, node, image)
+    warm_pool.record_demand(profile)
+
+    load_k8s()
+    v1 = client.CoreV1Api()
+    try:
+        pod_name = warm_pool.claim_standby_pod(
+            v1, ns, warm_pool.profile_key(profile), username, is_pod_ready,
+        )
+    except Exception:
+        app.logger.warning("[WARM POOL] claim failed, falling back to cold start", exc_info=True)
+        return None
+    if not pod_name:
+        app.logger.info(f"[WARM POOL] no standby pod for profile={warm_pool.profile_key(profile)}")
+        return None
+
+    app.logger.info(f"[WARM POOL] claimed standby pod={pod_name} for user={username}")
+    set_pod_creation_status(username, "personalizing", f"standby pod 개인화 중 (node={node})", node=node)
+
+    try:
+        # NodePort 선점, krb5 배포, 사용자 env 계산은 cold start와 같은 경로를 쓴다.
+        spec_wrapper, allocated_ports = build_pod_spec(
+            username, user_info, node, pod_name, image_future=image_future,
+        )
+        container = spec_wrapper["config"]["kubernetes"]["pod"]["spec"]["containers"][0]
+        exec_in_pod(pod_name, ns, _personalize_command(container["env"]))
+
+        set_pod_creation_status(username, "creating_services", "NodePort 서비스 생성 중")
+        create_pod_services(username, ns, pod_name, allocated_ports)
+        bind_nodeports(pod_name)
+        return pod_name, node, allocated_ports
+    except Exception:
+        app.logger.warning(f"[WARM POOL] personalization failed pod={pod_name}, falling back to cold start", exc_info=True)
+        _discard_claimed_standby(pod_name, ns, username)
+        return None
+
+
+def _discard_claimed_standby(pod_name: str, ns: str, username: str) -> None:
+    """
+    개인화에 실패한 standby Pod를 /delete-pod와 같은 _teardown_pod()로 정리한다.
+    standby Pod는 refill 때 잡은 GPU 행을 갖고 있으므로 Pod만 지우면 gpu_device_allocations 행이 남는다.
+    Service 삭제와 행 해제는 없어도 안전하고, warm pool은 KRB5_REALM이 없을 때만 쓰므로 farm 정리는 하지 않는다.
+    """
+    progress = _new_teardown_progress()
+    try:
+        _teardown_pod(pod_name, ns, progress, username, cleanup_krb5=False)
+    except PodTeardownError as e:
+        # 남은 행은 reconcile_nodeport_allocations()가 Pod가 사라진 뒤 정리한다.
+        app.logger.warning(
+            f"[WARM POOL] cleanup failed pod={pod_name} step={e.step} progress={progress}: {e.cause}"
+        )
+
+
+@app.route("/warm-pool", methods=["GET"])
+def get_warm_pool():
+    """
+    warm standby pool 상태 조회
+
+    profile별 최근 수요, 목표 standby 수, 현재 standby Pod 수(Ready 기준)를 반환한다.
+
+    ---
+    tags:
+    - Pod
+
+    summary: warm pool 상태 조회
+
+    responses:
+      200:
+        description: 조회 성공
+      500:
+        description: 서버 내부 오류
+    """
+    ns = app.config["NAMESPACE"]
+    try:
+        load_k8s()
+        v1 = client.CoreV1Api()
+        pods = warm_pool.list_pool_pods(v1, ns)
+        profiles = []
+        for key, profile in warm_pool.known_profiles().items():
+            demand = warm_pool.demand_count(key, app.config["WARM_POOL_DEMAND_WINDOW_SEC"])
+            mine = [p for p in pods if (p.metadata.labels or {}).get(warm_pool.PROFILE_LABEL) == key]
+            profiles.append({
+                "profile": key,
+                **profile,
+                "demand": demand,
+                "target": warm_pool.target_size(
+                    demand,
+                    app.config["WARM_POOL_DEMAND_FACTOR"],
+                    app.config["WARM_POOL_MIN_PER_PROFILE"],
+                    app.config["WARM_POOL_MAX_PER_PROFILE"],
+                ),
+                "standby": len(mine),
+                "ready": sum(1 for p in mine if is_pod_ready(p)),
+            })
+    except Exception as e:
+        app.logger.exception("[WARM POOL] status lookup failed")
+        return jsonify(infra_error(
+            "GET_WARM_POOL",
+            "WARM_POOL_LOOKUP_FAILED",
+            str(e),
+        )), 500
+
+    return jsonify({"enabled": app.config["WARM_POOL_ENABLED"], "profiles": profiles}), 200
+
+@app.route("/prepull/coverage", methods=["GET"])
+def get_prepull_coverage():
+    """
+    GPU 노드별 이미지 pre-pull coverage 조회
+
+    pre-pull controller가 마지막으로 계산한 노드별 기대 이미지(wanted), 없는 이미지(missing),
+    받는 중인 이미지(pulling), coverage(기대 이미지 중 이미 있는 비율)를 반환한다.
+
+    ---
+    tags:
+    - Pod
+
+    summary: 이미지 pre-pull coverage 조회
+
+    responses:
+      200:
+        description: 조회 성공 (controller가 아직 한 번도 돌지 않았으면 nodes가 비어 있음)
+      500:
+        description: 서버 내부 오류
+    """
+    try:
+        report = image_prepull.get_coverage_report()
+    except Exception as e:
+        app.logger.exception("[PREPULL] coverage lookup failed")
+        return jsonify(infra_error(
+            "GET_PREPULL_COVERAGE",
+            "PREPULL_COVERAGE_LOOKUP_FAILED",
+            str(e),
+        )), 500
+
+    if report is None:
+        report = {"nodes": {}, "updated_at": None}
+    return jsonify({"enabled": app.config["PREPULL_ENABLED"], **report}), 200
+
+# //////////////////////// Pod 삭제 //////////////////////
+
+class PodTeardownError(Exception):
+    """_teardown_pod() 단계 실패. step/error는 infra_error()의 step/error 코드로 그대로 쓰인다."""
+
+    def __init__(self, step, error, cause):
+        super().__init__(str(cause))
+        self.step = step
+        self.error = error
+        self.cause = cause
+
+
+def _teardown_pod(pod_name, ns, progress, username, pod_node_name=None, on_stage=None,
+                  release=True, cleanup_krb5=True):
+    """
+    Pod와 관련 리소스를 정리한다. 동기 /delete-pod와 비동기 삭제 job이 함께 쓴다.
+
+    순서: NodePort Service 삭제 → Pod 삭제 요청 → 삭제 완료 대기 → NodePort/GPU DB row 해제 → farm keytab 정리.
+    모든 단계는 다시 실행해도 안전하므로 실패한 job은 처음부터 재시도한다.
+
+    Args:
+        progress: 단계별 완료 여부를 기록할 dict (servicesDeleted 등, 호출자가 넘긴 dict를 직접 갱신)
+        pod_node_name: 이전 시도에서 알아낸 Pod 노드. Pod가 이미 없어도 farm 정리를 이어서 할 수 있다.
+        release, cleanup_krb5: False면 NodePort row 해제/farm keytab 정리를 건너뛴다 (일괄 삭제가 모아서 처리).
+        on_stage: 단계 시작 시 호출되는 callback(stage, message, **context).
+            Pod 삭제 요청 이후 단계에서는 context로 username, pod_node_name을 넘겨 재시도 시 다시 쓸 수 있게 한다.
+
+    Returns:
+        {"already_absent": bool, "username": str, "pod_node_name": str | None}
+
+    Raises:
+        PodTeardownError
+    """
+    def stage(name, message, **context):
+        if on_stage:
+            on_stage(name, message, **context)
+
+    stage("deleting_services", "NodePort 서비스 삭제 중")
+    app.logger.info("[DELETE POD] deleting NodePort services")
+    try:
+        delete_nodeport_services(pod_name, ns)
+        progress["servicesDeleted"] = True
+    except Exception as e:
+        app.logger.exception("[DELETE POD] service deletion failed")
+        raise PodTeardownError("DELETE_NODEPORT_SERVICE", "NODEPORT_SERVICE_DELETE_FAILED", e)
+
+    stage("deleting_pod", "pod 삭제 요청 중")
+    app.logger.info(f"[DELETE POD] deleting pod from namespace={ns}")
+    try:
+        load_k8s()
+        v1 = client.CoreV1Api()
+    except Exception as e:
+        app.logger.exception("[DELETE POD] k8s client setup failed")
+        raise PodTeardownError("DELETE_POD", "K8S_CLIENT_SETUP_FAILED", e)
+
+    if app.config.get("KRB5_REALM") and not pod_node_name:
+        try:
+            pod = v1.read_namespaced_pod(pod_name, ns)
+            pod_node_name = pod.spec.node_name
+            # warm pool에서 가져온 Pod는 이름에 username이 없으므로 라벨을 우선한다.
+            username = (pod.metadata.labels or {}).get("username") or username
+        except Exception:
+            app.logger.warning("[DELETE POD] pod node lookup failed, farm 정리 건너뜀: %s", pod_name, exc_info=True)
+
+    already_absent = False
+    try:
+        v1.delete_namespaced_pod(pod_name, ns)
+        progress["podDeleteRequested"] = True
+    except client.exceptions.ApiException as e:
+        if e.status != 404:
+            app.logger.exception("[DELETE POD] pod deletion failed")
+            raise PodTeardownError("DELETE_POD", "POD_DELETE_FAILED", e)
+        already_absent = True
+        app.logger.info("[DELETE POD] pod already absent: %s", pod_name)
+    except Exception as e:
+        app.logger.exception("[DELETE POD] pod deletion failed")
+        raise PodTeardownError("DELETE_POD", "POD_DELETE_FAILED", e)
+
+    if not already_absent:
+        stage("waiting_deleted", "pod 종료 대기 중", username=username, pod_node_name=pod_node_name)
+        app.logger.info("[DELETE POD] waiting for pod deletion to complete")
+        try:
+            deleted = wait_for_pod_deleted(v1, pod_name, ns, timeout_sec=60)
+        except Exception as e:
+            app.logger.exception("[DELETE POD] deletion polling failed")
+            raise PodTeardownError("DELETE_POD", "POD_DELETE_FAILED", e)
+
+        if not deleted:
+            app.logger.warning("[DELETE POD] pod deletion timed out: %s", pod_name)
+            raise PodTeardownError(
+                "DELETE_POD", "POD_DELETE_TIMEOUT",
+                TimeoutError("pod deletion did not complete within timeout"),
+            )
+        app.logger.info(f"[DELETE POD] pod deleted successfully: {pod_name}")
+    progress["podDeleted"] = True
+
+    # GPU device와 NodePort 행은 Pod가 사라진 것을 확인한 뒤에만 해제한다.
+    # 종료 중인 Pod가 아직 쓰는 GPU/포트를 새 Pod가 받지 않게 하기 위해서이다.
+    # 삭제 대기가 timeout이면 위에서 끝나므로 행은 남고, job 재시도나 reconcile_nodeport_allocations()가 해제한다.
+    if release:
+        stage("releasing_nodeports", "NodePort 해제 중", username=username, pod_node_name=pod_node_name)
+        app.logger.info("[DELETE POD] releasing NodePort allocations")
+        try:
+            release_nodeports(pod_name)
+            progress["nodeportsReleased"] = True
+        except Exception as e:
+            app.logger.exception("[DELETE POD] nodeport release failed")
+            raise PodTeardownError("RELEASE_NODEPORT", "NODEPORT_RELEASE_FAILED", e)
+
+    if cleanup_krb5 and app.config.get("KRB5_REALM") and pod_node_name:
+        stage("cleaning_krb5", f"krb5 정리 중 (node={pod_node_name})")
+        try:
+            _remove_krb5_from_farm(username, pod_node_name)
+        except Exception as e:
+            app.logger.warning(f"[DELETE POD] farm 정리 실패, 재조정 잡에 위임: {username} ← {pod_node_name} — {e}")
+            _record_krb5_cleanup_pending(username, pod_node_name)
+
+    return {"already_absent": already_absent, "username": username, "pod_node_name": pod_node_name}
+
+
+def _teardown_error_response(e: PodTeardownError, progress, pod_name):
+    if isinstance(e.cause, client.exceptions.ApiException):
+        return infra_error(e.step, e.error, e.cause.body, rollback=progress, pod_name=pod_name,
+                           **k8s_error_fields(e.cause))
+    return infra_error(e.step, e.error, str(e.cause), rollback=progress, pod_name=pod_name)
+
+
+def _new_teardown_progress():
+    return {
+        "servicesDeleted": False,
+        "nodeportsReleased": False,
+        "podDeleteRequested": False,
+        "podDeleted": False,
+    }
+
+
+def _username_from_pod_name(pod_name):
+    return pod_name[len("ailab-"):].rsplit("-", 1)[0]
+
+
+def run_delete_job_consumer():
+    """
+    비동기 삭제 job 하나를 꺼내 처리한다. 각 worker의 consumer thread가 반복 호출한다.
+
+    실패하면 DELETE_JOB_RETRY_BASE_SEC × 2^(시도-1)초 뒤 재시도하고, DELETE_JOB_MAX_ATTEMPTS번
+    실패하면 failed로 끝낸다.
+    """
+    job = delete_jobs.claim_next(timeout_sec=5, lease_sec=app.config["DELETE_JOB_LEASE_SEC"])
+    if job is None:
+        return
+    tracking_id = job["tracking_id"]
+    pod_name = job["pod_name"]
+    attempts = job["attempts"]
+    progress = _new_teardown_progress()
+
+    def on_stage(stage, message, **context):
+        delete_jobs.update_job(tracking_id, stage=stage, message=message, progress=progress, **context)
+
+    app.logger.info(f"[DELETE JOB] start tracking_id={tracking_id} pod={pod_name} attempt={attempts}")
+    try:
+        result = _teardown_pod(
+            pod_name,
+            app.config["NAMESPACE"],
+            progress,
+            username=job.get("username") or _username_from_pod_name(pod_name),
+            pod_node_name=job.get("pod_node_name"),
+            on_stage=on_stage,
+        )
+    except PodTeardownError as e:
+        if attempts >= app.config["DELETE_JOB_MAX_ATTEMPTS"]:
+            app.logger.error(f"[DELETE JOB] giving up tracking_id={tracking_id} pod={pod_name}: {e.error}")
+            delete_jobs.update_job(
+                tracking_id, stage="failed", message="삭제 실패", error=e.error, progress=progress,
+            )
+            delete_jobs.finish(tracking_id, pod_name)
+            return
+        delay = app.config["DELETE_JOB_RETRY_BASE_SEC"] * (2 ** (attempts - 1))
+        app.logger.warning(
+            f"[DELETE JOB] attempt {attempts} failed tracking_id={tracking_id} pod={pod_name}: "
+            f"{e.error}, retry in {delay}s"
+        )
+        delete_jobs.update_job(
+            tracking_id, stage="retrying", message=f"{delay}초 뒤 재시도", error=e.error, progress=progress,
+        )
+        delete_jobs.schedule_retry(tracking_id, delay)
+        return
+
+    delete_jobs.update_job(
+        tracking_id,
+        stage="deleted",
+        message="삭제 완료",
+        error=None,
+        progress=progress,
+        already_absent=result["already_absent"],
+        username=result["username"],
+        pod_node_name=result["pod_node_name"],
+    )
+    delete_jobs.finish(tracking_id, pod_name)
+    app.logger.info(f"[DELETE JOB] done tracking_id={tracking_id} pod={pod_name}")
+
+
+def maintain_delete_jobs():
+    """재시도 시각이 된 job과 lease가 만료된 job을 queue로 되돌린다 (leader 주기 작업)."""
+    promoted = delete_jobs.promote_due()
+    requeued = delete_jobs.requeue_expired()
+    if promoted or requeued:
+        app.logger.info(f"[DELETE JOB] promoted={promoted} requeued_expired={requeued}")
+
+
+@app.route("/delete-pod", methods=["POST"])
+def delete_pod():
+    """
+    사용자 Pod 삭제 API
+
+    특정 Pod를 삭제하고 다음 리소스를 정리합니다.
+
+    - Kubernetes Pod
+    - NodePort Service
+    - NodePort DB allocation
+
+    async=true(body 또는 query string)이면 삭제 job을 queue에 넣고 바로 202와 tracking_id를 반환한다.
+    이후 진행 상황은 GET /delete-pod/<tracking_id>로 조회한다. 같은 Pod의 job이 진행 중이면 그 tracking_id를 돌려준다.
+
+    ---
+    tags:
+    - Pod
+
+    summary: 사용자 Pod 삭제
+
+    consumes:
+    - application/json
+
+    parameters:
+
+      - in: body
+        name: body
+        required: true
+        schema:
+          $ref: '#/definitions/DeletePodRequest'
+
+      - in: query
+        name: async
+        required: false
+        type: boolean
+
+    responses:
+
+      200:
+        description: Pod 삭제 성공
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+              example: deleted
+      202:
+        description: 비동기 삭제 접수
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+              example: accepted
+            tracking_id:
+              type: string
+            pod_name:
+              type: string
+      400:
+        description: 잘못된 요청
+        schema:
+          $ref: '#/definitions/ErrorResponse'
+      500:
+        description: 삭제 실패
+        schema:
+          $ref: '#/definitions/ErrorResponse'
+    """
+
+    data = request.get_json(force=True)
+    pod_name = data.get("pod_name")
+    async_mode = bool(data.get("async")) or request.args.get("async", "").lower() == "true"
+
+    app.logger.info(f"[DELETE POD] request received - pod_name={pod_name} async={async_mode}")
+
+    if not pod_name:
+        app.logger.warning("[DELETE POD] pod_name missing")
+        return jsonify(infra_error(
+            "VALIDATE_REQUEST",
+            "INVALID_DELETE_POD_REQUEST",
+            "pod_name required",
+        )), 400
+
+    ns = app.config["NAMESPACE"]
+    rollback = _new_teardown_progress()
+
+    try:
+        if not pod_name.startswith("ailab-"):
+            app.logger.warning(f"[DELETE POD] invalid pod_name format: {pod_name}")
+            return jsonify(infra_error(
+                "VALIDATE_REQUEST",
+                "INVALID_POD_NAME",
+                "invalid pod_name",
+                rollback=rollback,
+                pod_name=pod_name,
+            )), 400
+
+        username = _username_from_pod_name(pod_name)
+        app.logger.info(f"[DELETE POD] parsed username={username}")
+
+        if async_mode:
+            try:
+                tracking_id, created = delete_jobs.enqueue(pod_name)
+            except Exception as e:
+                app.logger.exception("[DELETE POD] delete job enqueue failed")
+                return jsonify(infra_error(
+                    "ENQUEUE_DELETE_JOB",
+                    "DELETE_JOB_ENQUEUE_FAILED",
+                    str(e),
+                    pod_name=pod_name,
+                )), 500
+            app.logger.info(f"[DELETE POD] accepted tracking_id={tracking_id} new={created}")
+            return jsonify({
+                "status": "accepted",
+                "tracking_id": tracking_id,
+                "pod_name": pod_name,
+            }), 202
+
+        try:
+            result = _teardown_pod(pod_name, ns, rollback, username)
+        except PodTeardownError as e:
+            return jsonify(_teardown_error_response(e, rollback, pod_name)), 500
+
+        body = {
+            "status": "deleted",
+            "pod_name": pod_name,
+            "progress": rollback,
+        }
+        if result["already_absent"]:
+            body["already_absent"] = True
+        return jsonify(body), 200
+
+    except Exception as e:
+        app.logger.exception("[DELETE POD] deletion failed")
+        return jsonify(infra_error(
+            "DELETE_POD",
+            "DELETE_POD_FAILED",
+            str(e),
+            rollback=rollback,
+            pod_name=pod_name,
+        )), 500
+
+
+@app.route("/delete-pod/<tracking_id>", methods=["GET"])
+def get_delete_pod_status(tracking_id):
+    """
+    비동기 Pod 삭제 진행 상황 조회
+
+    stage는 다음 순서로 진행되며, 최종 상태는 deleted 또는 failed다:
+      - unknown             : job 없음 (잘못된 tracking_id이거나 1시간이 지나 만료됨)
+      - queued              : 삭제 대기 중
+      - deleting_services   : NodePort Service 삭제 중
+      - deleting_pod        : k8s에 pod 삭제 요청 중
+      - waiting_deleted     : pod 종료 대기 중
+      - releasing_nodeports : pod가 사라진 뒤 NodePort/GPU DB row 해제 중
+      - cleaning_krb5       : farm 노드 keytab 정리 중 (KRB5_REALM 설정 시에만 거침)
+      - retrying            : 이번 시도가 실패해 재시도 대기 중 (error에 실패 코드)
+      - deleted             : 삭제 완료 (최종 상태)
+      - failed              : 재시도를 모두 실패 (최종 상태)
+
+    ---
+    tags:
+    - Pod
+
+    summary: 비동기 Pod 삭제 진행 상황 조회
+
+    parameters:
+      - in: path
+        name: tracking_id
+        required: true
+        type: string
+
+    responses:
+      200:
+        description: 진행 상황 조회 성공
+        schema:
+          type: object
+          properties:
+            tracking_id:
+              type: string
+            pod_name:
+              type: string
+            stage:
+              type: string
+            message:
+              type: string
+            attempts:
+              type: integer
+            error:
+              type: string
+              description: 마지막 실패의 에러 코드 (예: POD_DELETE_TIMEOUT)
+            progress:
+              type: object
+            updated_at:
+              type: string
+      500:
+        description: 서버 내부 오류
+    """
+    try:
+        job = delete_jobs.get_job(tracking_id)
+    except Exception as e:
+        app.logger.exception("[DELETE POD] job status lookup failed")
+        return jsonify(infra_error(
+            "GET_DELETE_POD_STATUS",
+            "DELETE_JOB_LOOKUP_FAILED",
+            str(e),
+        )), 500
+
+    if job is None:
+        return jsonify({"tracking_id": tracking_id, "stage": "unknown", "message": "삭제 job 없음"}), 200
 
-@app.route("/delete-pod", methods=["POST"])
-def delete_pod():
+    job.pop("lease_until", None)
+    return jsonify(job), 200
+
+
+@app.route("/pods/bulk-delete", methods=["POST"])
+def bulk_delete_pods():
     """
-    사용자 Pod 삭제 API
+    사용자 Pod 일괄 삭제 API (노드 drain, 학기 종료 정리용)
 
-    특정 Pod를 삭제하고 다음 리소스를 정리합니다.
+    selector(node, usernames, label_selector 중 하나 이상, 여러 개면 AND)에 맞는
+    managed-by=ailab-infra Pod를 한 번에 정리한다. warm pool standby Pod는 제외한다.
 
-    - Kubernetes Pod
-    - NodePort Service
-    - NodePort DB allocation
+    - Pod별 Service 삭제 → Pod 삭제 → 삭제 완료 대기를 최대 BULK_DELETE_MAX_PARALLEL개씩 동시에 수행
+    - NodePort DB row는 Service 삭제가 끝난 Pod를 모아 DELETE ... WHERE pod_name IN (...) 한 번으로 해제
+    - farm keytab 정리는 farm 노드별로 동시에, 한 노드 안에서는 순서대로 수행 (실패분은 재조정 잡에 위임)
+
+    dry_run=true면 대상 Pod 목록만 반환한다.
 
     ---
     tags:
     - Pod
 
-    summary: 사용자 Pod 삭제
+    summary: 사용자 Pod 일괄 삭제
 
     consumes:
     - application/json
 
     parameters:
-
       - in: body
         name: body
         required: true
         schema:
-          $ref: '#/definitions/DeletePodRequest'
+          $ref: '#/definitions/BulkDeletePodsRequest'
 
     responses:
-
       200:
-        description: Pod 삭제 성공
+        description: 모든 대상 Pod 삭제 성공 (또는 dry_run)
         schema:
           type: object
           properties:
             status:
               type: string
               example: deleted
+            matched:
+              type: integer
+            deleted:
+              type: integer
+            failed:
+              type: integer
+            nodeports_released:
+              type: integer
+            krb5:
+              type: object
+            pods:
+              type: array
+              items:
+                type: object
+      207:
+        description: 일부 Pod 삭제 실패 (status=partial, pods[].error에 실패 단계/코드)
       400:
         description: 잘못된 요청
         schema:
           $ref: '#/definitions/ErrorResponse'
       500:
-        description: 삭제 실패
+        description: 대상 조회 실패
         schema:
           $ref: '#/definitions/ErrorResponse'
     """
+    data = request.get_json(force=True) or {}
+    node = data.get("node")
+    usernames = data.get("usernames") or []
+    label_selector = (data.get("label_selector") or "").strip()
+    dry_run = bool(data.get("dry_run"))
+    ns = app.config["NAMESPACE"]
 
-    data = request.get_json(force=True)
-    pod_name = data.get("pod_name")
-
-    app.logger.info(f"[DELETE POD] request received - pod_name={pod_name}")
+    app.logger.info(
+        f"[BULK DELETE] request received - node={node} usernames={len(usernames)} "
+        f"label_selector={label_selector!r} dry_run={dry_run}"
+    )
 
-    if not pod_name:
-        app.logger.warning("[DELETE POD] pod_name missing")
+    if not (node or usernames or label_selector):
         return jsonify(infra_error(
             "VALIDATE_REQUEST",
-            "INVALID_DELETE_POD_REQUEST",
-            "pod_name required",
+            "INVALID_BULK_DELETE_REQUEST",
+            "one of node, usernames, label_selector required",
+        )), 400
+    if not isinstance(usernames, list) or not all(
+        isinstance(u, str) and re.fullmatch(r"[a-z_][a-z0-9_-]*", u) for u in usernames
+    ):
+        return jsonify(infra_error(
+            "VALIDATE_REQUEST",
+            "INVALID_BULK_DELETE_REQUEST",
+            "usernames must be a list of valid usernames",
         )), 400
 
-    ns = app.config["NAMESPACE"]
-    rollback = {
-        "servicesDeleted": False,
-        "nodeportsReleased": False,
-        "podDeleteRequested": False,
-        "podDeleted": False,
-    }
+    selectors = [
+        "managed-by=ailab-infra",
+        f"{warm_pool.STATE_LABEL}!={warm_pool.STATE_STANDBY}",
+    ]
+    if usernames:
+        selectors.append(f"username in ({','.join(sorted(set(usernames)))})")
+    if label_selector:
+        selectors.append(label_selector)
 
     try:
-        if not pod_name.startswith("ailab-"):
-            app.logger.warning(f"[DELETE POD] invalid pod_name format: {pod_name}")
-            return jsonify(infra_error(
-                "VALIDATE_REQUEST",
-                "INVALID_POD_NAME",
-                "invalid pod_name",
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 400
+        list_kwargs = {"namespace": ns, "label_selector": ",".join(selectors)}
+        if node:
+            list_kwargs["field_selector"] = f"spec.nodeName={_resolve_target_node(node)}"
+        load_k8s()
+        pods = client.CoreV1Api().list_namespaced_pod(**list_kwargs).items
+    except ValueError as e:
+        return jsonify(infra_error(
+            "VALIDATE_REQUEST",
+            "INVALID_BULK_DELETE_REQUEST",
+            str(e),
+        )), 400
+    except client.exceptions.ApiException as e:
+        app.logger.exception("[BULK DELETE] pod list failed")
+        status = 400 if e.status == 400 else 500  # 잘못된 label_selector는 API server가 400으로 거부한다
+        return jsonify(infra_error(
+            "LIST_PODS",
+            "POD_LIST_FAILED",
+            e.body,
+            **k8s_error_fields(e),
+        )), status
+    except Exception as e:
+        app.logger.exception("[BULK DELETE] pod list failed")
+        return jsonify(infra_error(
+            "LIST_PODS",
+            "POD_LIST_FAILED",
+            str(e),
+        )), 500
 
-        rest = pod_name[len("ailab-"):]
-        username = rest.rsplit("-", 1)[0]
+    targets = [
+        {
+            "pod_name": p.metadata.name,
+            "username": (p.metadata.labels or {}).get("username") or _username_from_pod_name(p.metadata.name),
+            "node": p.spec.node_name,
+            "progress": _new_teardown_progress(),
+        }
+        for p in pods
+    ]
+    app.logger.info(f"[BULK DELETE] matched {len(targets)} pods")
 
-        app.logger.info(f"[DELETE POD] parsed username={username}")
-        app.logger.info("[DELETE POD] deleting NodePort services")
-        try:
-            delete_nodeport_services(pod_name, ns)
-            rollback["servicesDeleted"] = True
-        except client.exceptions.ApiException as e:
-            app.logger.exception("[DELETE POD] service deletion failed")
-            return jsonify(infra_error(
-                "DELETE_NODEPORT_SERVICE",
-                "NODEPORT_SERVICE_DELETE_FAILED",
-                e.body,
-                rollback=rollback,
-                pod_name=pod_name,
-                **k8s_error_fields(e),
-            )), 500
-        except Exception as e:
-            app.logger.exception("[DELETE POD] service deletion failed")
-            return jsonify(infra_error(
-                "DELETE_NODEPORT_SERVICE",
-                "NODEPORT_SERVICE_DELETE_FAILED",
-                str(e),
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 500
+    if dry_run:
+        return jsonify({
+            "status": "dry_run",
+            "matched": len(targets),
+            "pods": [{k: t[k] for k in ("pod_name", "username", "node")} for t in targets],
+        }), 200
 
-        app.logger.info("[DELETE POD] releasing NodePort allocations")
-        try:
-            release_nodeports(pod_name)
-            rollback["nodeportsReleased"] = True
-        except Exception as e:
-            app.logger.exception("[DELETE POD] nodeport release failed")
-            return jsonify(infra_error(
-                "RELEASE_NODEPORT",
-                "NODEPORT_RELEASE_FAILED",
-                str(e),
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 500
+    def teardown(target):
+        return _teardown_pod(
+            target["pod_name"], ns, target["progress"], target["username"],
+            pod_node_name=target["node"], release=False, cleanup_krb5=False,
+        )
 
-        app.logger.info(f"[DELETE POD] deleting pod from namespace={ns}")
+    for target, _, err in map_bounded(teardown, targets, app.config["BULK_DELETE_MAX_PARALLEL"]):
+        if isinstance(err, PodTeardownError):
+            target["error"] = {"step": err.step, "error": err.error}
+        elif err is not None:
+            app.logger.error(f"[BULK DELETE] teardown failed pod={target['pod_name']}: {err}")
+            target["error"] = {"step": "DELETE_POD", "error": "DELETE_POD_FAILED"}
+
+    # 삭제가 확인된 Pod만 NodePort/GPU row를 해제한다 (단건 삭제와 같은 순서 보장)
+    releasable = [t for t in targets if t["progress"]["podDeleted"]]
+    released_rows = 0
+    if releasable:
         try:
-            load_k8s()
-            v1 = client.CoreV1Api()
-        except Exception as e:
-            app.logger.exception("[DELETE POD] k8s client setup failed")
-            return jsonify(infra_error(
-                "DELETE_POD",
-                "K8S_CLIENT_SETUP_FAILED",
-                str(e),
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 500
-
-        pod_node_name = None
-        if app.config.get("KRB5_REALM"):
-            try:
-                pod_node_name = v1.read_namespaced_pod(pod_name, ns).spec.node_name
-            except Exception:
-                app.logger.warning("[DELETE POD] pod node lookup failed, farm 정리 건너뜀: %s", pod_name, exc_info=True)
+            released_rows = release_nodeports_bulk([t["pod_name"] for t in releasable])
+            for t in releasable:
+                t["progress"]["nodeportsReleased"] = True
+        except Exception:
+            app.logger.exception("[BULK DELETE] nodeport bulk release failed")
+            for t in releasable:
+                t.setdefault("error", {"step": "RELEASE_NODEPORT", "error": "NODEPORT_RELEASE_FAILED"})
 
-        try:
-            v1.delete_namespaced_pod(pod_name, ns)
-            rollback["podDeleteRequested"] = True
-        except client.exceptions.ApiException as e:
-            if e.status == 404:
-                rollback["podDeleted"] = True
-                app.logger.info("[DELETE POD] pod already absent: %s", pod_name)
-                return jsonify({
-                    "status": "deleted",
-                    "pod_name": pod_name,
-                    "already_absent": True,
-                    "progress": rollback,
-                }), 200
-            app.logger.exception("[DELETE POD] pod deletion failed")
-            return jsonify(infra_error(
-                "DELETE_POD",
-                "POD_DELETE_FAILED",
-                e.body,
-                rollback=rollback,
-                pod_name=pod_name,
-                **k8s_error_fields(e),
-            )), 500
-        except Exception as e:
-            app.logger.exception("[DELETE POD] pod deletion failed")
-            return jsonify(infra_error(
-                "DELETE_POD",
-                "POD_DELETE_FAILED",
-                str(e),
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 500
+    krb5_report = {"removed": 0, "pending": 0}
+    if app.config.get("KRB5_REALM"):
+        krb5_report = _remove_krb5_bulk(
+            {(t["username"], t["node"]) for t in targets if t["progress"]["podDeleted"] and t["node"]}
+        )
 
-        app.logger.info("[DELETE POD] waiting for pod deletion to complete")
-        try:
-            deleted = wait_for_pod_deleted(v1, pod_name, ns, timeout_sec=60)
-        except client.exceptions.ApiException as e:
-            app.logger.exception("[DELETE POD] deletion polling failed")
-            return jsonify(infra_error(
-                "DELETE_POD",
-                "POD_DELETE_FAILED",
-                e.body,
-                rollback=rollback,
-                pod_name=pod_name,
-                **k8s_error_fields(e),
-            )), 500
-        except Exception as e:
-            app.logger.exception("[DELETE POD] deletion polling failed")
-            return jsonify(infra_error(
-                "DELETE_POD",
-                "POD_DELETE_FAILED",
-                str(e),
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 500
+    failed = [t for t in targets if "error" in t]
+    app.logger.info(
+        f"[BULK DELETE] done matched={len(targets)} failed={len(failed)} "
+        f"nodeports_released={released_rows} krb5={krb5_report}"
+    )
+    return jsonify({
+        "status": "partial" if failed else "deleted",
+        "matched": len(targets),
+        "deleted": sum(1 for t in targets if t["progress"]["podDeleted"]),
+        "failed": len(failed),
+        "nodeports_released": released_rows,
+        "krb5": krb5_report,
+        "pods": targets,
+    }), 207 if failed else 200
+
+
+@app.route("/idle-reaper", methods=["GET"])
+def get_idle_reaper_report():
+    """
+    GPU idle reaper 회수 현황 조회
 
-        if not deleted:
-            app.logger.warning("[DELETE POD] pod deletion timed out: %s", pod_name)
-            return jsonify(infra_error(
-                "DELETE_POD",
-                "POD_DELETE_TIMEOUT",
-                "pod deletion did not complete within timeout",
-                rollback=rollback,
-                pod_name=pod_name,
-            )), 500
+    누적 회수 Pod 수와 GPU-hours(GPU 수 × idle로 붙잡고 있던 시간), 일별 GPU-hours,
+    현재 경고 상태인 Pod, 최근 회수 기록을 반환한다.
 
-        rollback["podDeleted"] = True
-        app.logger.info(f"[DELETE POD] pod deleted successfully: {pod_name}")
+    ---
+    tags:
+    - Pod
 
-        if app.config.get("KRB5_REALM") and pod_node_name:
-            try:
-                _remove_krb5_from_farm(username, pod_node_name)
-            except Exception as e:
-                app.logger.warning(f"[DELETE POD] farm 정리 실패, 재조정 잡에 위임: {username} ← {pod_node_name} — {e}")
-                _record_krb5_cleanup_pending(username, pod_node_name)
+    summary: GPU idle reaper 회수 현황
 
-        return jsonify({
-            "status": "deleted",
-            "pod_name": pod_name,
-            "progress": rollback,
-        }), 200
+    parameters:
+      - in: query
+        name: recent
+        required: false
+        type: integer
+        description: 최근 회수 기록 개수 (기본 50)
 
+    responses:
+      200:
+        description: 조회 성공
+      500:
+        description: 서버 내부 오류
+    """
+    try:
+        recent = max(0, min(int(request.args.get("recent", 50)), 500))
+        report = idle_reaper.get_report(recent)
     except Exception as e:
-        app.logger.exception("[DELETE POD] deletion failed")
+        app.logger.exception("[IDLE REAPER] report lookup failed")
         return jsonify(infra_error(
-            "DELETE_POD",
-            "DELETE_POD_FAILED",
+            "GET_IDLE_REAPER_REPORT",
+            "IDLE_REAPER_REPORT_FAILED",
             str(e),
-            rollback=rollback,
-            pod_name=pod_name,
         )), 500
 
+    return jsonify({
+        "enabled": app.config["IDLE_REAPER_ENABLED"],
+        "idle_sec": app.config["IDLE_REAPER_IDLE_SEC"],
+        "grace_sec": app.config["IDLE_REAPER_GRACE_SEC"],
+        **report,
+    }), 200
+
+
 def _migrate_internal(data):
 
     load_k8s()
@@ -1566,16 +3477,21 @@ def _migrate_internal(data):
     prom_url = app.config["PROM_URL"]
     timeout = app.config["HTTP_TIMEOUT_SEC"]
 
-    current_score = get_node_gpu_score(current_node, prom_url, timeout)
-    scores = {
-        node: get_node_gpu_score(node, prom_url, timeout)
-        for node in candidate_nodes
-    }
+    # 현재 노드와 후보 노드를 PromQL 한 번으로 계산한다.
+    scores = get_node_gpu_scores([current_node, *candidate_nodes], prom_url, timeout)
+    current_score = scores.pop(current_node)
+    if current_score == float("inf"):
+        # Prometheus 조회 실패 — 비교할 기준이 없으므로 옮기지 않는다.
+        return jsonify({
+            "status": "skipped",
+            "reason": "gpu_score_unavailable",
+            "current_node": current_node,
+        }), 200
 
-    best_node, best_score = min(scores.items(), key=lambda x: x[1])
+    best_node, best_score, move = scheduler.migration_target(current_score, scores, min_ratio)
 
     # 3. 이전(migrate) 기준 판단
-    if best_score > current_score * (1 - min_ratio):
+    if not move:
         return jsonify({
             "status": "skipped",
             "reason": "no_significant_improvement",
@@ -1587,10 +3503,13 @@ def _migrate_internal(data):
 
     # 4. WAS에서 사용자 정보 조회
     was_url = app.config["WAS_URL_TEMPLATE"].format(username=username)
-    resp = requests.get(
-        was_url,
-        timeout=app.config["HTTP_TIMEOUT_SEC"]
-    )
+    with track_outbound("was"):
+        resp = requests.get(
+            was_url,
+            timeout=app.config["HTTP_TIMEOUT_SEC"]
+        )
+        if resp.status_code >= 400:
+            record_outbound_error("was", f"http_{resp.status_code}")
 
     app.logger.info(f"[MIGRATE] WAS status={resp.status_code}")
     app.logger.debug(f"[MIGRATE] WAS body={resp.text}")
@@ -1640,7 +3559,7 @@ def _migrate_internal(data):
 
     # 9. 새 Pod 성공 후 Service 생성
     try:
-        create_nodeport_services(
+        create_pod_services(
             username,
             ns,
             new_pod_name,
@@ -1650,6 +3569,7 @@ def _migrate_internal(data):
         v1.delete_namespaced_pod(new_pod_name, ns)
         release_nodeports(new_pod_name)
         return jsonify({"error": "service creation failed"}), 500
+    bind_nodeports(new_pod_name)
 
     # 10. 기존 Pod 정리
     delete_nodeport_services(old_pod_name, ns)
@@ -1661,10 +3581,47 @@ def _migrate_internal(data):
         "from": current_node,
         "to": best_node,
         "new_pod": new_pod_name,
-        "ports": allocated_ports
+        "ports": allocated_ports,
+        **_pod_access_fields(username),
     }), 200
 
 
+@app.route("/node-scores", methods=["GET"])
+def get_node_scores():
+    """
+    노드 GPU score cache 조회
+
+    이 worker의 node_scores cache(노드별 score와 마지막 갱신 후 지난 시간)를 반환한다.
+    fresh가 false면 node selection은 cache 대신 Prometheus를 직접 조회한다.
+
+    ---
+    tags:
+    - Node
+
+    summary: 노드 GPU score cache 상태
+
+    responses:
+      200:
+        description: 조회 성공
+        schema:
+          type: object
+          properties:
+            age_sec:
+              type: number
+            fresh:
+              type: boolean
+            refreshed_at:
+              type: number
+            last_error:
+              type: string
+            scores:
+              type: object
+              additionalProperties:
+                type: number
+    """
+    return jsonify(node_scores.get_state()), 200
+
+
 @app.route("/migrate", methods=["POST"])
 def migrate():
     """
@@ -1764,7 +3721,10 @@ def _farm_ad_ssh(remote_command: str, stdin_data: str = "") -> str:
                f"{app.config['FARM_AD_SSH_USER']}@{node['host']}",
                remote_command]
         try:
-            result = subprocess.run(cmd, input=stdin_data, capture_output=True, text=True, timeout=30)
+            with track_outbound("farm_ad_ssh"):
+                result = subprocess.run(cmd, input=stdin_data, capture_output=True, text=True, timeout=30)
+                if result.returncode != 0:
+                    record_outbound_error("farm_ad_ssh", f"exit_{result.returncode}")
         except subprocess.TimeoutExpired as e:
             last_error = e
             app.logger.warning(f"[FARM AD SSH] {node['name']} 타임아웃")
@@ -1832,9 +3792,12 @@ def _farm_ssh(host: str, port: str, remote_command: str, stdin_data: str = "") -
     last_error = None
     for attempt in range(2):
         try:
-            result = subprocess.run(
-                cmd, input=stdin_data, capture_output=True, text=True, timeout=30,
-            )
+            with track_outbound("farm_ssh"):
+                result = subprocess.run(
+                    cmd, input=stdin_data, capture_output=True, text=True, timeout=30,
+                )
+                if result.returncode != 0:
+                    record_outbound_error("farm_ssh", f"exit_{result.returncode}")
             break
         except subprocess.TimeoutExpired as e:
             last_error = e
@@ -1890,6 +3853,38 @@ def _record_krb5_cleanup_pending(username: str, node_name: str) -> None:
         conn.close()
 
 
+def _remove_krb5_bulk(pairs) -> dict:
+    """
+    (username, node_name) 목록의 farm keytab을 정리한다. farm 노드별로 동시에, 같은 노드 안에서는 순서대로 실행한다.
+    실패한 항목은 krb5_cleanup_pending에 기록해 재조정 잡에 맡긴다.
+    """
+    by_node = {}
+    for username, node_name in pairs:
+        by_node.setdefault(node_name, []).append(username)
+
+    def remove_on_node(node_name):
+        removed, pending = 0, 0
+        for username in sorted(by_node[node_name]):
+            try:
+                _remove_krb5_from_farm(username, node_name)
+                removed += 1
+            except Exception as e:
+                app.logger.warning(f"[KRB5] farm 정리 실패, 재조정 잡에 위임: {username} ← {node_name} — {e}")
+                _record_krb5_cleanup_pending(username, node_name)
+                pending += 1
+        return removed, pending
+
+    report = {"removed": 0, "pending": 0}
+    for node_name, result, err in map_bounded(remove_on_node, sorted(by_node), len(by_node)):
+        if err is not None:
+            app.logger.error(f"[KRB5] farm 일괄 정리 실패 node={node_name}: {err}")
+            report["pending"] += len(by_node[node_name])
+            continue
+        report["removed"] += result[0]
+        report["pending"] += result[1]
+    return report
+
+
 def _remove_krb5_from_all_farms(username: str) -> None:
     for node in app.config["FARM_NODES"]:
         try:
@@ -2802,6 +4797,29 @@ swagger_template = {
             }
         },
 
+        "BulkDeletePodsRequest": {
+            "type": "object",
+            "properties": {
+                "node": {
+                    "type": "string",
+                    "example": "farm3"
+                },
+                "usernames": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "example": ["user2100", "user2101"]
+                },
+                "label_selector": {
+                    "type": "string",
+                    "example": "course=ai101"
+                },
+                "dry_run": {
+                    "type": "boolean",
+                    "example": False
+                }
+            }
+        },
+
         "DeletePodRequest": {
             "type": "object",
             "required": ["pod_name"],
@@ -2833,5 +4851,41 @@ app.config['SWAGGER'] = {
 # config와 template를 모두 넣어준다.
 swagger = Swagger(app, config=swagger_config, template=swagger_template)
 
+def start_background_workers():
+    """gunicorn worker 초기화(post_worker_init) 또는 단독 실행 시 주기 작업 thread를 시작한다."""
+    start_worker_thread(app, "pod_index_watch", pod_index.run_watch)
+    start_worker_thread(app, "service_ports_watch", service_ports.run_watch)
+    if app.config["NODE_SCORE_QUERY_MODE"] == "batch":
+        # per_node 모드에는 모든 노드를 한 번에 받을 Prometheus가 없으므로 cache 없이 매번 노드별로 조회한다.
+        start_periodic_task(app, "node_score_refresh", app.config["NODE_SCORE_REFRESH_SEC"], node_scores.refresh)
+    for i in range(app.config["DELETE_JOB_CONSUMERS"]):
+        start_worker_thread(app, f"delete_job_consumer_{i}", run_delete_job_consumer)
+    start_periodic_task(app, "delete_jobs_maintenance", 5, maintain_delete_jobs, leader=True)
+    start_periodic_task(
+        app, "nodeport_reconcile", app.config["NODEPORT_RECONCILE_INTERVAL_SEC"],
+        reconcile_nodeport_allocations, leader=True,
+    )
+    start_periodic_task(
+        app, "nodeport_lease_reclaim", app.config["NODEPORT_LEASE_RECLAIM_INTERVAL_SEC"],
+        reclaim_expired_nodeport_leases, leader=True,
+    )
+    if app.config["WARM_POOL_ENABLED"]:
+        start_periodic_task(
+            app, "warm_pool_refill", app.config["WARM_POOL_REFILL_INTERVAL_SEC"],
+            refill_warm_pool, leader=True,
+        )
+    if app.config["IDLE_REAPER_ENABLED"]:
+        start_periodic_task(
+            app, "idle_reaper", app.config["IDLE_REAPER_INTERVAL_SEC"],
+            idle_reaper.run_idle_reaper, leader=True,
+        )
+    if app.config["PREPULL_ENABLED"]:
+        start_periodic_task(
+            app, "image_prepull", app.config["PREPULL_INTERVAL_SEC"],
+            image_prepull.run_prepull, leader=True,
+        )
+
+
 if __name__ == "__main__":
+    start_background_workers()
     app.run(host="0.0.0.0", port=8000)
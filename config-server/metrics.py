@@ -0,0 +1,264 @@
+"""
+config-server 자체 Prometheus metrics (/metrics).
+
+gunicorn worker가 여러 개이므로 PROMETHEUS_MULTIPROC_DIR가 설정되어 있으면 prometheus_client
+multiprocess 모드로 동작한다. 각 worker가 값을 디렉토리의 mmap 파일에 쓰고, /metrics는 어느 worker가
+받든 모든 worker 파일을 합쳐서 응답한다. 디렉토리 정리와 종료된 worker 파일 처리는 gunicorn.conf.py hook이 맡는다.
+
+- route별 요청 latency/status: init_app()이 before/after_request hook을 건다.
+- 외부 호출 latency/오류: track_outbound(target)으로 감싼다. k8s(ApiClient.request), Redis(execute_command,
+  pipeline execute)는 instrument_kubernetes()/instrument_redis()로 client 전체에, MySQL은 TrackedCursor로 건다.
+- MySQL connection pool의 대기 시간/사용 중 연결 수/연결 생성·폐기는 utils.MySQLPool이 기록한다.
+- NodePort pool 점유율과 계정 파일 크기는 /metrics 요청 시점에 DB/NFS에서 직접 계산한다.
+"""
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+import pymysql
+from flask import current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    # reconcile_krb5.py 같은 단독 실행에서도 metric 생성이 실패하지 않도록 디렉토리를 보장한다.
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+# /create-pod는 이미지 pull 대기로 수 분 걸릴 수 있어 기본 bucket(최대 10초)보다 넓게 잡는다.
+LATENCY_BUCKETS_SEC = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "config_server_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS_SEC,
+)
+OUTBOUND_DURATION = Histogram(
+    "config_server_outbound_request_duration_seconds",
+    "Latency of calls from config-server to external systems",
+    ["target"],
+    buckets=LATENCY_BUCKETS_SEC,
+)
+OUTBOUND_ERRORS = Counter(
+    "config_server_outbound_errors_total",
+    "Failed calls from config-server to external systems",
+    ["target", "kind"],
+)
+CONFIG_WEBHOOK_LOOKUPS = Counter(
+    "config_server_config_webhook_lookups_total",
+    "/config attach lookups by source (index hit/miss, API server fallback)",
+    ["source"],
+)
+DB_POOL_WAIT = Histogram(
+    "config_server_db_pool_wait_seconds",
+    "Time spent waiting for a pooled MySQL connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_IN_USE = Gauge(
+    "config_server_db_pool_connections_in_use",
+    "Pooled MySQL connections currently checked out",
+    multiprocess_mode="livesum",
+)
+DB_POOL_EVENTS = Counter(
+    "config_server_db_pool_events_total",
+    "MySQL pool connection events (created, reused, discarded by reason, timeout)",
+    ["event"],
+)
+POD_CREATIONS_IN_FLIGHT = Gauge(
+    "config_server_pod_creations_in_flight",
+    "/create-pod requests currently being processed",
+    multiprocess_mode="livesum",
+)
+
+
+def _error_kind(e: Exception) -> str:
+    status = getattr(e, "status", None)
+    if isinstance(status, int):
+        return f"http_{status}"
+    return type(e).__name__
+
+
+@contextmanager
+def track_outbound(target: str):
+    """with 블록(또는 데코레이터로 감싼 함수)의 소요 시간을 target별로 기록하고, 예외가 나가면 오류로 센다."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        OUTBOUND_ERRORS.labels(target, _error_kind(e)).inc()
+        raise
+    finally:
+        OUTBOUND_DURATION.labels(target).observe(time.perf_counter() - started)
+
+
+def record_outbound_error(target: str, kind: str) -> None:
+    """예외 없이 끝났지만 실패인 호출(0이 아닌 exit code, HTTP 4xx/5xx 응답)을 오류로 센다. track_outbound 블록 안에서 호출한다."""
+    OUTBOUND_ERRORS.labels(target, kind).inc()
+
+
+class TrackedCursor(pymysql.cursors.Cursor):
+    """query 실행 시간을 mysql target으로 기록하는 pymysql cursor."""
+
+    def execute(self, query, args=None):
+        with track_outbound("mysql"):
+            return super().execute(query, args)
+
+
+def _wrap_once(owner, attr: str, target) -> None:
+    """target은 label 문자열이거나, 호출 인자를 받아 label을 정하는 함수이다."""
+    original = getattr(owner, attr)
+    if getattr(original, "_tracked_outbound", False):
+        return
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        with track_outbound(target(args) if callable(target) else target):
+            return original(*args, **kwargs)
+
+    wrapper._tracked_outbound = True
+    setattr(owner, attr, wrapper)
+
+
+def instrument_kubernetes() -> None:
+    """모든 Kubernetes API 호출이 지나는 ApiClient.request에 계측을 건다."""
+    from kubernetes.client import api_client
+    _wrap_once(api_client.ApiClient, "request", "k8s")
+
+
+# 서버에서 timeout까지 기다릴 수 있는 명령. 대기 시간이 latency histogram을 덮지 않도록 redis_blocking target으로 따로 기록한다.
+_REDIS_BLOCKING_COMMANDS = frozenset({
+    "BLMOVE", "BRPOPLPUSH", "BLPOP", "BRPOP", "BLMPOP", "BZPOPMIN", "BZPOPMAX", "BZMPOP",
+})
+
+
+def _redis_command_target(args) -> str:
+    # args = (client, command name, *command args)
+    if len(args) < 2:
+        return "redis"
+    command = str(args[1]).upper()
+    if command in _REDIS_BLOCKING_COMMANDS:
+        return "redis_blocking"
+    if command in ("XREAD", "XREADGROUP") and any(str(a).upper() == "BLOCK" for a in args[2:]):
+        return "redis_blocking"
+    return "redis"
+
+
+def instrument_redis() -> None:
+    """redis-py 단일 명령과 pipeline 실행에 계측을 건다 (모듈별 client 모두에 적용). blocking 명령은 redis_blocking target이다."""
+    import redis
+    _wrap_once(redis.Redis, "execute_command", _redis_command_target)
+    _wrap_once(redis.client.Pipeline, "execute", "redis")
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop("_metrics_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        HTTP_REQUEST_DURATION.labels(request.method, route, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
+def _count_entries(path: str) -> int:
+    with open(path, "r") as f:
+        return sum(1 for line in f if line.strip() and not line.startswith("#"))
+
+
+class _ScrapeTimeCollector:
+    """요청 시점에 계산하는 gauge (worker 간 합산이 필요 없는 클러스터/파일 상태)."""
+
+    def collect(self):
+        yield from self._nodeport_pool()
+        yield from self._account_files()
+
+    def _nodeport_pool(self):
+        from utils import get_db_connection
+
+        cfg = current_app.config
+        pool_size = cfg["NODEPORT_MAX"] - cfg["NODEPORT_MIN"] + 1
+        size = GaugeMetricFamily("config_server_nodeport_pool_size", "NodePorts in the allocatable range")
+        size.add_metric([], pool_size)
+        yield size
+
+        try:
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT node_name, COUNT(*) FROM nodeport_allocations GROUP BY node_name")
+                    rows = cur.fetchall()
+            finally:
+                conn.close()
+        except Exception:
+            current_app.logger.warning("[METRICS] nodeport occupancy query failed", exc_info=True)
+            return
+
+        allocated = GaugeMetricFamily(
+            "config_server_nodeport_allocated",
+            "NodePorts recorded in nodeport_allocations by node",
+            labels=["node"],
+        )
+        for node_name, count in rows:
+            allocated.add_metric([node_name], count)
+        yield allocated
+
+        ratio = GaugeMetricFamily("config_server_nodeport_pool_occupancy_ratio", "Allocated / allocatable NodePorts")
+        ratio.add_metric([], sum(count for _, count in rows) / pool_size)
+        yield ratio
+
+    def _account_files(self):
+        cfg = current_app.config
+        size = GaugeMetricFamily("config_server_account_file_bytes", "Size of shared account files", labels=["file"])
+        entries = GaugeMetricFamily("config_server_account_file_entries", "Entries in shared account files", labels=["file"])
+        for key in ("PASSWD_PATH", "GROUP_PATH", "SHADOW_PATH"):
+            path = cfg[key]
+            name = os.path.basename(path)
+            try:
+                size.add_metric([name], os.path.getsize(path))
+                entries.add_metric([name], _count_entries(path))
+            except OSError:
+                current_app.logger.warning(f"[METRICS] account file unreadable: {path}")
+        yield size
+        yield entries
+
+        try:
+            sudoers = len(os.listdir(cfg["SUDOERS_DIR"]))
+        except OSError:
+            return
+        count = GaugeMetricFamily("config_server_sudoers_files", "Files in the shared sudoers.d directory")
+        count.add_metric([], sudoers)
+        yield count
+
+
+def render_metrics():
+    """/metrics 응답 본문과 content type. multiprocess 모드면 모든 worker 값을 합친다."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    scrape_registry = CollectorRegistry()
+    scrape_registry.register(_ScrapeTimeCollector())
+    return generate_latest(registry) + generate_latest(scrape_registry), CONTENT_TYPE_LATEST
+
+
+def init_app(flask_app) -> None:
+    flask_app.before_request(_before_request)
+    flask_app.after_request(_after_request)
+    instrument_kubernetes()
+    instrument_redis()
@@ -0,0 +1,223 @@
+"""
+config-server MySQL schema migration.
+
+config-server가 쓰는 table(nodeport_allocations, gpu_device_allocations, krb5_cleanup_pending)의 schema와 index를 버전별로 관리한다.
+적용된 버전은 schema_migrations에 기록하고, 아직 적용되지 않은 migration만 순서대로 실행한다.
+
+- gunicorn master 시작 시(gunicorn.conf.py on_starting) 자동으로 실행되고, `python migrations.py`로 직접 실행할 수도 있다.
+- 여러 config-server Pod가 동시에 뜨더라도 GET_LOCK으로 한 곳에서만 실행한다.
+- 운영 DB에는 이 모듈 이전에 수동으로 만든 table이 이미 있으므로 CREATE TABLE은 IF NOT EXISTS,
+  index 추가는 information_schema로 존재 여부를 먼저 확인한다.
+- MySQL DDL은 implicit commit이라 migration 하나가 중간에 실패하면 앞 문장은 이미 반영되어 있다.
+  그래서 각 단계를 다시 실행해도 안전하게 작성한다.
+
+Flask app 없이 동작해야 하므로 utils.get_db_connection 대신 DB_* 환경변수로 직접 연결한다.
+"""
+import logging
+import os
+import sys
+from typing import Callable, List, Tuple
+
+import pymysql
+
+logger = logging.getLogger("migrations")
+
+LOCK_NAME = "config_server_schema_migrations"
+LOCK_TIMEOUT_SEC = 60
+
+_MYSQL_DUP_ENTRY = 1062
+
+
+def _index_exists(cur, table: str, index: str) -> bool:
+    cur.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND INDEX_NAME=%s LIMIT 1",
+        (table, index),
+    )
+    return cur.fetchone() is not None
+
+
+def _column_exists(cur, table: str, column: str) -> bool:
+    cur.execute(
+        "SELECT 1 FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s LIMIT 1",
+        (table, column),
+    )
+    return cur.fetchone() is not None
+
+
+def _add_index(cur, table: str, index: str, definition: str) -> None:
+    if _index_exists(cur, table, index):
+        return
+    cur.execute(f"ALTER TABLE {table} ADD {definition}")
+
+
+def _add_unique_index(cur, table: str, index: str, definition: str) -> bool:
+    """UNIQUE key를 추가하고 key가 있으면 True를 반환한다. 기존 행에 중복이 있어 ALTER가 실패하면 경고를 남기고 False를 반환한다.
+    key 없이도 호출하는 쪽이 동작해야 한다 (allocate_nodeports는 named lock 직렬화, krb5_cleanup_pending은 중복 행 허용)."""
+    try:
+        _add_index(cur, table, index, definition)
+    except pymysql.err.IntegrityError as e:
+        if e.args[0] != _MYSQL_DUP_ENTRY:
+            raise
+        logger.warning(f"[MIGRATION] {table}.{index} skipped: duplicate rows exist ({e.args[1]}). "
+                       f"dedupe the table; the key is retried on next startup")
+        return False
+    return True
+
+
+def _m0001_create_nodeport_allocations(cur) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS nodeport_allocations (
+            id            BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+            username      VARCHAR(64)  NOT NULL,
+            pod_name      VARCHAR(253) NOT NULL,
+            node_name     VARCHAR(253) NOT NULL,
+            internal_port INT          NOT NULL,
+            node_port     INT          NOT NULL,
+            purpose       VARCHAR(64)  NOT NULL DEFAULT 'custom',
+            created_at    DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def _m0002_create_krb5_cleanup_pending(cur) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS krb5_cleanup_pending (
+            username  VARCHAR(64)  NOT NULL,
+            node_name VARCHAR(253) NOT NULL,
+            failed_at DATETIME     NOT NULL,
+            PRIMARY KEY (username, node_name)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def _m0003_nodeport_allocations_indexes(cur) -> bool:
+    # allocate_nodeports()의 행 단위 claim이 기대는 key
+    unique_added = _add_unique_index(cur, "nodeport_allocations", "uq_nodeport_allocations_node_port",
+               "UNIQUE KEY uq_nodeport_allocations_node_port (node_port)")
+    # release_nodeports(), get_pod_nodeports(), reconcile의 SELECT DISTINCT pod_name
+    _add_index(cur, "nodeport_allocations", "idx_nodeport_allocations_pod_name",
+               "KEY idx_nodeport_allocations_pod_name (pod_name)")
+    # reconcile_krb5의 WHERE node_name=… DISTINCT username, metrics의 GROUP BY node_name
+    _add_index(cur, "nodeport_allocations", "idx_nodeport_allocations_node_name",
+               "KEY idx_nodeport_allocations_node_name (node_name, username)")
+    return unique_added
+
+
+def _m0004_krb5_cleanup_pending_key(cur) -> bool:
+    # 수동으로 만든 table에 (username, node_name) key가 없으면 ON DUPLICATE KEY UPDATE가 중복 행을 쌓는다.
+    cur.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='krb5_cleanup_pending' "
+        "AND NON_UNIQUE=0 AND COLUMN_NAME IN ('username', 'node_name') "
+        "GROUP BY INDEX_NAME HAVING COUNT(*)=2 LIMIT 1"
+    )
+    if cur.fetchone() is not None:
+        return True
+    return _add_unique_index(cur, "krb5_cleanup_pending", "uq_krb5_cleanup_pending_user_node",
+                             "UNIQUE KEY uq_krb5_cleanup_pending_user_node (username, node_name)")
+
+
+def _m0005_nodeport_lease(cur) -> None:
+    # reserved: allocate_nodeports()가 잡고 Service 생성 전, bound: Service까지 만들어진 할당.
+    # 이미 있는 행은 살아 있는 Pod의 것이므로 bound로 둔다.
+    if not _column_exists(cur, "nodeport_allocations", "lease_state"):
+        cur.execute(
+            "ALTER TABLE nodeport_allocations "
+            "ADD COLUMN lease_state ENUM('reserved', 'bound') NOT NULL DEFAULT 'bound'"
+        )
+    if not _column_exists(cur, "nodeport_allocations", "lease_expires_at"):
+        cur.execute("ALTER TABLE nodeport_allocations ADD COLUMN lease_expires_at DATETIME NULL")
+    # 만료된 reserved 행 조회 (reclaim_expired_nodeport_leases)
+    _add_index(cur, "nodeport_allocations", "idx_nodeport_allocations_lease",
+               "KEY idx_nodeport_allocations_lease (lease_state, lease_expires_at)")
+
+
+def _m0006_create_gpu_device_allocations(cur) -> None:
+    # 노드별 GPU device(/dev/nvidiaN) 점유. (node_name, gpu_index) UNIQUE key가 allocate_gpu_devices()의 행 단위 claim을 막아준다.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS gpu_device_allocations (
+            id         BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+            username   VARCHAR(64)  NOT NULL DEFAULT '',
+            pod_name   VARCHAR(253) NOT NULL,
+            node_name  VARCHAR(253) NOT NULL,
+            gpu_index  INT          NOT NULL,
+            created_at DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id),
+            UNIQUE KEY uq_gpu_device_allocations_node_gpu (node_name, gpu_index),
+            KEY idx_gpu_device_allocations_pod_name (pod_name)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "create nodeport_allocations", _m0001_create_nodeport_allocations),
+    (2, "create krb5_cleanup_pending", _m0002_create_krb5_cleanup_pending),
+    (3, "nodeport_allocations node_port/pod_name/node_name indexes", _m0003_nodeport_allocations_indexes),
+    (4, "krb5_cleanup_pending (username, node_name) unique key", _m0004_krb5_cleanup_pending_key),
+    (5, "nodeport_allocations lease_state/lease_expires_at", _m0005_nodeport_lease),
+    (6, "create gpu_device_allocations", _m0006_create_gpu_device_allocations),
+]
+
+
+def _connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        autocommit=True,
+    )
+
+
+def applied_versions(cur) -> set:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INT          NOT NULL,
+            name       VARCHAR(255) NOT NULL,
+            applied_at DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def run_migrations() -> List[int]:
+    """적용되지 않은 migration을 순서대로 실행하고 이번에 적용한 버전 목록을 반환한다.
+    migration 함수가 False를 반환하면 (UNIQUE key를 중복 행 때문에 건너뜀) 버전을 기록하지 않아 다음 시작 때 다시 시도한다.
+    모든 migration은 idempotent해야 한다."""
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SEC))
+            if cur.fetchone()[0] != 1:
+                raise RuntimeError("schema migration lock timeout")
+            try:
+                done = applied_versions(cur)
+                applied = []
+                for version, name, fn in MIGRATIONS:
+                    if version in done:
+                        continue
+                    logger.info(f"[MIGRATION] applying {version:04d} {name}")
+                    if fn(cur) is False:
+                        logger.warning(f"[MIGRATION] {version:04d} {name} incomplete; not recorded, will retry")
+                        continue
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                    applied.append(version)
+                logger.info(f"[MIGRATION] up to date (applied now={applied})")
+                return applied
+            finally:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+                        format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+    from dotenv import load_dotenv
+    load_dotenv()
+    run_migrations()
@@ -0,0 +1,101 @@
+"""
+노드 GPU score 메모리 cache (node selection용).
+
+DCGM metric은 15–30초마다 scrape되므로 /create-pod, /migrate마다 Prometheus를 조회할 필요가 없다.
+각 gunicorn worker의 주기 작업(refresh)이 DCGM을 내보내는 모든 노드의 score를 PromQL 한 번으로 받아 두고,
+utils.get_node_gpu_scores()는 cache가 충분히 새로우면 dict 조회만 한다.
+
+- cache가 NODE_SCORE_MAX_AGE_SEC보다 오래됐거나(refresh 연속 실패 등) 한 번도 채워지지 않았으면
+  lookup()은 None을 돌려주고, 호출하는 쪽이 직접 조회한다.
+- cache에 없는 노드는 DCGM metric이 없는 노드이므로 직접 조회와 같이 0.0이다.
+- scheduler의 GPU capacity filter가 쓰는 노드별 GPU 개수(DCGM count)도 같은 주기로 받아 둔다.
+- NODE_SCORE_QUERY_MODE=per_node면 refresh가 돌지 않는다. 대신 노드별 조회(utils.query_gpu_stats_per_node)가
+  답한 노드의 GPU 개수를 observe_gpu_counts()로 남기고, lookup_gpu_counts()가 그 값을 쓴다.
+"""
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app as app
+
+from utils import query_gpu_counts, query_gpu_scores
+
+_lock = threading.Lock()
+_scores: Dict[str, float] = {}
+_gpu_counts: Dict[str, int] = {}
+_observed_counts: Dict[str, Tuple[Optional[int], float]] = {}  # {node: (GPU 개수, 조회 시각 monotonic)}, per_node 모드
+_state = {"refreshed_at": None, "refreshed_mono": None, "last_error": None}
+
+
+def refresh() -> None:
+    """모든 노드의 GPU score를 다시 받아 cache를 바꿔 끼운다. 실패하면 기존 cache를 그대로 둔다."""
+    global _scores, _gpu_counts
+    try:
+        scores = query_gpu_scores(None, app.config["PROM_URL"], app.config["HTTP_TIMEOUT_SEC"])
+        gpu_counts = query_gpu_counts(None, app.config["PROM_URL"], app.config["HTTP_TIMEOUT_SEC"])
+    except Exception as e:
+        _state["last_error"] = str(e)
+        age = age_sec()
+        app.logger.warning(f"[NODE SCORE] refresh failed, keeping cache age={'-' if age is None else f'{age:.0f}s'}: {e}")
+        return
+    with _lock:
+        _scores = scores
+        _gpu_counts = gpu_counts
+        _state.update(refreshed_at=time.time(), refreshed_mono=time.monotonic(), last_error=None)
+    app.logger.debug(f"[NODE SCORE] refreshed nodes={len(scores)}")
+
+
+def age_sec() -> Optional[float]:
+    """마지막 성공 refresh 이후 지난 시간. 채워진 적이 없으면 None."""
+    refreshed = _state["refreshed_mono"]
+    if refreshed is None:
+        return None
+    return time.monotonic() - refreshed
+
+
+def lookup(nodes: List[str], max_age_sec: float) -> Optional[Dict[str, float]]:
+    """nodes의 cache score. cache가 max_age_sec보다 오래됐거나 비어 있으면 None."""
+    age = age_sec()
+    if age is None or age > max_age_sec:
+        return None
+    scores = _scores
+    return {node: scores.get(node, 0.0) for node in nodes}
+
+
+def observe_gpu_counts(counts: Dict[str, Optional[int]]) -> None:
+    """노드별 조회에서 얻은 GPU 개수를 남긴다 (per_node 모드). None은 DCGM에 GPU가 없다는 뜻이다."""
+    now = time.monotonic()
+    with _lock:
+        for node, count in counts.items():
+            _observed_counts[node] = (count, now)
+
+
+def lookup_gpu_counts(nodes: List[str], max_age_sec: float) -> Optional[Dict[str, Optional[int]]]:
+    """
+    nodes의 GPU 개수. DCGM에 없는 노드는 None(모름). cache가 오래됐거나 비어 있으면 None.
+    refresh cache가 없으면 observe_gpu_counts()로 남은 값을 쓰고, 그것도 max_age_sec 안에 모든 노드가 있어야 한다.
+    """
+    age = age_sec()
+    if age is not None and age <= max_age_sec:
+        counts = _gpu_counts
+        return {node: counts.get(node) for node in nodes}
+    now = time.monotonic()
+    observed = dict(_observed_counts)
+    if not nodes or any(node not in observed or now - observed[node][1] > max_age_sec for node in nodes):
+        return None
+    return {node: observed[node][0] for node in nodes}
+
+
+def get_state() -> dict:
+    age = age_sec()
+    with _lock:
+        return {
+            "age_sec": None if age is None else round(age, 1),
+            "fresh": age is not None and age <= app.config["NODE_SCORE_MAX_AGE_SEC"],
+            "refreshed_at": _state["refreshed_at"],
+            "last_error": _state["last_error"],
+            # inf(파싱 실패 sample)는 JSON으로 표현할 수 없으므로 None
+            "scores": {node: (score if math.isfinite(score) else None) for node, score in _scores.items()},
+            "gpu_counts": dict(_gpu_counts),
+        }
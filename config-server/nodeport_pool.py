@@ -0,0 +1,67 @@
+"""
+NodePort 할당 후보를 고르는 프로세스 로컬 bitmap.
+
+allocate_nodeports()는 테이블 전체를 잠그지 않고, 이 bitmap에서 비어 있어 보이는 포트를 골라
+nodeport_allocations에 바로 INSERT한다. 실제 점유 판단은 node_port UNIQUE key가 하므로
+bitmap은 "아마 비어 있는 포트"를 빠르게 찾기 위한 힌트일 뿐이다.
+
+- 다른 worker/Pod가 먼저 가져간 포트는 INSERT가 duplicate key로 실패하고, 그 포트는 사용 중으로 표시된다.
+- 해제된 포트는 다음 refresh(전체 사용 포트로 다시 채움) 때 다시 후보가 된다.
+- worker마다 시작 위치(cursor)를 무작위로 두어 동시에 같은 포트를 고르는 충돌을 줄인다.
+"""
+import random
+import threading
+import time
+from typing import Iterable, Optional
+
+
+class NodePortBitmap:
+    def __init__(self, port_min: int, port_max: int):
+        self.port_min = port_min
+        self.port_max = port_max
+        self.size = port_max - port_min + 1
+        self._used = bytearray(self.size)
+        self._cursor = random.randrange(self.size)
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None  # time.monotonic() 기준, 한 번도 안 채웠으면 None
+
+    def is_stale(self, max_age_sec: float) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age_sec
+
+    def reset(self, used_ports: Iterable[int]) -> None:
+        """사용 중인 포트 전체로 bitmap을 다시 채운다."""
+        used = bytearray(self.size)
+        for port in used_ports:
+            if self.port_min <= port <= self.port_max:
+                used[port - self.port_min] = 1
+        with self._lock:
+            self._used = used
+            self.loaded_at = time.monotonic()
+
+    def take(self) -> Optional[int]:
+        """cursor부터 빈 포트 하나를 찾아 사용 중으로 표시하고 반환한다. 모두 사용 중이면 None."""
+        with self._lock:
+            idx = self._used.find(0, self._cursor)
+            if idx < 0:
+                idx = self._used.find(0, 0, self._cursor)
+            if idx < 0:
+                return None
+            self._used[idx] = 1
+            self._cursor = (idx + 1) % self.size
+            return self.port_min + idx
+
+    def mark_used(self, port: int) -> None:
+        if self.port_min <= port <= self.port_max:
+            with self._lock:
+                self._used[port - self.port_min] = 1
+
+    def release(self, port: int) -> None:
+        """take()로 가져갔지만 INSERT하지 못한(rollback된) 포트를 다시 후보로 돌린다."""
+        if self.port_min <= port <= self.port_max:
+            with self._lock:
+                self._used[port - self.port_min] = 0
+
+    def free_count(self) -> int:
+        with self._lock:
+            return self.size - sum(self._used)
+
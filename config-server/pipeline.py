@@ -0,0 +1,176 @@
+"""
+Pod 생성 경로에서 서로 의존하지 않는 단계를 동시에 실행하기 위한 작은 의존성 그래프 실행기.
+
+- 각 Stage는 이름, 실행 함수, 선행 Stage 이름 목록, 선택적인 rollback 함수를 가진다.
+- 선행 Stage가 모두 끝난 Stage부터 thread pool에서 실행한다.
+- 한 Stage가 실패하면 아직 시작하지 않은 Stage는 시작하지 않고(취소),
+  이미 실행 중인 Stage가 끝나기를 기다린 뒤 완료된 Stage의 rollback을 완료 역순으로 수행한다.
+- 단계 함수는 flask current_app을 쓰는 utils 함수를 호출하므로 worker thread에도 app context를 넣어준다.
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app as app
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[dict], object],
+        deps: Iterable[str] = (),
+        rollback: Optional[Callable[[object], None]] = None,
+    ):
+        """
+        Args:
+            name: Stage 이름 (결과 dict의 key)
+            fn: 선행 Stage 결과 dict({dep_name: result})를 받아 결과를 반환하는 함수
+            deps: 선행 Stage 이름 목록
+            rollback: 이 Stage가 완료된 뒤 다른 Stage가 실패했을 때 호출할 함수 (Stage 결과를 인자로 받음)
+        """
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.rollback = rollback
+
+
+class PipelineError(Exception):
+    """Stage 실패. cause는 원래 예외, rollback은 {stage_name: rollback 성공 여부}."""
+
+    def __init__(self, stage: str, cause: Exception, results: dict, rollback: Dict[str, bool]):
+        super().__init__(str(cause))
+        self.stage = stage
+        self.cause = cause
+        self.results = results
+        self.rollback = rollback
+
+
+def _call_with_app_context(flask_app, fn, *args, **kwargs):
+    with flask_app.app_context():
+        return fn(*args, **kwargs)
+
+
+def _validate(stages: List[Stage]) -> None:
+    names = [s.name for s in stages]
+    if len(names) != len(set(names)):
+        raise ValueError(f"duplicate stage names: {names}")
+    for s in stages:
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"stage {s.name!r} depends on unknown stages {missing}")
+
+
+def run_pipeline(stages: List[Stage], max_workers: int = 4, tag: str = "[PIPELINE]") -> dict:
+    """
+    Stage 그래프를 실행하고 {stage_name: result}를 반환한다.
+
+    Raises:
+        PipelineError: 어떤 Stage가 실패한 경우 (완료된 Stage의 rollback까지 끝난 뒤 발생)
+        ValueError: 그래프 정의가 잘못된 경우 (중복 이름, 없는 dep, 순환)
+    """
+    _validate(stages)
+    flask_app = app._get_current_object()
+
+    pending = {s.name: s for s in stages}
+    results: dict = {}
+    completed: List[Stage] = []
+    running: Dict[Future, Stage] = {}
+    failure = None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as pool:
+        while True:
+            # 실패가 없을 때만 새 Stage를 시작한다 — 실패 이후 남은 Stage는 시작하지 않는 것이 곧 취소다.
+            if failure is None:
+                for name, stage in list(pending.items()):
+                    if all(d in results for d in stage.deps):
+                        del pending[name]
+                        dep_results = {d: results[d] for d in stage.deps}
+                        app.logger.debug(f"{tag} stage start: {name}")
+                        fut = pool.submit(_call_with_app_context, flask_app, stage.fn, dep_results)
+                        running[fut] = stage
+
+            if not running:
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage = running.pop(fut)
+                try:
+                    results[stage.name] = fut.result()
+                    completed.append(stage)
+                    app.logger.debug(f"{tag} stage done: {stage.name}")
+                except Exception as e:
+                    app.logger.warning(f"{tag} stage failed: {stage.name} — {e}")
+                    if failure is None:
+                        failure = (stage.name, e)
+
+    if failure is None and pending:
+        raise ValueError(f"stage graph has a cycle: {sorted(pending)}")
+
+    if failure is None:
+        return results
+
+    if pending:
+        app.logger.info(f"{tag} cancelled stages: {sorted(pending)}")
+
+    rollback: Dict[str, bool] = {}
+    for stage in reversed(completed):
+        if stage.rollback is None:
+            continue
+        try:
+            stage.rollback(results[stage.name])
+            rollback[stage.name] = True
+        except Exception:
+            app.logger.warning(f"{tag} rollback failed: {stage.name}", exc_info=True)
+            rollback[stage.name] = False
+
+    stage_name, cause = failure
+    raise PipelineError(stage_name, cause, results, rollback) from cause
+
+
+_background_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pipeline-bg")
+
+
+def call_in_background(fn, *args, **kwargs) -> Future:
+    """fn을 공용 thread pool에서 app context와 함께 실행하고 Future를 반환한다.
+    요청 처리 중 다른 단계와 겹쳐 실행해도 되는 호출(사전 조회, 이미지 로드 등)에 쓴다."""
+    flask_app = app._get_current_object()
+    return _background_executor.submit(_call_with_app_context, flask_app, fn, *args, **kwargs)
+
+
+def map_bounded(
+    fn,
+    items: Iterable,
+    max_workers: int,
+    deadline_sec: Optional[float] = None,
+) -> List[Tuple[object, object, Optional[Exception]]]:
+    """
+    items 각각에 fn을 최대 max_workers개씩 동시에 app context와 함께 실행한다.
+    한 항목의 실패가 다른 항목을 멈추지 않는다.
+
+    deadline_sec를 주면 전체를 그 시간까지만 기다린다. 그때까지 끝나지 않은 항목은 TimeoutError로 채우고,
+    시작하지 않은 항목은 취소하며 실행 중인 호출은 기다리지 않고 버린다 (fn 안의 요청별 timeout으로 끝나야 한다).
+
+    Returns:
+        입력 순서대로 (item, 결과, 예외) 목록. 성공이면 예외는 None, 실패면 결과는 None.
+    """
+    items = list(items)
+    if not items:
+        return []
+    flask_app = app._get_current_object()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix="pipeline-map")
+    try:
+        futures = [pool.submit(_call_with_app_context, flask_app, fn, item) for item in items]
+        wait(futures, timeout=deadline_sec)
+        out = []
+        for item, fut in zip(items, futures):
+            if not fut.done():
+                out.append((item, None, TimeoutError(f"deadline {deadline_sec}s exceeded")))
+                continue
+            try:
+                out.append((item, fut.result(), None))
+            except Exception as e:
+                out.append((item, None, e))
+    finally:
+        pool.shutdown(wait=deadline_sec is None, cancel_futures=deadline_sec is not None)
+    return out
@@ -0,0 +1,152 @@
+"""
+username → Running Pod 메모리 index (ContainerSSH /config webhook용).
+
+SSH 로그인마다 /config가 호출되므로 매번 API server에 Pod list를 보내지 않도록, 각 gunicorn worker의
+watch thread(run_watch)가 username 라벨이 붙은 Pod를 list 후 watch하며 index를 유지한다.
+lookup()은 dict 조회만 하므로 API server 왕복이 없다.
+
+- watch가 끊기면(timeout, 410 Gone, 네트워크 오류) 다음 run_watch() 호출이 이어서 watch하거나 다시 list한다.
+- list가 끝나기 전이나 watch 오류 직후처럼 index를 믿을 수 없을 때 lookup()은 None 대신 NOT_SYNCED를
+  돌려주고, 호출하는 쪽이 get_existing_pod()로 직접 조회한다.
+- watch가 살아 있음을 확인한 시각(heartbeat)을 기록한다. 이벤트가 없어도 watch는 WATCH_TIMEOUT_SEC마다
+  정상 종료 후 다시 시작되므로, STALE_AFTER_SEC보다 오래 heartbeat가 없으면(thread가 멈춘 경우 등) NOT_SYNCED로 본다.
+- Running 판정은 get_existing_pod()과 같다 (phase=Running, deletionTimestamp 없음).
+"""
+import threading
+import time
+from typing import Dict
+
+from flask import current_app as app
+from kubernetes import client, watch
+
+from utils import load_k8s
+
+LABEL_SELECTOR = "username"  # username 라벨이 있는 Pod만 (claim 전 warm pool standby Pod 제외)
+WATCH_TIMEOUT_SEC = 300
+STALE_AFTER_SEC = WATCH_TIMEOUT_SEC + 60
+
+NOT_SYNCED = object()
+
+_lock = threading.Lock()
+_pods: Dict[str, Dict[str, str]] = {}  # {pod_name: {"username", "phase"}}, 종료 중인 Pod는 제외
+_running: Dict[str, str] = {}  # {username: pod_name}
+_state = {"synced": False, "resource_version": None, "synced_at": None, "last_event_at": None, "heartbeat": None}
+
+
+def _is_running(pod) -> bool:
+    return pod.status.phase == "Running" and not pod.metadata.deletion_timestamp
+
+
+def _rebuild_running() -> None:
+    # lookup()은 lock 없이 읽으므로 새 dict를 만들어 한 번에 바꿔 끼운다.
+    global _running
+    running = {}
+    for pod_name, entry in sorted(_pods.items()):
+        if entry["phase"] == "Running":
+            running.setdefault(entry["username"], pod_name)
+    _running = running
+
+
+def _apply(event_type: str, pod) -> None:
+    name = pod.metadata.name
+    username = (pod.metadata.labels or {}).get("username")
+    with _lock:
+        before = _pods.get(name)
+        if event_type == "DELETED" or not username or pod.metadata.deletion_timestamp:
+            _pods.pop(name, None)
+        else:
+            _pods[name] = {"username": username, "phase": "Running" if _is_running(pod) else pod.status.phase}
+        after = _pods.get(name)
+        if before != after:
+            _rebuild_running()
+        _state["last_event_at"] = _state["heartbeat"] = time.time()
+
+
+def _relist(v1, namespace: str) -> str:
+    pods = v1.list_namespaced_pod(namespace=namespace, label_selector=LABEL_SELECTOR)
+    with _lock:
+        _pods.clear()
+        for pod in pods.items:
+            username = (pod.metadata.labels or {}).get("username")
+            if username and not pod.metadata.deletion_timestamp:
+                _pods[pod.metadata.name] = {
+                    "username": username,
+                    "phase": "Running" if _is_running(pod) else pod.status.phase,
+                }
+        _rebuild_running()
+        now = time.time()
+        _state.update(synced=True, synced_at=now, heartbeat=now)
+    app.logger.info(f"[POD INDEX] listed {len(pods.items)} pods, running users={len(_running)}")
+    return pods.metadata.resource_version
+
+
+def run_watch() -> None:
+    """
+    index를 list로 채우고 WATCH_TIMEOUT_SEC 동안 watch 이벤트를 반영한다.
+    start_worker_thread()가 반복 호출하며, 이어서 watch할 resourceVersion은 호출 사이에 유지된다.
+    """
+    namespace = app.config["NAMESPACE"]
+    load_k8s()
+    v1 = client.CoreV1Api()
+
+    if _state["resource_version"] is None or not _state["synced"]:
+        _state["resource_version"] = _relist(v1, namespace)
+
+    w = watch.Watch()
+    try:
+        for event in w.stream(
+            v1.list_namespaced_pod,
+            namespace=namespace,
+            label_selector=LABEL_SELECTOR,
+            resource_version=_state["resource_version"],
+            timeout_seconds=WATCH_TIMEOUT_SEC,
+            _request_timeout=WATCH_TIMEOUT_SEC + 30,  # 응답 없이 끊긴 연결에서 무한 대기 방지
+        ):
+            pod = event["object"]
+            _apply(event["type"], pod)
+            _state["resource_version"] = pod.metadata.resource_version
+        _state["heartbeat"] = time.time()  # 이벤트 없이 timeout으로 끝난 것도 watch가 살아 있었다는 뜻
+    except client.exceptions.ApiException as e:
+        if e.status != 410:
+            _state["synced"] = False
+            raise
+        # resourceVersion이 너무 오래되어 이어서 watch할 수 없음 → 다음 호출에서 다시 list
+        app.logger.info("[POD INDEX] watch expired (410), relisting")
+        _state["resource_version"] = None
+    except Exception:
+        _state["synced"] = False
+        raise
+    finally:
+        w.stop()
+
+
+def staleness_sec():
+    """마지막 heartbeat 이후 지난 시간. 동기화된 적이 없으면 None."""
+    heartbeat = _state["heartbeat"]
+    if heartbeat is None:
+        return None
+    return time.time() - heartbeat
+
+
+def is_healthy() -> bool:
+    age = staleness_sec()
+    return _state["synced"] and age is not None and age <= STALE_AFTER_SEC
+
+
+def lookup(username: str):
+    """username의 Running Pod 이름, 없으면 None. index를 믿을 수 없으면(동기화 전, heartbeat stale) NOT_SYNCED."""
+    if not is_healthy():
+        return NOT_SYNCED
+    return _running.get(username)
+
+
+def get_state() -> dict:
+    with _lock:
+        return {
+            "synced": _state["synced"],
+            "synced_at": _state["synced_at"],
+            "last_event_at": _state["last_event_at"],
+            "heartbeat": _state["heartbeat"],
+            "indexed_pods": len(_pods),
+            "running_users": len(_running),
+        }
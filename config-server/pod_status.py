@@ -1,33 +1,210 @@
-import os
 import json
-import redis
+import time
 from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
 
-REDIS_HOST = os.getenv("REDIS_HOST", "redis-bg-master.ailab-infra.svc.cluster.local")
-REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
-REDIS_DB = int(os.getenv("REDIS_DB", "0"))
-
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+from redis_client import r
 
 STATUS_TTL_SEC = 3600  # 완료/실패 후에도 조회 가능하도록 1시간 유지, 이후 자동 만료
 
+TERMINAL_STAGES = ("ready", "failed")
+TOTAL_STAGE = "total"  # 요청 전체(started → ready/failed) 소요 시간
+UNKNOWN_NODE = "unknown"  # 노드가 정해지기 전에 끝난 요청 (예: 노드 선택 실패)
+
+# 단계별 소요 시간 histogram bucket 상한(초). 마지막 +Inf bucket은 항상 포함된다.
+LATENCY_BUCKETS_SEC = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_SERIES_KEY = "pod_latency:series"
+_SINCE_KEY = "pod_latency:since"
+
+
+def _status_key(username: str) -> str:
+    return f"pod_status:{username}"
+
+
+def _channel(username: str) -> str:
+    # 단계가 바뀔 때마다 같은 JSON을 publish한다 (/pods/<username>/status/stream 구독용)
+    return f"pod_status_events:{username}"
+
+
+def _timing_key(username: str) -> str:
+    return f"pod_timing:{username}"
+
+
+def _hist_key(series: str) -> str:
+    return f"pod_latency:hist:{series}"
+
+
+def _series_id(stage: str, node: str, outcome: str) -> str:
+    return f"{stage}|{node}|{outcome}"
+
+
+def _bucket_field(le) -> str:
+    return f"le:{le}"
+
+
+def _observe(pipe, stage: str, node: str, outcome: str, seconds: float) -> None:
+    series = _series_id(stage, node, outcome)
+    key = _hist_key(series)
+    le = next((b for b in LATENCY_BUCKETS_SEC if seconds <= b), "+Inf")
+    pipe.sadd(_SERIES_KEY, series)
+    pipe.hincrby(key, _bucket_field(le), 1)
+    pipe.hincrby(key, "count", 1)
+    pipe.hincrbyfloat(key, "sum", seconds)
+
+
+def _record_stage_timing(username: str, stage: str, node: Optional[str], now: float) -> None:
+    """
+    직전 단계의 소요 시간을 요청별 timing 기록(pod_timing:<username>)에 더하고,
+    최종 단계(ready/failed)면 단계별/전체 소요 시간을 (stage, node, outcome) histogram에 반영한다.
+    """
+    key = _timing_key(username)
+    raw = None if stage == "started" else r.get(key)
+    timing = json.loads(raw) if raw else {"started_at": now, "durations": {}, "node": None}
 
-def set_pod_creation_status(username: str, stage: str, message: str = "") -> None:
-    key = f"pod_status:{username}"
+    prev_stage = timing.get("stage")
+    if prev_stage and prev_stage not in TERMINAL_STAGES:
+        elapsed = max(0.0, now - timing["entered_at"])
+        timing["durations"][prev_stage] = timing["durations"].get(prev_stage, 0.0) + elapsed
+    if node:
+        timing["node"] = node
+    timing["stage"] = stage
+    timing["entered_at"] = now
+
+    pipe = r.pipeline()
+    if stage in TERMINAL_STAGES and prev_stage not in TERMINAL_STAGES:
+        label_node = timing["node"] or UNKNOWN_NODE
+        for name, seconds in timing["durations"].items():
+            _observe(pipe, name, label_node, stage, seconds)
+        _observe(pipe, TOTAL_STAGE, label_node, stage, max(0.0, now - timing["started_at"]))
+        pipe.set(_SINCE_KEY, datetime.now(timezone.utc).isoformat(), nx=True)
+    pipe.set(key, json.dumps(timing), ex=STATUS_TTL_SEC)
+    pipe.execute()
+
+
+def set_pod_creation_status(username: str, stage: str, message: str = "", node: Optional[str] = None) -> None:
+    """
+    username의 Pod 생성 단계를 기록한다.
+
+    node를 넘기면 이 요청의 단계별 소요 시간 histogram에 그 노드 라벨이 붙는다 (이후 호출에서 생략해도 유지).
+    """
     data = {
         "stage": stage,
         "message": message,
         "updated_at": datetime.now(timezone.utc).isoformat(),
     }
     try:
-        r.set(key, json.dumps(data), ex=STATUS_TTL_SEC)
+        payload = json.dumps(data)
+        r.set(_status_key(username), payload, ex=STATUS_TTL_SEC)
+        r.publish(_channel(username), payload)
+        _record_stage_timing(username, stage, node, time.time())
     except Exception:
         pass  # 상태 조회는 부가 기능 — Redis 장애가 pod 생성 자체를 막으면 안 됨
 
 
 def get_pod_creation_status(username: str):
-    key = f"pod_status:{username}"
-    raw = r.get(key)
+    raw = r.get(_status_key(username))
     if raw is None:
         return None
     return json.loads(raw)
+
+
+def stream_pod_creation_status(username: str, max_sec: float, heartbeat_sec: float,
+                               follow: bool = False) -> Iterator[Optional[dict]]:
+    """
+    username의 Pod 생성 단계를 바뀔 때마다 yield한다. heartbeat_sec 동안 변화가 없으면 None을 yield한다.
+
+    처음에는 항상 현재 상태(이력이 없으면 stage=unknown)를 보내고, ready/failed를 보내면 끝난다. 현재 상태가 이미 최종 단계면
+    follow=True일 때만 다음 /create-pod를 기다린다. max_sec가 지나면 최종 단계가 아니어도 끝난다.
+    """
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    try:
+        # 구독을 먼저 걸고 현재 상태를 읽어야 그 사이의 단계 변화를 놓치지 않는다.
+        pubsub.subscribe(_channel(username))
+        current = get_pod_creation_status(username) or {"stage": "unknown", "message": "생성 이력 없음"}
+        yield current
+        last_sent = current.get("updated_at")
+        if current["stage"] in TERMINAL_STAGES and not follow:
+            return
+
+        deadline = time.monotonic() + max_sec
+        while time.monotonic() < deadline:
+            msg = pubsub.get_message(timeout=min(heartbeat_sec, max(0.0, deadline - time.monotonic())))
+            if msg is None:
+                yield None
+                continue
+            data = json.loads(msg["data"])
+            if data.get("updated_at") == last_sent:
+                continue  # 구독 직후 읽은 현재 상태와 같은 publish
+            yield data
+            last_sent = data.get("updated_at")
+            if data.get("stage") in TERMINAL_STAGES:
+                return
+    finally:
+        pubsub.close()
+
+
+def _round_opt(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+def _estimate_quantile(q: float, cumulative: List[tuple], count: int) -> Optional[float]:
+    """bucket 안에서 선형 보간하는 Prometheus histogram_quantile()과 같은 방식의 근사치."""
+    if count == 0:
+        return None
+    rank = q * count
+    lower, prev_count = 0.0, 0
+    for le, cum in cumulative:
+        if cum >= rank:
+            if le == "+Inf":
+                return lower  # 가장 큰 유한 bucket 상한보다 크다는 것만 알 수 있음
+            in_bucket = cum - prev_count
+            if in_bucket == 0:
+                return float(le)
+            return lower + (float(le) - lower) * (rank - prev_count) / in_bucket
+        lower, prev_count = (float(le) if le != "+Inf" else lower), cum
+    return lower
+
+
+def get_latency_histograms(stage: Optional[str] = None,
+                           node: Optional[str] = None,
+                           outcome: Optional[str] = None) -> Dict:
+    """
+    (stage, node, outcome)별 소요 시간 histogram을 조회한다. 인자를 주면 그 값으로 거른다.
+
+    bucket은 Prometheus와 같이 누적(le 이하 건수)으로 반환하고, p50/p90/p99는 bucket 기반 근사치다.
+    """
+    series_ids = sorted(r.smembers(_SERIES_KEY))
+    selected = []
+    for series in series_ids:
+        s_stage, s_node, s_outcome = series.split("|", 2)
+        if (stage and s_stage != stage) or (node and s_node != node) or (outcome and s_outcome != outcome):
+            continue
+        selected.append((series, s_stage, s_node, s_outcome))
+
+    pipe = r.pipeline()
+    for series, *_ in selected:
+        pipe.hgetall(_hist_key(series))
+    raw_hists = pipe.execute() if selected else []
+
+    out = []
+    for (series, s_stage, s_node, s_outcome), h in zip(selected, raw_hists):
+        count = int(h.get("count", 0))
+        total = float(h.get("sum", 0.0))
+        cumulative, running = [], 0
+        for le in (*LATENCY_BUCKETS_SEC, "+Inf"):
+            running += int(h.get(_bucket_field(le), 0))
+            cumulative.append((le, running))
+        out.append({
+            "stage": s_stage,
+            "node": s_node,
+            "outcome": s_outcome,
+            "count": count,
+            "sum_sec": round(total, 3),
+            "avg_sec": round(total / count, 3) if count else None,
+            "p50_sec": _round_opt(_estimate_quantile(0.5, cumulative, count)),
+            "p90_sec": _round_opt(_estimate_quantile(0.9, cumulative, count)),
+            "p99_sec": _round_opt(_estimate_quantile(0.99, cumulative, count)),
+            "buckets": [{"le": le, "count": cum} for le, cum in cumulative],
+        })
+    return {"since": r.get(_SINCE_KEY), "series": out}
@@ -1,48 +1,96 @@
-from main import app, _get_farm_node_info, _remove_krb5_from_farm, _farm_ssh
+from kubernetes import client
+
+from main import app, load_k8s, _get_farm_node_info, _remove_krb5_from_farm, _farm_ssh
+from pod_status import TERMINAL_STAGES, get_pod_creation_status
 from utils import get_db_connection
 
 
 def reconcile_krb5_cleanup_pending() -> None:
-    """krb5_cleanup_pending 테이블의 레코드를 순회하며 재정리를 시도한다."""
+    """krb5_cleanup_pending 테이블의 레코드를 순회하며 재정리를 시도한다. DB 연결 하나를 끝까지 재사용한다."""
     conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("SELECT username, node_name FROM krb5_cleanup_pending")
-        rows = cur.fetchall()
-    conn.close()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT username, node_name FROM krb5_cleanup_pending")
+            rows = cur.fetchall()
+        conn.commit()  # SELECT로 열린 transaction을 닫아 farm 정리 동안 snapshot을 붙잡지 않는다
+
+        for username, node_name in rows:
+            try:
+                _remove_krb5_from_farm(username, node_name)
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM krb5_cleanup_pending WHERE username=%s AND node_name=%s",
+                        (username, node_name),
+                    )
+                conn.commit()
+                app.logger.info(f"[KRB5 RECONCILE] pending 정리 성공: {username} ← {node_name}")
+            except Exception as e:
+                app.logger.warning(f"[KRB5 RECONCILE] pending 정리 재시도 실패(다음 주기에 재시도): {username} ← {node_name} — {e}")
+    finally:
+        conn.close()
+
+
+def _get_live_pod_usernames_by_node() -> dict:
+    """managed-by=ailab-infra Pod(standby 제외)의 username을 노드 이름(소문자)별로 모은다. k8s 조회 실패는 예외로 올린다."""
+    load_k8s()
+    pods = client.CoreV1Api().list_namespaced_pod(
+        namespace=app.config["NAMESPACE"], label_selector="managed-by=ailab-infra"
+    )
+    by_node = {}
+    for pod in pods.items:
+        username = (pod.metadata.labels or {}).get("username")
+        if not username or not pod.spec.node_name:
+            continue
+        by_node.setdefault(pod.spec.node_name.lower(), set()).add(username)
+    return by_node
 
-    for username, node_name in rows:
-        try:
-            _remove_krb5_from_farm(username, node_name)
-            conn = get_db_connection()
-            with conn.cursor() as cur:
-                cur.execute(
-                    "DELETE FROM krb5_cleanup_pending WHERE username=%s AND node_name=%s",
-                    (username, node_name),
-                )
-            conn.commit()
-            conn.close()
-            app.logger.info(f"[KRB5 RECONCILE] pending 정리 성공: {username} ← {node_name}")
-        except Exception as e:
-            app.logger.warning(f"[KRB5 RECONCILE] pending 정리 재시도 실패(다음 주기에 재시도): {username} ← {node_name} — {e}")
 
+def _get_expected_krb5_usernames_for_node(node_name: str, live_usernames: set) -> set:
+    """
+    지금 이 노드에 keytab이 있어야 하는 username 집합.
 
-def _get_expected_krb5_usernames_for_node(node_name: str) -> set:
-    """지금 이 노드에 떠 있어야 하는(=NodePort가 살아있는) username 집합."""
+    live Pod의 username이 기준이다. gateway 모드에서는 추가 포트가 없는 Pod에 nodeport_allocations 행이
+    없으므로 NodePort 행만으로는 판단할 수 없다. 여기에 Pod 생성 전(keytab 배포 직후)인 요청을 보호하려고
+    lease가 남은 NodePort 행, NODEPORT_LEASE_TTL_SEC 안에 만든 GPU 행의 username을 더한다.
+    """
+    expected = set(live_usernames)
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
             cur.execute(
-                "SELECT DISTINCT username FROM nodeport_allocations WHERE node_name=%s",
-                (node_name,),
+                "SELECT username FROM nodeport_allocations "
+                "WHERE node_name=%s AND lease_state='reserved' AND lease_expires_at > NOW() "
+                "UNION SELECT username FROM gpu_device_allocations "
+                "WHERE node_name=%s AND created_at > NOW() - INTERVAL %s SECOND",
+                (node_name, node_name, app.config["NODEPORT_LEASE_TTL_SEC"]),
             )
-            return {row[0] for row in cur.fetchall()}
+            expected |= {row[0] for row in cur.fetchall() if row[0]}
+        conn.commit()
     finally:
         conn.close()
+    return expected
+
+
+def _is_creation_in_flight(username: str) -> bool:
+    """pod_status에 아직 끝나지 않은 생성 요청이 있으면 True. gateway 모드에서 DB 행 없이 생성 중인 Pod를 보호한다."""
+    try:
+        status = get_pod_creation_status(username)
+    except Exception:
+        return True  # 판단할 수 없으면 지우지 않는다
+    return bool(status) and status.get("stage") not in TERMINAL_STAGES
 
 
 def reconcile_krb5_orphans() -> None:
     """각 farm 노드의 keytab 목록과 '지금 이 노드에 떠 있어야 하는 username' 목록을 대조해
-    delete_pod/delete_user 흐름을 아예 타지 않은 고아(수동 조작, 코드 버그 등)까지 잡아낸다."""
+    delete_pod/delete_user 흐름을 아예 타지 않은 고아(수동 조작, 코드 버그 등)까지 잡아낸다.
+    live Pod 목록을 못 가져오면 모든 keytab이 고아로 보이므로 이번 주기는 아무것도 지우지 않는다."""
+    gateway_mode = app.config["POD_ACCESS_MODE"] == "gateway"
+    try:
+        live_by_node = _get_live_pod_usernames_by_node()
+    except Exception as e:
+        app.logger.warning(f"[KRB5 RECONCILE] live Pod 조회 실패 — 고아 정리 건너뜀: {e}")
+        return
+
     for node in app.config["FARM_NODES"]:
         try:
             node_info = _get_farm_node_info(node["name"])
@@ -52,8 +100,17 @@ def reconcile_krb5_orphans() -> None:
             app.logger.warning(f"[KRB5 RECONCILE] {node['name']} keytab 목록 조회 실패: {e}")
             continue
 
-        expected_usernames = _get_expected_krb5_usernames_for_node(node["name"])
+        try:
+            expected_usernames = _get_expected_krb5_usernames_for_node(
+                node["name"], live_by_node.get(node["name"].lower(), set())
+            )
+        except Exception as e:
+            app.logger.warning(f"[KRB5 RECONCILE] {node['name']} 예상 username 조회 실패 — 건너뜀: {e}")
+            continue
         orphans = deployed_usernames - expected_usernames
+        if gateway_mode:
+            # gateway 모드는 NodePort lease 없이 생성 중인 Pod가 있으므로 진행 중인 요청을 한 번 더 거른다
+            orphans = {u for u in orphans if not _is_creation_in_flight(u)}
 
         for username in orphans:
             app.logger.warning(f"[KRB5 RECONCILE] 고아 keytab 발견: {username} @ {node['name']} — 정리")
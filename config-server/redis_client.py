@@ -0,0 +1,16 @@
+"""
+config-server 공용 Redis client.
+
+background lease, warm pool, pre-pull, 삭제 job, idle reaper, single-flight, Pod 생성 상태, 이미지 상태가
+모두 같은 Redis를 쓰므로 connection pool을 하나만 만들어 나눠 쓴다. 모듈마다 client를 따로 만들면
+gunicorn worker마다 pool이 여러 개 생기고 접속 설정도 여러 곳에서 고쳐야 한다.
+"""
+import os
+
+import redis
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis-bg-master.ailab-infra.svc.cluster.local")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+
+r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
@@ -0,0 +1,291 @@
+"""
+GPU 노드 선택 (capacity filter + policy).
+
+노드는 nodeName으로 바로 지정하므로 kube-scheduler가 자원을 따져주지 않는다. 그래서 select_node()가
+live Pod에서 노드별 약속량(GPU, CPU/memory request)을 세고, DCGM score와 합쳐 노드를 고른다.
+
+1. capacity filter: 새 Pod의 GPU 수(WAS gpu_nodes의 num_gpu)와 CPU/memory request가 노드의 남은 양에 들어가는지.
+   - GPU 총량은 DCGM이 보고하는 GPU 개수, 약속량은 ailab Pod의 /dev/nvidiaN hostPath 개수이다.
+   - CPU/memory는 Node allocatable과 이 namespace ailab Pod의 request 합으로 본다.
+   - 이 요청과 profile이 같은 warm pool standby Pod는 노드마다 하나를 약속량에서 뺀다. 그 Pod를 claim하면
+     새 Pod가 그 자리를 그대로 쓰기 때문이다.
+   - 총량을 모르는 자원(DCGM에 없는 노드 등)은 거르지 않는다.
+2. policy: 남은 후보 중 하나를 고른다.
+   - score:  DCGM score가 가장 낮은 노드 (select_best_node_from_prometheus와 같은 규칙, 기본값)
+   - spread: 배치 후 남는 GPU가 가장 많은 노드
+   - pack:   배치 후 남는 GPU가 가장 적은 노드 (best fit, 큰 요청을 위해 빈 노드를 남긴다)
+   spread/pack의 동점은 score로, 그래도 같으면 후보 목록 순서로 정한다.
+
+build_node_states(), policy 함수, migration_target()은 입력만으로 결과가 정해지는 순수 함수이다 (simulator.py가 그대로 쓴다).
+"""
+import math
+from typing import Callable, Dict, Iterable, List, Optional
+
+from flask import current_app as app
+from kubernetes import client
+from kubernetes.utils import parse_quantity
+
+import node_scores
+import warm_pool
+from idle_reaper import pod_gpu_indices
+from utils import get_node_gpu_stats, load_k8s, query_gpu_counts
+
+_ACTIVE_PHASES = ("Pending", "Running", "Unknown")
+
+
+class NodeState:
+    """한 노드의 자원 총량/약속량과 DCGM score. 모르는 총량은 None."""
+
+    def __init__(
+        self,
+        name: str,
+        score: float = 0.0,
+        gpu_total: Optional[int] = None,
+        gpu_committed: int = 0,
+        cpu_allocatable: Optional[float] = None,
+        cpu_committed: float = 0.0,
+        mem_allocatable: Optional[float] = None,
+        mem_committed: float = 0.0,
+    ):
+        self.name = name
+        self.score = score
+        self.gpu_total = gpu_total
+        self.gpu_committed = gpu_committed
+        self.cpu_allocatable = cpu_allocatable
+        self.cpu_committed = cpu_committed
+        self.mem_allocatable = mem_allocatable
+        self.mem_committed = mem_committed
+
+    def gpu_free(self) -> Optional[int]:
+        if self.gpu_total is None:
+            return None
+        return self.gpu_total - self.gpu_committed
+
+    def to_dict(self) -> dict:
+        return {
+            "score": self.score if math.isfinite(self.score) else None,
+            "gpu_total": self.gpu_total,
+            "gpu_committed": self.gpu_committed,
+            "cpu_allocatable": self.cpu_allocatable,
+            "cpu_committed": self.cpu_committed,
+            "mem_allocatable": self.mem_allocatable,
+            "mem_committed": self.mem_committed,
+        }
+
+
+def _is_reusable_standby(pod, node: str, reusable_profiles: Dict[str, str]) -> bool:
+    labels = pod.metadata.labels or {}
+    return (
+        labels.get(warm_pool.STATE_LABEL) == warm_pool.STATE_STANDBY
+        and pod.status.phase == "Running"
+        and reusable_profiles.get(node) is not None
+        and labels.get(warm_pool.PROFILE_LABEL) == reusable_profiles[node]
+    )
+
+
+def pod_commitments(pods: Iterable, reusable_profiles: Optional[Dict[str, str]] = None) -> Dict[str, dict]:
+    """
+    {node: {"gpu", "cpu", "memory"}} — 종료되지 않은 Pod의 GPU device 수와 container request 합.
+
+    reusable_profiles({node: warm pool profile key})를 주면 노드마다 그 profile의 Running standby Pod
+    하나는 세지 않는다. 새 요청이 그 Pod를 claim해 자원을 그대로 쓰기 때문이다.
+    """
+    reusable_profiles = reusable_profiles or {}
+    committed: Dict[str, dict] = {}
+    reused = set()
+    for pod in pods:
+        node = pod.spec.node_name
+        if not node or pod.status.phase not in _ACTIVE_PHASES:
+            continue
+        node = node.lower()
+        if node not in reused and _is_reusable_standby(pod, node, reusable_profiles):
+            reused.add(node)
+            continue
+        entry = committed.setdefault(node, {"gpu": 0, "cpu": 0.0, "memory": 0.0})
+        entry["gpu"] += len(pod_gpu_indices(pod))
+        for container in pod.spec.containers or []:
+            requests = (container.resources.requests if container.resources else None) or {}
+            entry["cpu"] += float(parse_quantity(requests.get("cpu", "0")))
+            entry["memory"] += float(parse_quantity(requests.get("memory", "0")))
+    return committed
+
+
+def build_node_states(
+    node_list: List[str],
+    scores: Dict[str, float],
+    gpu_counts: Dict[str, Optional[int]],
+    allocatable: Dict[str, dict],
+    committed: Dict[str, dict],
+) -> Dict[str, NodeState]:
+    """
+    후보 노드별 NodeState.
+
+    Args:
+        scores: {node: DCGM score}
+        gpu_counts: {node: GPU 개수 또는 None}
+        allocatable: {node: {"cpu", "memory"}} (Node status.allocatable, 없으면 총량 모름)
+        committed: pod_commitments() 결과
+    """
+    states = {}
+    for node in node_list:
+        alloc = allocatable.get(node) or {}
+        used = committed.get(node) or {}
+        states[node] = NodeState(
+            node,
+            score=scores.get(node, float("inf")),
+            gpu_total=gpu_counts.get(node),
+            gpu_committed=used.get("gpu", 0),
+            cpu_allocatable=alloc.get("cpu"),
+            cpu_committed=used.get("cpu", 0.0),
+            mem_allocatable=alloc.get("memory"),
+            mem_committed=used.get("memory", 0.0),
+        )
+    return states
+
+
+def fits(state: NodeState, num_gpu: int, cpu: float, memory: float) -> bool:
+    """새 Pod가 노드의 남은 자원에 들어가는지. 총량을 모르는 자원은 통과시킨다."""
+    if num_gpu and state.gpu_total is not None and state.gpu_committed + num_gpu > state.gpu_total:
+        return False
+    if state.cpu_allocatable is not None and state.cpu_committed + cpu > state.cpu_allocatable:
+        return False
+    if state.mem_allocatable is not None and state.mem_committed + memory > state.mem_allocatable:
+        return False
+    return True
+
+
+def _gpu_free_after(state: NodeState, num_gpu: int) -> float:
+    free = state.gpu_free()
+    return math.inf if free is None else free - num_gpu
+
+
+def policy_score(candidates: List[str], states: Dict[str, NodeState], gpu_requests: Dict[str, int]) -> Optional[str]:
+    best_node, best_score = None, math.inf
+    for node in candidates:
+        if states[node].score < best_score:
+            best_node, best_score = node, states[node].score
+    return best_node
+
+
+def policy_spread(candidates: List[str], states: Dict[str, NodeState], gpu_requests: Dict[str, int]) -> Optional[str]:
+    if not candidates:
+        return None
+    return min(
+        candidates,
+        key=lambda n: (-_gpu_free_after(states[n], gpu_requests.get(n, 0)), states[n].score, candidates.index(n)),
+    )
+
+
+def policy_pack(candidates: List[str], states: Dict[str, NodeState], gpu_requests: Dict[str, int]) -> Optional[str]:
+    if not candidates:
+        return None
+    return min(
+        candidates,
+        key=lambda n: (_gpu_free_after(states[n], gpu_requests.get(n, 0)), states[n].score, candidates.index(n)),
+    )
+
+
+POLICIES: Dict[str, Callable] = {
+    "score": policy_score,
+    "spread": policy_spread,
+    "pack": policy_pack,
+}
+
+
+def choose(
+    node_list: List[str],
+    states: Dict[str, NodeState],
+    gpu_requests: Dict[str, int],
+    cpu: float,
+    memory: float,
+    policy: str,
+    capacity_filter: bool = True,
+) -> Optional[str]:
+    """capacity filter를 통과한 후보 중 policy로 노드 하나를 고른다. 없으면 None."""
+    if policy not in POLICIES:
+        raise ValueError(f"unknown scheduler policy: {policy!r}")
+    candidates = [
+        n for n in node_list
+        if not capacity_filter or fits(states[n], gpu_requests.get(n, 0), cpu, memory)
+    ]
+    return POLICIES[policy](candidates, states, gpu_requests)
+
+
+def migration_target(current_score: float, candidate_scores: Dict[str, float], min_ratio: float):
+    """
+    migrate 판단. (best_node, best_score, move) — 후보 중 score가 가장 낮은 노드와, 현재 노드보다
+    min_ratio 이상 낮아서 옮길 만한지 여부. 후보가 없으면 (None, inf, False).
+    """
+    if not candidate_scores:
+        return None, math.inf, False
+    best_node, best_score = min(candidate_scores.items(), key=lambda x: x[1])
+    return best_node, best_score, best_score <= current_score * (1 - min_ratio)
+
+
+def _live_capacity(node_list: List[str], namespace: str, reusable_profiles: Optional[Dict[str, str]] = None):
+    """(allocatable, committed) — Node allocatable과 namespace ailab Pod의 약속량."""
+    load_k8s()
+    v1 = client.CoreV1Api()
+    allocatable = {}
+    for node in v1.list_node().items:
+        name = node.metadata.name.lower()
+        if name in node_list:
+            alloc = node.status.allocatable or {}
+            allocatable[name] = {
+                "cpu": float(parse_quantity(alloc["cpu"])) if "cpu" in alloc else None,
+                "memory": float(parse_quantity(alloc["memory"])) if "memory" in alloc else None,
+            }
+    pods = v1.list_namespaced_pod(namespace=namespace, label_selector="managed-by=ailab-infra")
+    return allocatable, pod_commitments(pods.items, reusable_profiles)
+
+
+def select_node(
+    node_list: List[str],
+    gpu_requests: Dict[str, int],
+    reusable_profiles: Optional[Dict[str, str]] = None,
+) -> Optional[str]:
+    """
+    SCHEDULER_POLICY로 노드를 고른다. gpu_requests는 {node: 그 노드에서 요청한 GPU 수}.
+    reusable_profiles는 {node: 이 요청이 claim할 수 있는 warm pool profile key} (pod_commitments 참고).
+    k8s 조회가 실패하면 capacity filter 없이 score만으로 고른다.
+    """
+    cfg = app.config
+    policy = cfg["SCHEDULER_POLICY"]
+    prom_url, timeout = cfg["PROM_URL"], cfg["HTTP_TIMEOUT_SEC"]
+
+    # per_node 모드는 노드별 조회 한 번(NODE_SCORE_DEADLINE_SEC)에서 GPU 개수도 같이 받는다
+    scores, queried_counts = get_node_gpu_stats(node_list, prom_url, timeout)
+
+    capacity_filter = cfg["SCHEDULER_CAPACITY_FILTER"]
+    allocatable, committed, gpu_counts = {}, {}, {}
+    if capacity_filter:
+        try:
+            allocatable, committed = _live_capacity(node_list, cfg["NAMESPACE"], reusable_profiles)
+        except Exception:
+            app.logger.warning("[SCHEDULER] live capacity lookup failed, selecting by score only", exc_info=True)
+            capacity_filter = False
+    if queried_counts is not None:
+        gpu_counts = queried_counts
+    elif capacity_filter or policy != "score":
+        gpu_counts = node_scores.lookup_gpu_counts(node_list, cfg["NODE_SCORE_MAX_AGE_SEC"])
+        if gpu_counts is None:
+            try:
+                counts = query_gpu_counts(node_list, prom_url, timeout)
+                gpu_counts = {n: counts.get(n) for n in node_list}
+            except Exception as e:
+                app.logger.warning(f"[SCHEDULER] GPU count query failed, GPU capacity unknown: {e}")
+                gpu_counts = {}
+
+    states = build_node_states(node_list, scores, gpu_counts, allocatable, committed)
+    best = choose(
+        node_list, states, gpu_requests,
+        cpu=float(parse_quantity(cfg["DEFAULT_CPU_REQUEST"])),
+        memory=float(parse_quantity(cfg["DEFAULT_MEM_REQUEST"])),
+        policy=policy,
+        capacity_filter=capacity_filter,
+    )
+    app.logger.info(
+        f"[SCHEDULER] policy={policy} capacity_filter={capacity_filter} selected={best} "
+        f"states={ {n: s.to_dict() for n, s in states.items()} }"
+    )
+    return best
@@ -0,0 +1,138 @@
+"""
+클러스터 전체 Service가 점유한 NodePort 집합 (watch로 유지).
+
+allocate_nodeports()의 bitmap refresh는 config-server가 DB에 기록하지 않은 NodePort(고정 NodePort로 배포된
+서비스, 수동 생성 Service 등)도 사용 중으로 봐야 한다. 매번 list_service_for_all_namespaces()로 모든
+Service를 받아오는 대신, 각 worker의 watch thread(run_watch)가 Service 이벤트로 집합을 갱신한다.
+
+- watch가 끊기면 다음 run_watch() 호출이 이어서 watch하거나(410이면) 다시 list한다.
+- 마지막으로 watch가 살아 있음을 확인한 시각(heartbeat)을 기록한다. 이벤트가 없어도 watch는
+  WATCH_TIMEOUT_SEC마다 정상 종료 후 다시 시작되므로, 그보다 오래 heartbeat가 없으면 stale로 본다.
+- stale이거나 동기화 전이면 reserved_ports()는 None을 돌려주고, 호출하는 쪽이 직접 list한다.
+"""
+import threading
+import time
+from typing import Dict, FrozenSet, Optional
+
+from flask import current_app as app
+from kubernetes import client, watch
+
+from utils import load_k8s
+
+WATCH_TIMEOUT_SEC = 300
+STALE_AFTER_SEC = WATCH_TIMEOUT_SEC + 60
+
+_lock = threading.Lock()
+_by_service: Dict[str, FrozenSet[int]] = {}  # {"<namespace>/<name>": NodePort 집합}
+_reserved: FrozenSet[int] = frozenset()
+_state = {"synced": False, "resource_version": None, "synced_at": None, "heartbeat": None}
+
+
+def _service_key(svc) -> str:
+    return f"{svc.metadata.namespace}/{svc.metadata.name}"
+
+
+def _node_ports(svc) -> FrozenSet[int]:
+    return frozenset(p.node_port for p in (svc.spec.ports or []) if p.node_port)
+
+
+def _rebuild() -> None:
+    # reserved_ports()는 lock 없이 읽으므로 새 frozenset으로 바꿔 끼운다.
+    global _reserved
+    _reserved = frozenset().union(*_by_service.values()) if _by_service else frozenset()
+
+
+def _apply(event_type: str, svc) -> None:
+    key = _service_key(svc)
+    with _lock:
+        before = _by_service.get(key)
+        ports = _node_ports(svc)
+        if event_type == "DELETED" or not ports:
+            _by_service.pop(key, None)
+        else:
+            _by_service[key] = ports
+        if _by_service.get(key) != before:
+            _rebuild()
+        _state["heartbeat"] = time.time()
+
+
+def _relist(v1) -> str:
+    services = v1.list_service_for_all_namespaces()
+    with _lock:
+        _by_service.clear()
+        for svc in services.items:
+            ports = _node_ports(svc)
+            if ports:
+                _by_service[_service_key(svc)] = ports
+        _rebuild()
+        now = time.time()
+        _state.update(synced=True, synced_at=now, heartbeat=now)
+    app.logger.info(f"[SVC PORTS] listed {len(services.items)} services, reserved nodeports={len(_reserved)}")
+    return services.metadata.resource_version
+
+
+def run_watch() -> None:
+    """
+    집합을 list로 채우고 WATCH_TIMEOUT_SEC 동안 Service watch 이벤트를 반영한다.
+    start_worker_thread()가 반복 호출한다.
+    """
+    load_k8s()
+    v1 = client.CoreV1Api()
+
+    if _state["resource_version"] is None or not _state["synced"]:
+        _state["resource_version"] = _relist(v1)
+
+    w = watch.Watch()
+    try:
+        for event in w.stream(
+            v1.list_service_for_all_namespaces,
+            resource_version=_state["resource_version"],
+            timeout_seconds=WATCH_TIMEOUT_SEC,
+            _request_timeout=WATCH_TIMEOUT_SEC + 30,  # 응답 없이 끊긴 연결에서 무한 대기 방지
+        ):
+            svc = event["object"]
+            _apply(event["type"], svc)
+            _state["resource_version"] = svc.metadata.resource_version
+        _state["heartbeat"] = time.time()  # 이벤트 없이 timeout으로 끝난 것도 watch가 살아 있었다는 뜻
+    except client.exceptions.ApiException as e:
+        if e.status != 410:
+            _state["synced"] = False
+            raise
+        app.logger.info("[SVC PORTS] watch expired (410), relisting")
+        _state["resource_version"] = None
+    except Exception:
+        _state["synced"] = False
+        raise
+    finally:
+        w.stop()
+
+
+def staleness_sec() -> Optional[float]:
+    """마지막 heartbeat 이후 지난 시간. 동기화된 적이 없으면 None."""
+    heartbeat = _state["heartbeat"]
+    if heartbeat is None:
+        return None
+    return time.time() - heartbeat
+
+
+def is_healthy() -> bool:
+    age = staleness_sec()
+    return _state["synced"] and age is not None and age <= STALE_AFTER_SEC
+
+
+def reserved_ports() -> Optional[FrozenSet[int]]:
+    """watch로 유지되는 클러스터 NodePort 집합. watch가 건강하지 않으면 None."""
+    if not is_healthy():
+        return None
+    return _reserved
+
+
+def get_state() -> dict:
+    age = staleness_sec()
+    return {
+        "synced": _state["synced"],
+        "healthy": is_healthy(),
+        "staleness_sec": None if age is None else round(age, 1),
+        "services_with_nodeports": len(_by_service),
+        "reserved_nodeports": len(_reserved),
+    }
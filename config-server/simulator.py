@@ -0,0 +1,317 @@
+"""
+노드 선택 policy / migrate 기준 offline simulator.
+
+select_node()의 policy나 /migrate의 min_improvement_ratio를 바꿔 보려면 실제 학생 Pod로 시험하는 수밖에 없었다.
+이 모듈은 기록해 둔 create/delete/migrate trace를 합성 DCGM metric 위에서 다시 재생해 policy별 결과를 비교한다.
+Prometheus, k8s, MySQL 없이 돈다.
+
+- 시간은 STEP_SEC(DCGM scrape 주기) 단위로 흐른다. 각 step마다 그 시각까지의 trace 이벤트를 처리하고,
+  대기 중인 create를 도착 순으로 배치해 본 뒤 GPU별 metric을 한 번 기록한다.
+- GPU util은 Pod마다 학습 step 주기(period_sec)와 busy 비율(duty)로 만드는 on/off 파형이다. step 사이에는
+  IDLE_UTIL 근처로 떨어지므로 순간값으로 고르면 바쁜 노드가 비어 보이는 상황이 재현된다.
+- 노드 score는 utils._gpu_score_query()와 같은 식(GPU 평균 util + FB_USED/1024 + TEMP/100)을 window 동안 평균한 값이다.
+- 노드 선택은 scheduler.build_node_states()/choose()를, migrate 판단은 scheduler.migration_target()을 그대로 쓴다.
+  GPU index는 allocate_gpu_devices()처럼 빈 GPU 중 load가 낮은 것부터 잡는다.
+
+trace (JSON lines, t는 초):
+    {"t": 0,    "op": "create",  "user": "alice", "gpus": 1, "nodes": ["n1", "n2"], "util": 90, "duty": 0.7}
+    {"t": 1800, "op": "migrate", "user": "alice", "nodes": ["n1", "n2"], "min_improvement_ratio": 0.2}
+    {"t": 3600, "op": "delete",  "user": "alice"}
+cluster (JSON):
+    {"nodes": {"n1": {"gpus": 4, "background_util": 0}, "n2": {"gpus": 8}}}
+
+사용 예:
+    python simulator.py trace.jsonl cluster.json --policy score --policy pack --window-sec 300
+"""
+import argparse
+import importlib
+import json
+import math
+import random
+import statistics
+import sys
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import scheduler
+
+STEP_SEC = 15
+IDLE_UTIL = 3.0
+DEFAULT_FB_GIB = 8.0
+DEFAULT_PERIOD_SEC = 60
+
+
+class SimPod:
+    """재생 중인 사용자 Pod 하나."""
+
+    def __init__(self, user: str, gpus: int, nodes: List[str], arrived: float, event: dict):
+        self.user = user
+        self.gpus = gpus
+        self.nodes = nodes
+        self.arrived = arrived
+        self.util = float(event.get("util", 90))
+        self.duty = float(event.get("duty", 1.0))
+        self.period = float(event.get("period_sec", DEFAULT_PERIOD_SEC))
+        self.fb_gib = float(event.get("fb_gib", DEFAULT_FB_GIB))
+        self.node: Optional[str] = None
+        self.gpu_indices: List[int] = []
+        self.started: Optional[float] = None
+
+    def gpu_util(self, t: float) -> float:
+        phase = ((t - self.started) % self.period) / self.period
+        return self.util if phase < self.duty else IDLE_UTIL
+
+
+class Cluster:
+    """노드별 GPU 점유와 합성 DCGM metric 기록."""
+
+    def __init__(self, spec: dict, window_sec: float, seed: int):
+        self.gpus = {name: int(n["gpus"]) for name, n in spec["nodes"].items()}
+        self.background = {name: float(n.get("background_util", 0)) for name, n in spec["nodes"].items()}
+        self.owner: Dict[str, Dict[int, SimPod]] = {name: {} for name in self.gpus}
+        self.window_steps = max(1, int(window_sec // STEP_SEC))
+        self.history: Dict[str, deque] = {name: deque(maxlen=self.window_steps) for name in self.gpus}
+        self.rng = random.Random(seed)
+
+    def free(self, node: str) -> int:
+        return self.gpus[node] - len(self.owner[node])
+
+    def sample(self, t: float) -> Dict[str, List[float]]:
+        """시각 t의 GPU별 util을 만들어 기록하고 {node: [util, ...]}를 반환한다."""
+        utils = {}
+        for node, count in self.gpus.items():
+            row = []
+            for idx in range(count):
+                pod = self.owner[node].get(idx)
+                base = pod.gpu_util(t) if pod else self.background[node]
+                row.append(min(100.0, max(0.0, base + self.rng.gauss(0, 2))))
+            fb = [self.owner[node][i].fb_gib * 1024 if i in self.owner[node] else 0.0 for i in range(count)]
+            self.history[node].append((row, fb))
+            utils[node] = row
+        return utils
+
+    def gpu_loads(self, node: str) -> List[float]:
+        """window 동안의 GPU별 평균 load (allocate_gpu_devices의 load와 같은 식)."""
+        count = self.gpus[node]
+        samples = self.history[node]
+        if not samples or not count:
+            return [0.0] * count
+        loads = [0.0] * count
+        for row, fb in samples:
+            for i in range(count):
+                loads[i] += row[i] + fb[i] / 1024 + (35 + 0.45 * row[i]) / 100
+        return [load / len(samples) for load in loads]
+
+    def score(self, node: str) -> float:
+        """window 동안의 노드 score 평균 (GPU 평균 util + FB/1024 + TEMP/100)."""
+        loads = self.gpu_loads(node)
+        return sum(loads) / len(loads) if loads else 0.0
+
+    def place(self, pod: SimPod, node: str, t: float) -> None:
+        loads = self.gpu_loads(node)
+        free = sorted((i for i in range(self.gpus[node]) if i not in self.owner[node]), key=lambda i: (loads[i], i))
+        pod.node, pod.gpu_indices = node, sorted(free[:pod.gpus])
+        for idx in pod.gpu_indices:
+            self.owner[node][idx] = pod
+        if pod.started is None:
+            pod.started = t
+
+    def remove(self, pod: SimPod) -> None:
+        for idx in pod.gpu_indices:
+            self.owner[pod.node].pop(idx, None)
+        pod.node, pod.gpu_indices = None, []
+
+
+def load_policy(name: str) -> Callable:
+    """scheduler.POLICIES의 이름이나 `module:function` 형태의 사용자 policy."""
+    if name in scheduler.POLICIES:
+        return scheduler.POLICIES[name]
+    if ":" not in name:
+        raise ValueError(f"unknown policy: {name!r}")
+    module, func = name.split(":", 1)
+    return getattr(importlib.import_module(module), func)
+
+
+def _node_states(cluster: Cluster, nodes: List[str]) -> Dict[str, scheduler.NodeState]:
+    committed = {n: {"gpu": cluster.gpus[n] - cluster.free(n), "cpu": 0.0, "memory": 0.0} for n in nodes}
+    return scheduler.build_node_states(
+        nodes,
+        scores={n: cluster.score(n) for n in nodes},
+        gpu_counts={n: cluster.gpus[n] for n in nodes},
+        allocatable={},
+        committed=committed,
+    )
+
+
+def _select(cluster: Cluster, pod: SimPod, policy: Callable) -> Optional[str]:
+    nodes = [n for n in pod.nodes if n in cluster.gpus]
+    states = _node_states(cluster, nodes)
+    candidates = [n for n in nodes if scheduler.fits(states[n], pod.gpus, 0.0, 0.0)]
+    return policy(candidates, states, {n: pod.gpus for n in nodes})
+
+
+def _fragmentation(cluster: Cluster) -> Optional[float]:
+    """1 - (한 노드의 최대 빈 GPU / 전체 빈 GPU). 빈 GPU가 없으면 None."""
+    free = [cluster.free(n) for n in cluster.gpus]
+    total = sum(free)
+    if not total:
+        return None
+    return 1 - max(free) / total
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+
+
+def simulate(
+    events: List[dict],
+    cluster_spec: dict,
+    policy: str = "score",
+    window_sec: float = 300,
+    min_improvement_ratio: float = 0.2,
+    seed: int = 0,
+) -> dict:
+    """trace를 한 policy로 재생하고 결과 지표를 반환한다."""
+    policy_fn = load_policy(policy)
+    cluster = Cluster(cluster_spec, window_sec, seed)
+    events = sorted(events, key=lambda e: e["t"])
+    end = events[-1]["t"] if events else 0
+
+    queue: List[SimPod] = []
+    running: Dict[str, SimPod] = {}
+    waits: List[float] = []
+    counts = {"created": 0, "abandoned": 0, "rejected": 0}
+    migrations = {
+        "requested": 0, "performed": 0, "no_improvement": 0, "no_capacity": 0, "no_candidate": 0, "not_running": 0,
+    }
+    steps = allocated = util_sum = gpu_total = blocked_steps = 0
+    frag_samples: List[float] = []
+
+    pos = 0
+    t = 0.0
+    while pos < len(events) or (queue and t <= end + 86400):
+        while pos < len(events) and events[pos]["t"] <= t:
+            ev = events[pos]
+            pos += 1
+            user = ev["user"]
+            if ev["op"] == "create":
+                if user in running or any(p.user == user for p in queue):
+                    counts["rejected"] += 1
+                    continue
+                nodes = ev.get("nodes") or list(cluster.gpus)
+                queue.append(SimPod(user, int(ev.get("gpus", 1)), nodes, t, ev))
+            elif ev["op"] == "delete":
+                if user in running:
+                    cluster.remove(running.pop(user))
+                else:
+                    before = len(queue)
+                    queue = [p for p in queue if p.user != user]
+                    counts["abandoned"] += before - len(queue)
+            elif ev["op"] == "migrate":
+                migrations["requested"] += 1
+                pod = running.get(user)
+                if pod is None:
+                    migrations["not_running"] += 1
+                    continue
+                nodes = ev.get("nodes") or pod.nodes
+                candidates = {n: cluster.score(n) for n in nodes if n != pod.node and n in cluster.gpus}
+                if not candidates:
+                    migrations["no_candidate"] += 1
+                    continue
+                ratio = ev.get("min_improvement_ratio", min_improvement_ratio)
+                best, _, move = scheduler.migration_target(cluster.score(pod.node), candidates, ratio)
+                if not move:
+                    migrations["no_improvement"] += 1
+                elif cluster.free(best) < pod.gpus:
+                    # 실제 /migrate는 target 용량을 보지 않으므로 build_pod_spec의 GPU 할당에서 실패한다.
+                    migrations["no_capacity"] += 1
+                else:
+                    cluster.remove(pod)
+                    cluster.place(pod, best, t)
+                    migrations["performed"] += 1
+
+        # 도착 순으로 배치. 앞의 요청이 안 들어가도 뒤의 작은 요청은 먼저 배치될 수 있다.
+        waiting = []
+        for pod in queue:
+            node = _select(cluster, pod, policy_fn)
+            if node is None:
+                waiting.append(pod)
+                continue
+            cluster.place(pod, node, t)
+            running[pod.user] = pod
+            waits.append(t - pod.arrived)
+            counts["created"] += 1
+        queue = waiting
+        if any(pod.gpus <= sum(cluster.free(n) for n in pod.nodes if n in cluster.gpus) for pod in queue):
+            # 빈 GPU 합은 충분한데 한 노드에 모이지 않아 못 들어가는 요청이 있다.
+            blocked_steps += 1
+
+        utils = cluster.sample(t)
+        steps += 1
+        for node, row in utils.items():
+            util_sum += sum(row)
+            gpu_total += len(row)
+            allocated += len(cluster.owner[node])
+        frag = _fragmentation(cluster)
+        if frag is not None:
+            frag_samples.append(frag)
+        t += STEP_SEC
+
+    total_gpus = sum(cluster.gpus.values())
+    return {
+        "policy": policy,
+        "window_sec": window_sec,
+        "min_improvement_ratio": min_improvement_ratio,
+        "simulated_sec": steps * STEP_SEC,
+        "pods": {**counts, "still_queued": len(queue)},
+        "queue_wait_sec": {
+            "mean": round(statistics.mean(waits), 1) if waits else None,
+            "p50": _percentile(waits, 0.5),
+            "p90": _percentile(waits, 0.9),
+            "max": max(waits) if waits else None,
+        },
+        "gpu": {
+            "allocated_ratio": round(allocated / (steps * total_gpus), 4) if steps and total_gpus else None,
+            "mean_util": round(util_sum / gpu_total, 2) if gpu_total else None,
+        },
+        "fragmentation": {
+            "mean": round(statistics.mean(frag_samples), 4) if frag_samples else None,
+            "blocked_steps": blocked_steps,
+        },
+        "migrations": migrations,
+    }
+
+
+def load_trace(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="replay create/delete/migrate traces against synthetic GPU metrics")
+    parser.add_argument("trace", help="JSON lines trace")
+    parser.add_argument("cluster", help="cluster JSON ({\"nodes\": {name: {\"gpus\": N}}})")
+    parser.add_argument("--policy", action="append", help="scheduler policy 이름 또는 module:function (여러 번 지정 가능)")
+    parser.add_argument("--window-sec", type=float, default=300, help="score 평균 구간 (NODE_SCORE_WINDOW에 해당)")
+    parser.add_argument("--min-improvement-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    events = load_trace(args.trace)
+    with open(args.cluster) as f:
+        cluster_spec = json.load(f)
+
+    reports = [
+        simulate(events, cluster_spec, policy, args.window_sec, args.min_improvement_ratio, args.seed)
+        for policy in args.policy or ["score"]
+    ]
+    json.dump(reports, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+요청 단위 single-flight (여러 gunicorn worker/Pod 사이에서 같은 key의 작업을 한 번만 실행).
+
+- leader: Redis lock(single_flight:lock:<key> = flight_id)을 잡은 요청. 작업 중에는 heartbeat thread가
+  lock TTL을 연장하므로, leader worker가 죽으면 TTL 안에 lock이 풀린다.
+- follower: lock이 이미 있으면 leader의 결과(single_flight:result:<flight_id>)가 올라올 때까지 기다렸다가
+  같은 결과를 돌려준다. 결과 없이 lock이 사라지면(leader 비정상 종료) 스스로 leader가 되기를 다시 시도한다.
+- Redis 장애 시에는 coalescing 없이 각 요청이 leader로 진행한다 (Pod 생성 자체를 막지 않음).
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+
+import redis
+
+from redis_client import r
+
+LOCK_TTL_SEC = 60
+RESULT_TTL_SEC = 120  # leader 종료 직후 도착한 follower가 결과를 읽을 수 있는 시간
+
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lock_key(key: str) -> str:
+    return f"single_flight:lock:{key}"
+
+
+def _result_key(flight_id: str) -> str:
+    return f"single_flight:result:{flight_id}"
+
+
+class Flight:
+    """leader가 잡은 flight. 작업이 끝나면 publish() 후 release()한다."""
+
+    def __init__(self, key: str, flight_id: str, locked: bool):
+        self.key = key
+        self.flight_id = flight_id
+        self.locked = locked
+        self._stop = threading.Event()
+        if locked:
+            threading.Thread(target=self._heartbeat, name=f"single-flight-{key}", daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(LOCK_TTL_SEC / 3):
+            try:
+                if not r.eval(_RENEW_LUA, 1, _lock_key(self.key), self.flight_id, LOCK_TTL_SEC):
+                    return
+            except Exception:
+                pass
+
+    def publish(self, result: dict) -> None:
+        if not self.locked:
+            return
+        try:
+            r.set(_result_key(self.flight_id), json.dumps(result), ex=RESULT_TTL_SEC)
+        except Exception:
+            pass
+
+    def release(self) -> None:
+        self._stop.set()
+        if not self.locked:
+            return
+        try:
+            r.eval(_RELEASE_LUA, 1, _lock_key(self.key), self.flight_id)
+        except Exception:
+            pass
+
+
+def lead_or_join(key: str, wait_sec: float, poll_sec: float = 0.5) -> Tuple[Optional[Flight], Optional[dict]]:
+    """
+    key에 대한 leader가 되거나, 진행 중인 leader의 결과를 기다린다.
+
+    Returns:
+        (Flight, None)  : 이 요청이 leader — 작업 후 publish()/release() 필요
+        (None, result)  : 진행 중이던 flight의 결과
+        (None, None)    : wait_sec 안에 결과가 오지 않음
+    """
+    deadline = time.monotonic() + wait_sec
+    flight_id = uuid.uuid4().hex
+    try:
+        while True:
+            if r.set(_lock_key(key), flight_id, nx=True, ex=LOCK_TTL_SEC):
+                return Flight(key, flight_id, locked=True), None
+            leader_id = r.get(_lock_key(key))
+            if leader_id is None:
+                continue  # 그 사이 leader가 끝남 — 다시 lock 시도
+
+            result = _wait_result(key, leader_id, deadline, poll_sec)
+            if result is not None:
+                return None, result
+            if time.monotonic() >= deadline:
+                return None, None
+    except redis.RedisError:
+        return Flight(key, flight_id, locked=False), None
+
+
+def _wait_result(key: str, leader_id: str, deadline: float, poll_sec: float) -> Optional[dict]:
+    """leader_id의 결과를 기다린다. 결과 없이 leader lock이 사라지거나 deadline이 지나면 None."""
+    while True:
+        raw = r.get(_result_key(leader_id))
+        if raw is not None:
+            return json.loads(raw)
+        if r.get(_lock_key(key)) != leader_id:
+            # publish() 후 release() 사이에 lock이 바뀌었을 수 있어 결과를 한 번 더 본다.
+            raw = r.get(_result_key(leader_id))
+            return json.loads(raw) if raw is not None else None
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll_sec)
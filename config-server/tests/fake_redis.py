@@ -0,0 +1,121 @@
+"""
+테스트용 in-memory Redis. redis_client.r 대신 모듈의 r에 넣어 쓴다 (decode_responses=True처럼 str을 돌려준다).
+delete_jobs와 single_flight가 쓰는 명령만 구현한다. TTL은 기록만 하고 만료는 expire_now()로 흉내 낸다.
+"""
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttl = {}
+
+    def expire_now(self, key):
+        self.data.pop(key, None)
+        self.ttl.pop(key, None)
+
+    # string
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        if ex is not None:
+            self.ttl[key] = ex
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for k in keys if self.data.pop(k, None) is not None)
+
+    def expire(self, key, seconds):
+        if key not in self.data:
+            return 0
+        self.ttl[key] = int(seconds)
+        return 1
+
+    # list (index 0 = LEFT)
+    def _list(self, key):
+        return self.data.setdefault(key, [])
+
+    def lpush(self, key, *values):
+        lst = self._list(key)
+        for v in values:
+            lst.insert(0, str(v))
+        return len(lst)
+
+    def lrange(self, key, start, end):
+        lst = self.data.get(key, [])
+        return list(lst[start:] if end == -1 else lst[start:end + 1])
+
+    def lrem(self, key, count, value):
+        """count=0이면 모두, 양수면 앞에서부터 count개 지운다 (음수는 쓰지 않는다)."""
+        lst = self.data.get(key, [])
+        removed = 0
+        kept = []
+        for v in lst:
+            if v == value and (count == 0 or removed < count):
+                removed += 1
+                continue
+            kept.append(v)
+        if key in self.data:
+            self.data[key] = kept
+        return removed
+
+    def blmove(self, src, dst, timeout, src_side, dst_side):
+        lst = self.data.get(src, [])
+        if not lst:
+            return None
+        value = lst.pop() if src_side == "RIGHT" else lst.pop(0)
+        target = self._list(dst)
+        target.insert(0, value) if dst_side == "LEFT" else target.append(value)
+        return value
+
+    # hash
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        return len(mapping)
+
+    # sorted set
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zrangebyscore(self, key, low, high):
+        low = float(low)
+        high = float(high)
+        items = sorted(self.data.get(key, {}).items(), key=lambda kv: kv[1])
+        return [m for m, score in items if low <= score <= high]
+
+    def zrem(self, key, member):
+        return 1 if self.data.get(key, {}).pop(member, None) is not None else 0
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def eval(self, script, numkeys, key, owner, *args):
+        """single_flight의 compare-and-expire / compare-and-delete script."""
+        if self.data.get(key) != owner:
+            return 0
+        if "expire" in script:
+            return self.expire(key, args[0])
+        return self.delete(key)
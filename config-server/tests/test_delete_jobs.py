@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+import delete_jobs
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(delete_jobs, "r", fake)
+    return fake
+
+
+def _processing(fake):
+    return fake.lrange(delete_jobs.PROCESSING_KEY, 0, -1)
+
+
+def _queue(fake):
+    return fake.lrange(delete_jobs.QUEUE_KEY, 0, -1)
+
+
+def test_enqueue_returns_existing_job_while_pending(fake):
+    tracking_id, created = delete_jobs.enqueue("ailab-alice-1")
+    assert created
+    assert delete_jobs.is_pending("ailab-alice-1")
+    assert delete_jobs.enqueue("ailab-alice-1") == (tracking_id, False)
+    assert _queue(fake) == [tracking_id]
+
+    delete_jobs.update_job(tracking_id, stage="deleted")
+    new_id, created = delete_jobs.enqueue("ailab-alice-1")
+    assert created and new_id != tracking_id
+
+
+def test_claim_sets_lease_and_finish_clears_pod_key(fake):
+    tracking_id, _ = delete_jobs.enqueue("ailab-alice-1")
+    job = delete_jobs.claim_next(timeout_sec=0, lease_sec=60)
+    assert job["attempts"] == 1
+    assert job["lease_until"] > time.time()
+    assert _processing(fake) == [tracking_id]
+    assert delete_jobs.claim_next(timeout_sec=0, lease_sec=60) is None
+
+    delete_jobs.finish(tracking_id, "ailab-alice-1")
+    assert _processing(fake) == []
+    assert not delete_jobs.is_pending("ailab-alice-1")
+
+
+def test_claim_drops_job_whose_state_expired(fake):
+    tracking_id, _ = delete_jobs.enqueue("ailab-alice-1")
+    fake.expire_now(f"delete_job:{tracking_id}")
+    assert delete_jobs.claim_next(timeout_sec=0, lease_sec=60) is None
+    assert _processing(fake) == []
+
+
+def test_requeue_expired_needs_two_passes_at_the_same_attempt(fake):
+    tracking_id, _ = delete_jobs.enqueue("ailab-alice-1")
+    delete_jobs.claim_next(timeout_sec=0, lease_sec=60)
+    delete_jobs.update_job(tracking_id, lease_until=time.time() - 1)
+
+    assert delete_jobs.requeue_expired() == 0
+    assert _processing(fake) == [tracking_id]
+    assert delete_jobs.requeue_expired() == 1
+    assert _processing(fake) == []
+    assert _queue(fake) == [tracking_id]
+    assert fake.hgetall(delete_jobs.EXPIRING_KEY) == {}
+
+
+def test_requeue_expired_skips_job_claimed_between_passes(fake):
+    # BLMOVE 직후 lease를 쓰기 전의 job은 이전 시도의 (만료된) lease로 보인다.
+    tracking_id, _ = delete_jobs.enqueue("ailab-alice-1")
+    fake.blmove(delete_jobs.QUEUE_KEY, delete_jobs.PROCESSING_KEY, 0, "RIGHT", "LEFT")
+    assert delete_jobs.requeue_expired() == 0
+
+    # 두 번째 pass 전에 claim_next가 lease를 쓰면 attempts가 늘어 되돌리지 않는다.
+    delete_jobs.update_job(tracking_id, attempts=1, lease_until=time.time() + 60)
+    assert delete_jobs.requeue_expired() == 0
+    assert _processing(fake) == [tracking_id]
+    assert fake.hgetall(delete_jobs.EXPIRING_KEY) == {}
+
+
+def test_requeue_expired_drops_processing_entry_without_job_state(fake):
+    fake.lpush(delete_jobs.PROCESSING_KEY, "gone")
+    assert delete_jobs.requeue_expired() == 0
+    assert delete_jobs.requeue_expired() == 0
+    assert _processing(fake) == []
+    assert _queue(fake) == []
+
+
+def test_schedule_retry_and_promote_due(fake):
+    tracking_id, _ = delete_jobs.enqueue("ailab-alice-1")
+    delete_jobs.claim_next(timeout_sec=0, lease_sec=60)
+    delete_jobs.schedule_retry(tracking_id, delay_sec=-1)
+    assert _processing(fake) == []
+    assert delete_jobs.promote_due() == 1
+    assert _queue(fake) == [tracking_id]
+    assert delete_jobs.promote_due() == 0
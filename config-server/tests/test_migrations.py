@@ -0,0 +1,129 @@
+import re
+
+import pymysql
+import pytest
+
+import migrations
+
+
+class _FakeSchema:
+    """run_migrations가 보는 만큼만 흉내 낸 MySQL. CREATE TABLE은 실행만 기록한다."""
+
+    def __init__(self, applied=(), duplicate_keys=(), lock_ok=True):
+        self.applied = {v: "" for v in applied}
+        self.indexes = set()
+        self.columns = set()
+        self.duplicate_keys = set(duplicate_keys)  # ADD하면 중복 행으로 실패할 index 이름
+        self.lock_ok = lock_ok
+        self.alters = []
+        self.lock_released = False
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, schema):
+        self.schema = schema
+        self._one = None
+        self._all = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        s = self.schema
+        self._one, self._all = None, []
+        if "GET_LOCK" in query:
+            self._one = (1 if s.lock_ok else 0,)
+        elif "RELEASE_LOCK" in query:
+            s.lock_released = True
+        elif query.startswith("SELECT version FROM schema_migrations"):
+            self._all = [(v,) for v in s.applied]
+        elif query.startswith("INSERT INTO schema_migrations"):
+            s.applied[args[0]] = args[1]
+        elif "information_schema.STATISTICS" in query and args:
+            self._one = (1,) if (args[0], args[1]) in s.indexes else None
+        elif "information_schema.STATISTICS" in query:
+            # 0004: (username, node_name) UNIQUE key 존재 여부 — 0002의 PRIMARY KEY가 있는 것으로 본다
+            self._one = (1,) if ("krb5_cleanup_pending", "PRIMARY") in s.indexes else None
+        elif "information_schema.COLUMNS" in query:
+            self._one = (1,) if (args[0], args[1]) in s.columns else None
+        elif query.startswith("ALTER TABLE"):
+            table = query.split()[2]
+            s.alters.append(query)
+            column = re.search(r"ADD COLUMN (\w+)", query)
+            if column:
+                s.columns.add((table, column.group(1)))
+                return
+            index = re.search(r"ADD (?:UNIQUE )?KEY (\w+)", query).group(1)
+            if index in s.duplicate_keys:
+                raise pymysql.err.IntegrityError(migrations._MYSQL_DUP_ENTRY, "Duplicate entry '30001'")
+            s.indexes.add((table, index))
+        elif "CREATE TABLE" not in query:
+            raise AssertionError(f"unexpected query: {query}")
+
+    def fetchone(self):
+        return self._one
+
+    def fetchall(self):
+        return self._all
+
+
+@pytest.fixture
+def use_schema(monkeypatch):
+    def use(schema):
+        monkeypatch.setattr(migrations, "_connect", lambda: schema)
+        return schema
+    return use
+
+
+def test_applies_only_missing_versions_in_order(use_schema):
+    schema = use_schema(_FakeSchema(applied=(1, 2)))
+    all_versions = [v for v, _, _ in migrations.MIGRATIONS]
+    assert migrations.run_migrations() == all_versions[2:]
+    assert sorted(schema.applied) == all_versions
+    assert schema.lock_released
+    assert migrations.run_migrations() == []
+
+
+def test_duplicate_rows_skip_version_but_continue_later_migrations(use_schema):
+    schema = use_schema(_FakeSchema(duplicate_keys={"uq_nodeport_allocations_node_port"}))
+    applied = migrations.run_migrations()
+    assert 3 not in applied and 3 not in schema.applied
+    assert {4, 5, 6} <= set(applied)
+    # 0003의 다른 index는 추가됐다
+    assert ("nodeport_allocations", "idx_nodeport_allocations_pod_name") in schema.indexes
+
+    # 중복을 정리하고 다시 시작하면 0003만 다시 실행해 key를 붙이고 기록한다.
+    schema.duplicate_keys.clear()
+    alters_before = len(schema.alters)
+    assert migrations.run_migrations() == [3]
+    assert ("nodeport_allocations", "uq_nodeport_allocations_node_port") in schema.indexes
+    assert len(schema.alters) == alters_before + 1
+
+
+def test_other_integrity_errors_propagate():
+    class Cursor:
+        def execute(self, query, args=None):
+            if query.startswith("ALTER"):
+                raise pymysql.err.IntegrityError(1452, "foreign key")
+
+        def fetchone(self):
+            return None
+
+    with pytest.raises(pymysql.err.IntegrityError):
+        migrations._add_unique_index(Cursor(), "t", "uq_t", "UNIQUE KEY uq_t (a)")
+
+
+def test_lock_timeout_raises_without_applying(use_schema):
+    schema = use_schema(_FakeSchema(lock_ok=False))
+    with pytest.raises(RuntimeError, match="lock timeout"):
+        migrations.run_migrations()
+    assert schema.applied == {}
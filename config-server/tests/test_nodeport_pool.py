@@ -0,0 +1,126 @@
+import pymysql
+import pytest
+
+import main
+from nodeport_pool import NodePortBitmap
+
+
+def test_take_walks_free_ports_and_release_returns_them():
+    bitmap = NodePortBitmap(30000, 30002)
+    bitmap.reset([30001, 40000])
+    taken = {bitmap.take(), bitmap.take()}
+    assert taken == {30000, 30002}
+    assert bitmap.take() is None
+    bitmap.release(30002)
+    assert bitmap.free_count() == 1
+    assert bitmap.take() == 30002
+
+
+def test_reset_replaces_marks_and_records_load_time():
+    bitmap = NodePortBitmap(30000, 30001)
+    assert bitmap.is_stale(60)
+    bitmap.mark_used(30000)
+    bitmap.reset([30001])
+    assert not bitmap.is_stale(60)
+    assert bitmap.take() == 30000
+    assert bitmap.take() is None
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        if query.startswith("SELECT node_port FROM nodeport_allocations"):
+            self.db.refreshes += 1
+            self._rows = [(port,) for port in sorted(self.db.used)]
+        elif "INSERT INTO nodeport_allocations" in query:
+            node_port = args[4]
+            if node_port in self.db.used:
+                raise pymysql.err.IntegrityError(main._MYSQL_DUP_ENTRY, f"Duplicate entry '{node_port}'")
+            self.db.used.add(node_port)
+            self.db.inserted.append(node_port)
+        else:
+            raise AssertionError(f"unexpected query: {query}")
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeDB:
+    def __init__(self, used):
+        self.used = set(used)
+        self.inserted = []
+        self.refreshes = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        for port in self.inserted:
+            self.used.discard(port)
+        self.inserted = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def nodeports(monkeypatch):
+    """bitmap 범위 30000-30002, UNIQUE key 있음, 클러스터에 추가로 쓰는 포트 없음."""
+    bitmap = NodePortBitmap(30000, 30002)
+    monkeypatch.setattr(main, "_nodeport_bitmap", bitmap)
+    monkeypatch.setattr(main, "_nodeport_unique_key", True)
+    monkeypatch.setattr(main, "get_cluster_reserved_nodeports", lambda: set())
+    monkeypatch.setitem(main.app.config, "NODEPORT_BITMAP_REFRESH_SEC", 3600)
+
+    def use_db(used):
+        db = _FakeDB(used)
+        monkeypatch.setattr(main, "get_db_connection", lambda: db)
+        return db
+
+    return bitmap, use_db
+
+
+def _allocate(n=1):
+    return main.allocate_nodeports("alice", "ailab-alice-1", "gpu1", [{"internal_port": 22 + i} for i in range(n)])
+
+
+def test_exhausted_bitmap_refreshes_once_and_uses_released_ports(nodeports):
+    bitmap, use_db = nodeports
+    bitmap.reset([30000, 30001, 30002])  # 30001, 30002는 그 사이 다른 worker가 해제함
+    db = use_db({30000})
+    ports = _allocate(2)
+    assert sorted(p["external_port"] for p in ports) == [30001, 30002]
+    assert db.refreshes == 1
+
+
+def test_exhaustion_after_refresh_raises_and_rolls_back(nodeports):
+    bitmap, use_db = nodeports
+    bitmap.reset([30000, 30001])
+    db = use_db({30000, 30001})
+    with pytest.raises(ValueError, match="Not enough NodePorts"):
+        _allocate(2)
+    assert db.refreshes == 1
+    assert db.used == {30000, 30001}
+    # rollback한 포트는 다음 요청의 후보로 돌아간다.
+    assert bitmap.take() == 30002
+
+
+def test_duplicate_entry_skips_to_next_candidate(nodeports):
+    bitmap, use_db = nodeports
+    bitmap.reset([])
+    db = use_db({30000, 30001})  # bitmap은 모르는 사이 다른 Pod가 가져감
+    ports = _allocate(1)
+    assert ports[0]["external_port"] == 30002
+    assert db.refreshes == 0
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from pipeline import PipelineError, Stage, map_bounded, run_pipeline
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    with Flask(__name__).app_context():
+        yield
+
+
+def test_run_pipeline_passes_dep_results_and_waits_for_deps():
+    order = []
+    gate = threading.Event()
+
+    def slow(_deps):
+        gate.wait(1)
+        order.append("slow")
+        return "image"
+
+    def fast(_deps):
+        order.append("fast")
+        gate.set()
+        return 1000
+
+    results = run_pipeline([
+        Stage("slow", slow),
+        Stage("fast", fast),
+        Stage("alloc", lambda deps: (deps["slow"], deps["fast"]), deps=("slow", "fast")),
+    ])
+    assert order == ["fast", "slow"]
+    assert results == {"slow": "image", "fast": 1000, "alloc": ("image", 1000)}
+
+
+def test_run_pipeline_rolls_back_completed_stages_in_reverse_and_skips_rest():
+    rolled_back = []
+    started = []
+
+    def boom(_deps):
+        raise ValueError("no gpu")
+
+    with pytest.raises(PipelineError) as exc_info:
+        run_pipeline([
+            Stage("a", lambda deps: "a", rollback=lambda r: rolled_back.append(r)),
+            Stage("b", lambda deps: "b", deps=("a",), rollback=lambda r: rolled_back.append(r)),
+            Stage("c", boom, deps=("b",)),
+            Stage("d", lambda deps: started.append("d"), deps=("c",)),
+        ], max_workers=1)
+
+    e = exc_info.value
+    assert e.stage == "c"
+    assert isinstance(e.cause, ValueError)
+    assert rolled_back == ["b", "a"]
+    assert e.rollback == {"b": True, "a": True}
+    assert started == []
+
+
+def test_run_pipeline_reports_failed_rollback():
+    def bad_rollback(_result):
+        raise RuntimeError("db down")
+
+    def boom(_deps):
+        raise ValueError("fail")
+
+    with pytest.raises(PipelineError) as exc_info:
+        run_pipeline([
+            Stage("alloc", lambda deps: 1, rollback=bad_rollback),
+            Stage("next", boom, deps=("alloc",)),
+        ])
+    assert exc_info.value.rollback == {"alloc": False}
+
+
+def test_run_pipeline_rejects_unknown_deps_and_cycles():
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda deps: 1, deps=("missing",))])
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda deps: 1, deps=("b",)), Stage("b", lambda deps: 1, deps=("a",))])
+
+
+def test_map_bounded_keeps_input_order_and_isolates_failures():
+    def fn(x):
+        if x == 2:
+            raise ValueError("bad")
+        return x * 10
+
+    out = map_bounded(fn, [1, 2, 3], max_workers=2)
+    assert [(item, result) for item, result, _ in out] == [(1, 10), (2, None), (3, 30)]
+    assert isinstance(out[1][2], ValueError)
+    assert map_bounded(fn, [], max_workers=2) == []
+
+
+def test_map_bounded_deadline_returns_timeout_for_unfinished_items():
+    release = threading.Event()
+
+    def fn(x):
+        if x == "slow":
+            release.wait(5)
+        return x
+
+    started = time.monotonic()
+    try:
+        out = map_bounded(fn, ["fast", "slow"], max_workers=2, deadline_sec=0.2)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert out[0] == ("fast", "fast", None)
+    assert out[1][0] == "slow" and out[1][1] is None
+    assert isinstance(out[1][2], TimeoutError)
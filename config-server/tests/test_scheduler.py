@@ -0,0 +1,112 @@
+import math
+
+import pytest
+from kubernetes import client
+
+import scheduler
+import warm_pool
+from scheduler import NodeState
+
+
+def _pod(node, gpus=(), cpu="1", memory="1Gi", phase="Running", labels=None):
+    volumes = [
+        client.V1Volume(name=f"nvidia{i}", host_path=client.V1HostPathVolumeSource(path=f"/dev/nvidia{i}"))
+        for i in gpus
+    ]
+    container = client.V1Container(
+        name="shell",
+        resources=client.V1ResourceRequirements(requests={"cpu": cpu, "memory": memory}),
+    )
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(name=f"pod-{node}-{'-'.join(map(str, gpus))}", labels=labels or {}),
+        spec=client.V1PodSpec(node_name=node, containers=[container], volumes=volumes),
+        status=client.V1PodStatus(phase=phase),
+    )
+
+
+def _standby(node, key, gpus=(0,)):
+    return _pod(node, gpus, labels={warm_pool.STATE_LABEL: warm_pool.STATE_STANDBY, warm_pool.PROFILE_LABEL: key})
+
+
+def test_fits_checks_gpu_cpu_memory_and_passes_unknown_totals():
+    state = NodeState("n1", gpu_total=4, gpu_committed=3, cpu_allocatable=8, cpu_committed=6,
+                      mem_allocatable=16, mem_committed=8)
+    assert scheduler.fits(state, 1, 2, 8)
+    assert not scheduler.fits(state, 2, 0, 0)
+    assert not scheduler.fits(state, 0, 3, 0)
+    assert not scheduler.fits(state, 0, 0, 9)
+    assert scheduler.fits(NodeState("n2", gpu_committed=100), 8, 100, 100)
+
+
+def test_pod_commitments_skips_finished_pods():
+    committed = scheduler.pod_commitments([
+        _pod("GPU1", gpus=(0, 1), cpu="500m", memory="1Gi"),
+        _pod("gpu1", gpus=(2,), phase="Succeeded"),
+    ])
+    assert committed == {"gpu1": {"gpu": 2, "cpu": 0.5, "memory": float(2 ** 30)}}
+
+
+def test_pod_commitments_counts_one_matching_standby_as_reusable():
+    pods = [_standby("gpu1", "abc", (0,)), _standby("gpu1", "abc", (1,)), _standby("gpu2", "other", (0,))]
+    committed = scheduler.pod_commitments(pods, {"gpu1": "abc", "gpu2": "abc"})
+    assert committed["gpu1"]["gpu"] == 1
+    assert committed["gpu2"]["gpu"] == 1
+    assert scheduler.pod_commitments(pods)["gpu1"]["gpu"] == 2
+
+
+def test_standby_pod_does_not_block_a_request_that_can_claim_it():
+    pods = [_standby("gpu1", "abc", (0, 1))]
+    for reusable, expected in (({"gpu1": "abc"}, "gpu1"), (None, None)):
+        states = scheduler.build_node_states(
+            ["gpu1"], {"gpu1": 0.1}, {"gpu1": 2}, {}, scheduler.pod_commitments(pods, reusable),
+        )
+        assert scheduler.choose(["gpu1"], states, {"gpu1": 2}, 0, 0, "score") == expected
+
+
+def _states():
+    return {
+        "a": NodeState("a", score=0.5, gpu_total=8, gpu_committed=2),
+        "b": NodeState("b", score=0.2, gpu_total=4, gpu_committed=3),
+        "c": NodeState("c", score=0.9, gpu_total=2, gpu_committed=2),
+    }
+
+
+@pytest.mark.parametrize("policy, expected", [("score", "b"), ("spread", "a"), ("pack", "b")])
+def test_choose_applies_capacity_filter_then_policy(policy, expected):
+    nodes = ["a", "b", "c"]
+    assert scheduler.choose(nodes, _states(), {n: 1 for n in nodes}, 0, 0, policy) == expected
+
+
+def test_choose_without_capacity_filter_keeps_full_nodes():
+    nodes = ["a", "b", "c"]
+    assert scheduler.choose(nodes, _states(), {n: 2 for n in nodes}, 0, 0, "pack") == "a"
+    assert scheduler.choose(nodes, _states(), {n: 2 for n in nodes}, 0, 0, "pack", capacity_filter=False) == "c"
+
+
+def test_policy_ties_break_by_score_then_candidate_order():
+    states = {
+        "a": NodeState("a", score=0.3, gpu_total=4),
+        "b": NodeState("b", score=0.1, gpu_total=4),
+        "c": NodeState("c", score=0.1, gpu_total=4),
+    }
+    assert scheduler.policy_spread(["a", "c", "b"], states, {}) == "c"
+    assert scheduler.policy_pack(["a", "b", "c"], states, {}) == "b"
+
+
+def test_policies_handle_empty_candidates_and_unknown_scores():
+    for policy in scheduler.POLICIES.values():
+        assert policy([], {}, {}) is None
+    states = {"a": NodeState("a", score=math.inf), "b": NodeState("b", score=math.inf)}
+    assert scheduler.policy_score(["a", "b"], states, {}) is None
+    assert scheduler.policy_spread(["a", "b"], states, {}) == "a"
+
+
+def test_choose_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        scheduler.choose(["a"], _states(), {}, 0, 0, "random")
+
+
+def test_migration_target():
+    assert scheduler.migration_target(1.0, {}, 0.2) == (None, math.inf, False)
+    assert scheduler.migration_target(1.0, {"a": 0.9, "b": 0.7}, 0.2) == ("b", 0.7, True)
+    assert scheduler.migration_target(1.0, {"a": 0.9}, 0.2) == ("a", 0.9, False)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import simulator
+
+TWO_NODES = {"nodes": {"n1": {"gpus": 2}, "n2": {"gpus": 2}}}
+
+
+def _create(t, user, gpus=1, **extra):
+    return {"t": t, "op": "create", "user": user, "gpus": gpus, **extra}
+
+
+def test_queued_create_waits_until_gpus_are_freed():
+    events = [
+        _create(0, "alice", gpus=2),
+        _create(0, "bob", gpus=1),
+        {"t": 60, "op": "delete", "user": "alice"},
+    ]
+    report = simulator.simulate(events, {"nodes": {"n1": {"gpus": 2}}})
+    assert report["pods"] == {"created": 2, "abandoned": 0, "rejected": 0, "still_queued": 0}
+    assert report["queue_wait_sec"]["max"] == 60
+
+
+def test_duplicate_create_is_rejected_and_delete_abandons_queued_request():
+    events = [
+        _create(0, "alice", gpus=2),
+        _create(0, "alice", gpus=1),
+        _create(0, "bob", gpus=2),
+        {"t": 30, "op": "delete", "user": "bob"},
+    ]
+    report = simulator.simulate(events, {"nodes": {"n1": {"gpus": 2}}})
+    assert report["pods"] == {"created": 1, "abandoned": 1, "rejected": 1, "still_queued": 0}
+
+
+def test_pack_keeps_a_whole_node_free_where_spread_fragments():
+    events = [_create(0, "a"), _create(0, "b"), _create(15, "c", gpus=2)]
+    pack = simulator.simulate(events, TWO_NODES, policy="pack")
+    spread = simulator.simulate(events, TWO_NODES, policy="spread")
+    assert pack["pods"]["created"] == 3
+    assert spread["pods"]["created"] == 2
+    assert spread["pods"]["still_queued"] == 1
+    assert spread["fragmentation"]["blocked_steps"] > 0
+
+
+def test_migrate_moves_only_when_improvement_is_large_enough():
+    events = [
+        _create(0, "alice", nodes=["n1"], util=95, duty=1.0),
+        _create(0, "bob", nodes=["n1"], util=95, duty=1.0),
+        {"t": 600, "op": "migrate", "user": "alice", "nodes": ["n1", "n2"], "min_improvement_ratio": 5},
+        {"t": 615, "op": "migrate", "user": "alice", "nodes": ["n1", "n2"]},
+        {"t": 630, "op": "migrate", "user": "carol"},
+    ]
+    migrations = simulator.simulate(events, TWO_NODES, window_sec=300)["migrations"]
+    assert migrations["requested"] == 3
+    assert migrations["no_improvement"] == 1
+    assert migrations["performed"] == 1
+    assert migrations["not_running"] == 1
+
+
+def test_same_seed_gives_same_report():
+    events = [_create(0, "a", duty=0.5), _create(30, "b"), {"t": 300, "op": "delete", "user": "a"}]
+    assert simulator.simulate(events, TWO_NODES, seed=3) == simulator.simulate(events, TWO_NODES, seed=3)
+
+
+def test_load_policy_accepts_builtin_and_module_function_names():
+    assert simulator.load_policy("pack") is simulator.scheduler.policy_pack
+    assert simulator.load_policy("scheduler:policy_spread") is simulator.scheduler.policy_spread
+    with pytest.raises(ValueError):
+        simulator.load_policy("nope")
+
+
+def test_main_prints_one_report_per_policy(tmp_path, capsys):
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text("\n".join(json.dumps(e) for e in [_create(0, "a"), _create(0, "b")]) + "\n")
+    cluster = tmp_path / "cluster.json"
+    cluster.write_text(json.dumps(TWO_NODES))
+    assert simulator.main([str(trace), str(cluster), "--policy", "pack", "--policy", "spread"]) == 0
+    reports = json.loads(capsys.readouterr().out)
+    assert [r["policy"] for r in reports] == ["pack", "spread"]
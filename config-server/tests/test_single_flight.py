@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+import redis
+
+import single_flight
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(single_flight, "r", fake)
+    return fake
+
+
+def test_first_caller_leads_and_follower_gets_published_result(fake):
+    flight, result = single_flight.lead_or_join("alice", wait_sec=1)
+    assert flight is not None and flight.locked and result is None
+    try:
+        flight.publish({"status_code": 201, "body": {"pod_name": "ailab-alice-1"}})
+        follower, result = single_flight.lead_or_join("alice", wait_sec=1, poll_sec=0.01)
+    finally:
+        flight.release()
+    assert follower is None
+    assert result == {"status_code": 201, "body": {"pod_name": "ailab-alice-1"}}
+    assert fake.get(single_flight._lock_key("alice")) is None
+
+
+def test_follower_times_out_while_leader_is_still_running(fake):
+    flight, _ = single_flight.lead_or_join("alice", wait_sec=1)
+    try:
+        started = time.monotonic()
+        assert single_flight.lead_or_join("alice", wait_sec=0.1, poll_sec=0.02) == (None, None)
+        assert time.monotonic() - started < 1
+    finally:
+        flight.release()
+
+
+def test_follower_takes_over_when_leader_lock_expires_without_result(fake):
+    flight, _ = single_flight.lead_or_join("alice", wait_sec=1)
+    flight._stop.set()  # leader worker가 죽어 heartbeat가 멈춘 상황
+    # TTL 만료를 흉내 내 follower가 기다리는 동안 lock을 지운다.
+    timer = threading.Timer(0.05, fake.expire_now, args=(single_flight._lock_key("alice"),))
+    timer.start()
+    try:
+        takeover, result = single_flight.lead_or_join("alice", wait_sec=1, poll_sec=0.01)
+    finally:
+        timer.cancel()
+    assert result is None
+    assert takeover is not None and takeover.locked
+    assert fake.get(single_flight._lock_key("alice")) == takeover.flight_id
+    takeover.release()
+
+
+def test_release_does_not_delete_a_lock_owned_by_another_flight(fake):
+    flight, _ = single_flight.lead_or_join("alice", wait_sec=1)
+    fake.set(single_flight._lock_key("alice"), "other")
+    flight.release()
+    assert fake.get(single_flight._lock_key("alice")) == "other"
+
+
+def test_heartbeat_renews_lock_until_released(fake, monkeypatch):
+    monkeypatch.setattr(single_flight, "LOCK_TTL_SEC", 0.06)
+    renewals = []
+    original_eval = fake.eval
+
+    def eval_spy(script, *args):
+        if "expire" in script:
+            renewals.append(args)
+        return original_eval(script, *args)
+
+    monkeypatch.setattr(fake, "eval", eval_spy)
+    flight, _ = single_flight.lead_or_join("alice", wait_sec=1)
+    time.sleep(0.1)
+    flight.release()
+    count = len(renewals)
+    assert count >= 2
+    time.sleep(0.06)
+    assert len(renewals) == count
+
+
+def test_heartbeat_stops_when_lock_was_lost(fake, monkeypatch):
+    monkeypatch.setattr(single_flight, "LOCK_TTL_SEC", 0.06)
+    flight, _ = single_flight.lead_or_join("alice", wait_sec=1)
+    heartbeat = next(t for t in threading.enumerate() if t.name == "single-flight-alice")
+    fake.expire_now(single_flight._lock_key("alice"))
+    # renew가 0을 돌려주면 release() 없이도 heartbeat thread가 끝나고 lock을 다시 만들지 않는다.
+    heartbeat.join(0.5)
+    assert not heartbeat.is_alive()
+    assert fake.get(single_flight._lock_key("alice")) is None
+    flight.release()
+
+
+def test_redis_error_runs_without_coalescing(fake, monkeypatch):
+    def broken(*args, **kwargs):
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(fake, "set", broken)
+    flight, result = single_flight.lead_or_join("alice", wait_sec=1)
+    assert result is None
+    assert flight is not None and not flight.locked
+    flight.publish({"status_code": 201})
+    flight.release()
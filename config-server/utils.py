@@ -5,7 +5,7 @@ import fcntl
 import time
 import pymysql
 import threading
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 
 from datetime import datetime
@@ -13,26 +13,204 @@ from kubernetes import client, config as k8s_config
 from kubernetes.stream import stream
 from flask import current_app as app
 from bg_img_redis import save_image_metadata, get_image_metadata
+from pymysql.constants import SERVER_STATUS
+from metrics import track_outbound, TrackedCursor, DB_POOL_WAIT, DB_POOL_IN_USE, DB_POOL_EVENTS
+from pipeline import map_bounded
 
 DEFAULT_BASE_ETC_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "base_etc")
 
-def get_db_connection():
-    try:
-        app.logger.debug("Creating DB connection")
+# MySQL connection pool 설정 (gunicorn worker 프로세스마다 pool 하나)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "10"))
+# 이 시간보다 오래 쉬었던 연결만 checkout 시 ping한다 (0이면 매번)
+DB_POOL_PING_IDLE_SEC = float(os.getenv("DB_POOL_PING_IDLE_SEC", "5"))
+# MySQL wait_timeout(기본 8시간)과 중간 장비의 idle 끊김보다 짧게
+DB_POOL_MAX_LIFETIME_SEC = float(os.getenv("DB_POOL_MAX_LIFETIME_SEC", "1800"))
+
+
+class PooledConnection:
+    """
+    pool에서 빌린 pymysql 연결. close()하면 연결을 끊지 않고 pool에 돌려준다.
+    나머지 속성(cursor, commit, rollback 등)은 원래 연결로 넘긴다.
+    """
+
+    def __init__(self, pool: "MySQLPool", conn, created_at: float):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise pymysql.err.InterfaceError("connection already returned to pool")
+        return getattr(conn, name)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._put(conn, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MySQLPool:
+    """
+    thread-safe pymysql connection pool.
+
+    - 동시에 빌려 갈 수 있는 연결은 max_size개이다. 모두 빌려 갔으면 timeout_sec까지 기다린다.
+      쉬는 연결이 없을 때만 새로 연결하므로 열린 연결 수도 max_size를 넘지 않는다.
+    - 첫 checkout 때 min_size개를 미리 연결해 둔다.
+    - checkout 시 ping_idle_sec보다 오래 쉬었던 연결은 ping으로 확인하고, 죽었으면 새로 연결한다.
+    - max_lifetime_sec가 지난 연결은 돌려받을 때 닫는다.
+    - 돌려받을 때 열린 transaction이 있으면 rollback한다. rollback이 실패한 연결은 버린다.
+    - fork된 자식 프로세스는 부모의 소켓을 쓰지 않고 자기 pool을 새로 만든다 (get_db_connection의 pid 확인).
+    """
+
+    def __init__(self, connect, min_size: int, max_size: int, timeout_sec: float,
+                 ping_idle_sec: float, max_lifetime_sec: float):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout_sec = timeout_sec
+        self.ping_idle_sec = ping_idle_sec
+        self.max_lifetime_sec = max_lifetime_sec
+        self._idle = []  # [(conn, created_at, returned_at)], 마지막에 돌려받은 연결부터 다시 쓴다
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._warmed = False
+
+    def _new(self):
+        conn = self._connect()
+        DB_POOL_EVENTS.labels("created").inc()
+        return conn, time.monotonic()
+
+    def _discard(self, conn, reason: str) -> None:
+        DB_POOL_EVENTS.labels(f"discarded_{reason}").inc()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _warm(self) -> None:
+        # 첫 checkout 때 min_size까지 미리 연결해 둔다 (실패해도 요청은 계속 진행).
+        with self._lock:
+            if self._warmed:
+                return
+            self._warmed = True
+        for _ in range(min(self.min_size, self.max_size)):
+            try:
+                conn, created_at = self._new()
+            except Exception:
+                app.logger.warning("[DB POOL] warm-up connect failed", exc_info=True)
+                return
+            with self._lock:
+                self._idle.append((conn, created_at, time.monotonic()))
+
+    def get(self) -> PooledConnection:
+        if not self._warmed:
+            self._warm()
+
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout_sec):
+            DB_POOL_EVENTS.labels("timeout").inc()
+            raise RuntimeError(f"mysql pool exhausted (max_size={self.max_size}, waited {self.timeout_sec}s)")
+        DB_POOL_WAIT.observe(time.perf_counter() - started)
 
-        conn = pymysql.connect(
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    conn, created_at = self._new()
+                    break
+                conn, created_at, returned_at = entry
+                now = time.monotonic()
+                if now - created_at > self.max_lifetime_sec:
+                    self._discard(conn, "expired")
+                    continue
+                if now - returned_at >= self.ping_idle_sec:
+                    try:
+                        conn.ping(reconnect=False)
+                    except Exception:
+                        self._discard(conn, "ping_failed")
+                        continue
+                DB_POOL_EVENTS.labels("reused").inc()
+                break
+        except Exception:
+            self._slots.release()
+            raise
+
+        DB_POOL_IN_USE.inc()
+        return PooledConnection(self, conn, created_at)
+
+    def _put(self, conn, created_at: float) -> None:
+        try:
+            if time.monotonic() - created_at > self.max_lifetime_sec:
+                self._discard(conn, "expired")
+                return
+            if conn.get_autocommit() is False and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._discard(conn, "rollback_failed")
+                    return
+            with self._lock:
+                self._idle.append((conn, created_at, time.monotonic()))
+        finally:
+            DB_POOL_IN_USE.dec()
+            self._slots.release()
+
+
+def _connect_mysql():
+    with track_outbound("mysql"):
+        return pymysql.connect(
             host=os.environ["DB_HOST"],
             user=os.environ["DB_USER"],
             password=os.environ["DB_PASSWORD"],
             database=os.environ["DB_NAME"],
-            autocommit=False
+            autocommit=False,
+            cursorclass=TrackedCursor,
         )
 
-        app.logger.debug("DB connection established")
-        return conn
 
+_db_pool: Optional[MySQLPool] = None
+_db_pool_pid: Optional[int] = None
+_db_pool_lock = threading.Lock()
+
+
+def _get_db_pool() -> MySQLPool:
+    global _db_pool, _db_pool_pid
+    pid = os.getpid()
+    if _db_pool is None or _db_pool_pid != pid:
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool_pid != pid:
+                # fork 전에 만든 pool은 부모와 소켓을 공유하므로 닫지 않고(부모 연결을 끊지 않도록) 버린다.
+                _db_pool = MySQLPool(
+                    _connect_mysql,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout_sec=DB_POOL_TIMEOUT_SEC,
+                    ping_idle_sec=DB_POOL_PING_IDLE_SEC,
+                    max_lifetime_sec=DB_POOL_MAX_LIFETIME_SEC,
+                )
+                _db_pool_pid = pid
+    return _db_pool
+
+
+def get_db_connection():
+    """
+    pool에서 MySQL 연결을 빌린다. 호출자는 지금처럼 conn.close()로 돌려준다.
+    autocommit=False 연결이므로 쓰기 후에는 commit()해야 한다 (돌려받을 때 열린 transaction은 rollback).
+    """
+    try:
+        return _get_db_pool().get()
     except Exception:
-        app.logger.exception("Failed to create DB connection")
+        app.logger.exception("Failed to get DB connection")
         raise
     
 def load_k8s():
@@ -114,6 +292,8 @@ def get_existing_pod(namespace, username):
             f"[POD CHECK] found pod={pod.metadata.name} phase={pod.status.phase}"
         )
 
+        if pod.metadata.deletion_timestamp:
+            continue  # 종료 중인 Pod는 재사용 대상이 아님
         if pod.status.phase == "Running":
             app.logger.info(f"[POD CHECK] running pod detected: {pod.metadata.name}")
             return pod.metadata.name
@@ -221,8 +401,87 @@ def create_nodeport_services(username: str, namespace: str, pod_name: str, extra
             raise
 
 
+def create_gateway_routes(
+    username: str,
+    namespace: str,
+    pod_name: str,
+    jupyter_host: str,
+    ingress_class: str,
+    tls_secret: str = "",
+):
+    """
+    gateway 모드에서 SSH/Jupyter용 ClusterIP Service와 Jupyter Ingress를 만든다 (NodePort를 쓰지 않음).
+
+    - SSH는 공용 ContainerSSH가 /config webhook으로 username의 Pod에 붙으므로 Service는 cluster 안 접근용이다.
+    - Jupyter는 공용 ingress controller가 host(<username>.<도메인>)로 이 Service에 보낸다.
+    - 두 리소스 모두 Pod를 ownerReference로 가지므로 Pod가 지워지면 Kubernetes GC가 함께 지운다.
+    """
+    app.logger.info(f"[GATEWAY CREATE] username={username} pod={pod_name} host={jupyter_host}")
+
+    load_k8s()
+    v1 = client.CoreV1Api()
+    pod = v1.read_namespaced_pod(pod_name, namespace)
+    owner = [client.V1OwnerReference(
+        api_version="v1", kind="Pod", name=pod_name, uid=pod.metadata.uid,
+    )]
+    labels = {"app": "ailab-gateway", "username": username, "pod_name": pod_name}
+    service_name = f"{pod_name}-gw"
+
+    service_body = client.V1Service(
+        metadata=client.V1ObjectMeta(
+            name=service_name, namespace=namespace, labels=labels, owner_references=owner,
+        ),
+        spec=client.V1ServiceSpec(
+            type="ClusterIP",
+            selector={"pod_name": pod_name},
+            ports=[
+                client.V1ServicePort(name="ssh", protocol="TCP", port=22, target_port=22),
+                client.V1ServicePort(name="jupyter", protocol="TCP", port=8888, target_port=8888),
+            ],
+        ),
+    )
+    ingress_body = client.V1Ingress(
+        metadata=client.V1ObjectMeta(
+            name=service_name, namespace=namespace, labels=labels, owner_references=owner,
+        ),
+        spec=client.V1IngressSpec(
+            ingress_class_name=ingress_class,
+            tls=[client.V1IngressTLS(hosts=[jupyter_host], secret_name=tls_secret)] if tls_secret else None,
+            rules=[client.V1IngressRule(
+                host=jupyter_host,
+                http=client.V1HTTPIngressRuleValue(paths=[client.V1HTTPIngressPath(
+                    path="/",
+                    path_type="Prefix",
+                    backend=client.V1IngressBackend(service=client.V1IngressServiceBackend(
+                        name=service_name, port=client.V1ServiceBackendPort(number=8888),
+                    )),
+                )]),
+            )],
+        ),
+    )
+
+    net_v1 = client.NetworkingV1Api()
+    try:
+        # create_nodeport_services()와 같이 기존 리소스가 있으면 삭제 후 재생성
+        for delete in (v1.delete_namespaced_service, net_v1.delete_namespaced_ingress):
+            try:
+                delete(service_name, namespace)
+            except client.exceptions.ApiException as e:
+                if e.status != 404:
+                    raise
+        v1.create_namespaced_service(namespace, service_body)
+        net_v1.create_namespaced_ingress(namespace, ingress_body)
+        app.logger.info(f"[GATEWAY CREATE] created service/ingress {service_name} host={jupyter_host}")
+    except Exception:
+        app.logger.exception(f"[GATEWAY CREATE] failed for {service_name}")
+        raise
+
+
 def delete_nodeport_services(pod_name: str, namespace: str):
-    """사용자 Pod 삭제 시 관련 NodePort Service도 모두 삭제"""
+    """
+    사용자 Pod 삭제 시 관련 NodePort Service와 gateway ClusterIP Service도 모두 삭제.
+    gateway Ingress는 Pod ownerReference로 Pod 삭제 후 GC가 지운다.
+    """
     app.logger.info(f"[SERVICE DELETE] pod={pod_name}")
     load_k8s()
     v1 = client.CoreV1Api()
@@ -231,7 +490,7 @@ def delete_nodeport_services(pod_name: str, namespace: str):
         # username 라벨로 모든 관련 Service 조회
         services = v1.list_namespaced_service(
             namespace=namespace,
-            label_selector=f"pod_name={pod_name},app=ailab-nodeport"
+            label_selector=f"pod_name={pod_name},app in (ailab-nodeport,ailab-gateway)"
         )
 
         app.logger.debug(
@@ -311,6 +570,40 @@ def commit_and_save_user_image(username, pod_name, namespace):
         return False
 
 
+def exec_in_pod(pod_name: str, namespace: str, command: List[str], container: str = "shell", timeout_sec: int = 120) -> str:
+    """
+    Pod 안에서 command를 실행하고 stdout을 반환한다. exit code가 0이 아니면 RuntimeError.
+    """
+    load_k8s()
+    v1 = client.CoreV1Api()
+
+    resp = stream(
+        v1.connect_get_namespaced_pod_exec,
+        pod_name,
+        namespace,
+        command=command,
+        container=container,
+        stderr=True,
+        stdin=False,
+        stdout=True,
+        tty=False,
+        _preload_content=False,
+    )
+    try:
+        resp.run_forever(timeout=timeout_sec)
+        stdout = resp.read_stdout() or ""
+        stderr = resp.read_stderr() or ""
+        returncode = resp.returncode
+    finally:
+        resp.close()
+
+    if returncode != 0:
+        raise RuntimeError(
+            f"exec failed in pod {pod_name} (exit {returncode}): {command[-1]}\n{stderr.strip()}"
+        )
+    return stdout
+
+
 # ============================
 #  Group / Volume 관련
 # ============================
@@ -574,15 +867,17 @@ def _nas_ssh_client():
     import paramiko
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(
-        hostname=os.environ["NAS_SSH_HOST"],
-        port=int(os.environ.get("NAS_SSH_PORT", "22")),
-        username=os.environ["NAS_SSH_USER"],
-        key_filename=os.environ["NAS_SSH_KEY_PATH"],
-    )
+    with track_outbound("nas_ssh"):
+        ssh.connect(
+            hostname=os.environ["NAS_SSH_HOST"],
+            port=int(os.environ.get("NAS_SSH_PORT", "22")),
+            username=os.environ["NAS_SSH_USER"],
+            key_filename=os.environ["NAS_SSH_KEY_PATH"],
+        )
     return ssh
 
 
+@track_outbound("nas_ssh")
 def _ssh_run(ssh, cmd: str) -> None:
     _, stdout, stderr = ssh.exec_command(cmd)
     exit_code = stdout.channel.recv_exit_status()
@@ -611,35 +906,298 @@ def delete_user_home_directory(username: str) -> None:
         _ssh_run(ssh, f"sudo rm -rf {path}")
 
 
-def get_node_gpu_score(node: str, prom_url: str, timeout: float) -> float:
+_NVIDIA_DEVICE_RE = re.compile(r"^nvidia(\d+)$")  # dcgm-exporter device 라벨 (= /dev/nvidiaN)
+
+
+def _hostname_selector(nodes: Optional[List[str]]) -> str:
+    """DCGM Hostname label selector. nodes가 None이면 빈 문자열(모든 노드)."""
+    if nodes is None:
+        return ""
+    # Hostname은 정확히 일치해야 하므로 regex 특수문자를 escape하고, PromQL 문자열 안이라 \를 한 번 더 escape한다.
+    pattern = "|".join(re.escape(n) for n in nodes).replace("\\", "\\\\")
+    return f'{{Hostname=~"{pattern}"}}'
+
+
+def gpu_score_rule_name(metric: str, stat: str, window: str, quantile: float) -> str:
     """
-    GPU 사용량 score
-    - 낮을수록 여유 있음
+    NODE_SCORE_RECORDING_RULES가 켜져 있을 때 읽는 recording rule 이름.
+    Chart의 templates/prometheusrule.yaml이 같은 규칙으로 이름을 만든다 (예: ailab:dcgm_fi_dev_gpu_util:q90_5m).
     """
-    import requests
+    tag = "avg" if stat == "avg" else f"q{round(quantile * 100)}"
+    return f"ailab:{metric.lower()}:{tag}_{window}"
 
-    query = f"""
-    (
-      (avg(DCGM_FI_DEV_GPU_UTIL{{Hostname="{node}"}}) or vector(0)) +
-      ((avg(DCGM_FI_DEV_FB_USED{{Hostname="{node}"}}) or vector(0)) / 1024) +
-      ((avg(DCGM_FI_DEV_GPU_TEMP{{Hostname="{node}"}}) or vector(0)) / 100)
+
+def _dcgm_series(metric: str, selector: str) -> str:
+    """
+    score 계산에 쓰는 DCGM series 식. GPU(Hostname, gpu)별 series를 그대로 남긴다.
+
+    NODE_SCORE_WINDOW가 비어 있으면 순간값, 있으면 그 구간의 avg_over_time 또는 quantile_over_time이다
+    (NODE_SCORE_STAT). 학습 step 사이에 잠깐 idle인 노드가 비어 보이지 않도록 지속 부하를 본다.
+    NODE_SCORE_RECORDING_RULES면 같은 값을 미리 계산한 recording rule series를 읽어 range 계산을 Prometheus rule evaluation에 맡긴다.
+    """
+    cfg = app.config
+    window = cfg["NODE_SCORE_WINDOW"]
+    if not window:
+        return f"{metric}{selector}"
+    stat, quantile = cfg["NODE_SCORE_STAT"], cfg["NODE_SCORE_QUANTILE"]
+    if cfg["NODE_SCORE_RECORDING_RULES"]:
+        return f"{gpu_score_rule_name(metric, stat, window, quantile)}{selector}"
+    if stat == "avg":
+        return f"avg_over_time({metric}{selector}[{window}])"
+    return f"quantile_over_time({quantile}, {metric}{selector}[{window}])"
+
+
+def _gpu_score_query(nodes: Optional[List[str]]) -> str:
+    """
+    후보 노드 전체의 GPU score를 Hostname별로 한 번에 계산하는 PromQL. nodes가 None이면 DCGM을 내보내는 모든 노드.
+
+    score = avg(GPU_UTIL) + avg(FB_USED)/1024 + avg(GPU_TEMP)/100 (노드 단위 평균, 각 series는 _dcgm_series())
+    세 항을 label_replace로 term 라벨만 달리해 `or`로 모은 뒤 sum by (Hostname)으로 더한다.
+    `+`로 바로 더하면 한 metric이라도 없는 노드가 결과에서 빠지므로, 노드별 쿼리의 `or vector(0)`처럼
+    없는 항은 0으로 취급되도록 이렇게 합친다.
+    """
+    selector = _hostname_selector(nodes)
+    util = _dcgm_series("DCGM_FI_DEV_GPU_UTIL", selector)
+    fb = _dcgm_series("DCGM_FI_DEV_FB_USED", selector)
+    temp = _dcgm_series("DCGM_FI_DEV_GPU_TEMP", selector)
+    return f"""
+    sum by (Hostname) (
+        label_replace(avg by (Hostname) ({util}), "term", "util", "", "")
+      or
+        label_replace(avg by (Hostname) ({fb}) / 1024, "term", "fb", "", "")
+      or
+        label_replace(avg by (Hostname) ({temp}) / 100, "term", "temp", "", "")
     )
     """
 
-    try:
+
+def query_gpu_scores(nodes: Optional[List[str]], prom_url: str, timeout: float) -> Dict[str, float]:
+    """
+    GPU score PromQL을 실행해 결과에 있는 Hostname별 score를 반환한다 (metric이 없는 노드는 결과에 없음).
+    조회가 실패하면 예외를 그대로 올린다.
+    """
+    import requests
+
+    with track_outbound("prometheus"):
+        resp = requests.get(
+            f"{prom_url}/api/v1/query",
+            params={"query": _gpu_score_query(nodes)},
+            timeout=timeout
+        )
+        resp.raise_for_status()
+    result = resp.json()["data"]["result"]
+
+    by_host = {}
+    for sample in result:
+        host = sample["metric"].get("Hostname")
+        try:
+            by_host[host] = float(sample["value"][1])
+        except (KeyError, IndexError, TypeError, ValueError):
+            app.logger.warning(f"[GPU SCORE] unparsable sample for Hostname={host}: {sample}")
+            by_host[host] = float("inf")
+    return by_host
+
+
+def query_gpu_counts(nodes: Optional[List[str]], prom_url: str, timeout: float) -> Dict[str, int]:
+    """DCGM이 보고하는 노드별 GPU 개수 {Hostname: 개수}. 조회가 실패하면 예외를 그대로 올린다."""
+    import requests
+
+    with track_outbound("prometheus"):
         resp = requests.get(
             f"{prom_url}/api/v1/query",
-            params={"query": query},
+            params={"query": f"count by (Hostname) (DCGM_FI_DEV_GPU_UTIL{_hostname_selector(nodes)})"},
             timeout=timeout
         )
         resp.raise_for_status()
-        result = resp.json()["data"]["result"]
-        if not result:
-            return float("inf")
-        return float(result[0]["value"][1])
+    return {
+        sample["metric"].get("Hostname"): int(float(sample["value"][1]))
+        for sample in resp.json()["data"]["result"]
+    }
+
+
+def _query_by_device(node: str, query: str, prom_url: str, timeout: float) -> Dict[int, float]:
+    """
+    device 라벨로 묶인 PromQL 결과를 {/dev/nvidiaN의 N: 값}으로 바꾼다.
+    dcgm-exporter의 device 라벨(nvidiaN)을 쓴다. gpu 라벨은 NVML index라서 CUDA_VISIBLE_DEVICES나 MIG 구성에 따라
+    device minor 번호와 다를 수 있다. 조회가 실패하면 예외를 그대로 올린다.
+    """
+    import requests
+
+    with track_outbound("prometheus"):
+        resp = requests.get(f"{prom_url}/api/v1/query", params={"query": query}, timeout=timeout)
+        resp.raise_for_status()
+
+    values = {}
+    for sample in resp.json()["data"]["result"]:
+        m = _NVIDIA_DEVICE_RE.match(sample["metric"].get("device") or "")
+        try:
+            values[int(m.group(1))] = float(sample["value"][1])
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+            app.logger.warning(f"[GPU DEVICE] unparsable sample for node={node}: {sample}")
+    return values
+
+
+def query_gpu_device_loads(node: str, prom_url: str, timeout: float) -> Dict[int, float]:
+    """
+    한 노드의 GPU별 load {gpu index: load}. index는 /dev/nvidiaN의 N이다 (_query_by_device).
+
+    load는 노드 score와 같은 식(GPU_UTIL + FB_USED/1024 + GPU_TEMP/100, 같은 NODE_SCORE_WINDOW 통계)을 GPU마다 계산한 값이다.
+    결과의 key가 곧 DCGM이 보고하는 GPU 전체이므로 GPU 개수도 여기서 알 수 있다. 조회가 실패하면 예외를 그대로 올린다.
+    """
+    selector = _hostname_selector([node])
+    query = f"""
+    sum by (device) (
+        label_replace({_dcgm_series("DCGM_FI_DEV_GPU_UTIL", selector)}, "term", "util", "", "")
+      or
+        label_replace({_dcgm_series("DCGM_FI_DEV_FB_USED", selector)} / 1024, "term", "fb", "", "")
+      or
+        label_replace({_dcgm_series("DCGM_FI_DEV_GPU_TEMP", selector)} / 100, "term", "temp", "", "")
+    )
+    """
+    return _query_by_device(node, query, prom_url, timeout)
+
+
+def query_gpu_util_max(node: str, window_sec: int, prom_url: str, timeout: float) -> Dict[int, float]:
+    """한 노드의 GPU별 window_sec 동안 DCGM_FI_DEV_GPU_UTIL 최댓값 {gpu index: util}. index는 /dev/nvidiaN의 N이다."""
+    selector = _hostname_selector([node])
+    query = f"max by (device) (max_over_time(DCGM_FI_DEV_GPU_UTIL{selector}[{window_sec}s]))"
+    return _query_by_device(node, query, prom_url, timeout)
+
+
+def prom_url_for(node: str) -> str:
+    """node의 DCGM metric을 가진 Prometheus URL. PROM_URL_TEMPLATE(노드별 federation 등)이 없으면 PROM_URL."""
+    template = app.config["PROM_URL_TEMPLATE"]
+    return template.format(node=node) if template else app.config["PROM_URL"]
+
+
+def query_gpu_stats(node: str, prom_url: str, timeout: float) -> Tuple[float, Optional[int]]:
+    """
+    한 노드의 (GPU score, DCGM GPU 개수)를 PromQL 한 번으로 조회한다.
+    score 식(_gpu_score_query)과 count by (Hostname)을 kind 라벨로 구분해 `or`로 합친다.
+    metric이 없으면 (0.0, None). 조회가 실패하면 예외를 그대로 올린다.
+    """
+    import requests
+
+    selector = _hostname_selector([node])
+    query = f"""
+    label_replace({_gpu_score_query([node])}, "kind", "score", "", "")
+    or
+    label_replace(count by (Hostname) (DCGM_FI_DEV_GPU_UTIL{selector}), "kind", "count", "", "")
+    """
+    with track_outbound("prometheus"):
+        resp = requests.get(f"{prom_url}/api/v1/query", params={"query": query}, timeout=timeout)
+        resp.raise_for_status()
+
+    score, count = 0.0, None
+    for sample in resp.json()["data"]["result"]:
+        kind = sample["metric"].get("kind")
+        try:
+            value = float(sample["value"][1])
+        except (KeyError, IndexError, TypeError, ValueError):
+            app.logger.warning(f"[GPU SCORE] unparsable sample for node={node}: {sample}")
+            if kind == "score":
+                score = float("inf")
+            continue
+        if kind == "score":
+            score = value
+        elif kind == "count":
+            count = int(value)
+    return score, count
+
+
+def query_gpu_stats_per_node(
+    nodes: List[str], timeout: float, deadline_sec: float
+) -> Dict[str, Tuple[float, Optional[int]]]:
+    """
+    노드마다 prom_url_for(node)에 query_gpu_stats()를 따로 조회한다. 한 번에 조회할 수 없을 때(NODE_SCORE_QUERY_MODE=per_node) 쓴다.
+
+    pipeline.map_bounded()로 NODE_SCORE_PARALLELISM개씩 동시에 조회하고, deadline_sec 전체 기한 안에 답하지 않은 노드와
+    조회가 실패한 노드는 (inf, None)(모름)으로 둔다. 그래서 후보 노드 수와 관계없이 대략 timeout 한 번 안에 끝난다.
+    답한 노드의 GPU 개수는 node_scores에 남겨 GPU device 할당이 cache처럼 쓸 수 있게 한다.
+    """
+    import node_scores
+
+    per_request_timeout = min(timeout, deadline_sec)
+    results = map_bounded(
+        lambda node: query_gpu_stats(node, prom_url_for(node), per_request_timeout),
+        nodes,
+        app.config["NODE_SCORE_PARALLELISM"],
+        deadline_sec=deadline_sec,
+    )
+    stats, answered, late = {}, {}, []
+    for node, result, err in results:
+        if err is None:
+            stats[node] = result
+            answered[node] = result[1]
+        else:
+            stats[node] = (float("inf"), None)
+            if isinstance(err, TimeoutError):
+                late.append(node)
+            else:
+                app.logger.warning(f"[GPU SCORE] per-node query failed node={node}: {err}")
+    if late:
+        app.logger.warning(f"[GPU SCORE] per-node query deadline {deadline_sec}s exceeded, unknown nodes={sorted(late)}")
+    node_scores.observe_gpu_counts(answered)
+    return stats
+
+
+def get_node_gpu_stats(
+    nodes: List[str], prom_url: str, timeout: float
+) -> Tuple[Dict[str, float], Optional[Dict[str, Optional[int]]]]:
+    """
+    (scores, GPU 개수). NODE_SCORE_QUERY_MODE=per_node면 같은 노드별 조회 한 번(query_gpu_stats_per_node)으로
+    score와 GPU 개수를 함께 얻는다. batch 모드의 GPU 개수는 None이고, 호출하는 쪽이 cache나 query_gpu_counts()로 구한다.
+    """
+    nodes = list(dict.fromkeys(nodes))
+    if app.config["NODE_SCORE_QUERY_MODE"] != "per_node" or not nodes:
+        return get_node_gpu_scores(nodes, prom_url, timeout), None
+    stats = query_gpu_stats_per_node(nodes, timeout, app.config["NODE_SCORE_DEADLINE_SEC"])
+    app.logger.debug(f"[GPU SCORE] per-node stats={stats}")
+    return {node: score for node, (score, _) in stats.items()}, {node: count for node, (_, count) in stats.items()}
+
+
+def get_node_gpu_scores(nodes: List[str], prom_url: str, timeout: float) -> Dict[str, float]:
+    """
+    여러 노드의 GPU 사용량 score.
+    - 낮을수록 여유 있음
+    - node_scores cache가 NODE_SCORE_MAX_AGE_SEC 안에 갱신됐으면 cache에서 읽고(네트워크 없음),
+      아니면 PromQL 한 번으로 직접 조회한다.
+    - NODE_SCORE_QUERY_MODE=per_node면 한 번에 조회하지 않고 query_gpu_stats_per_node()로 노드마다 동시에,
+      NODE_SCORE_DEADLINE_SEC 안에 조회한다 (기한 안에 답하지 않은 노드는 inf).
+    - DCGM metric이 하나도 없는 노드는 0.0 (노드별 쿼리의 `or vector(0)`과 같음)
+    - 조회가 실패하면 모든 노드가 inf
+    """
+    import node_scores
+
+    nodes = list(dict.fromkeys(nodes))
+    if not nodes:
+        return {}
+
+    cached = node_scores.lookup(nodes, app.config["NODE_SCORE_MAX_AGE_SEC"])
+    if cached is not None:
+        app.logger.debug(f"[GPU SCORE] cached scores={cached}")
+        return cached
+
+    if app.config["NODE_SCORE_QUERY_MODE"] == "per_node":
+        return get_node_gpu_stats(nodes, prom_url, timeout)[0]
+
+    try:
+        by_host = query_gpu_scores(nodes, prom_url, timeout)
     except Exception as e:
-        app.logger.warning(f"[GPU SCORE] failed for node={node}: {e}")
-        return float("inf")
+        app.logger.warning(f"[GPU SCORE] batch query failed for nodes={nodes}: {e}")
+        return {node: float("inf") for node in nodes}
+
+    scores = {node: by_host.get(node, 0.0) for node in nodes}
+    app.logger.debug(f"[GPU SCORE] scores={scores}")
+    return scores
+
+
+def get_node_gpu_score(node: str, prom_url: str, timeout: float) -> float:
+    """
+    GPU 사용량 score
+    - 낮을수록 여유 있음
+    """
+    return get_node_gpu_scores([node], prom_url, timeout)[node]
 
 
 def select_best_node_from_prometheus(node_list: List[str], prom_url: str, timeout: float):
@@ -653,33 +1211,16 @@ def select_best_node_from_prometheus(node_list: List[str], prom_url: str, timeou
     Returns:
         str: Name of the best node, or None if all queries fail
     """
-    import requests
+    app.logger.debug(f"Starting Prometheus node selection for nodes: {node_list}")
+
+    scores = get_node_gpu_scores(node_list, prom_url, timeout)
 
     best_node = None
     best_score = float("inf")
-
-    app.logger.debug(f"Starting Prometheus node selection for nodes: {node_list}")
-
     for node in node_list:
-        query = f"""
-        (
-          (avg(DCGM_FI_DEV_GPU_UTIL{{Hostname="{node}"}}) or vector(0)) +
-          ((avg(DCGM_FI_DEV_FB_USED{{Hostname="{node}"}}) or vector(0)) / 1024) +
-          ((avg(DCGM_FI_DEV_GPU_TEMP{{Hostname="{node}"}}) or vector(0)) / 100)
-        )
-        """
-        try:
-            app.logger.debug(f"Querying Prometheus for node {node}")
-            response = requests.get(f"{prom_url}/api/v1/query", params={"query": query}, timeout=timeout)
-            prom_result = response.json()
-            value = float(prom_result["data"]["result"][0]["value"][1])
-            app.logger.debug(f"Node {node} score: {value}")
-        except Exception as e:
-            app.logger.debug(f"Failed to query node {node}: {e}")
-            value = float("inf")
-
-        if value < best_score:
-            best_score = value
+        # 점수가 같으면 node_list 앞쪽 노드를 고른다 (기존 순차 조회와 같음)
+        if scores[node] < best_score:
+            best_score = scores[node]
             best_node = node
 
     app.logger.debug(f"Best node selected: {best_node} with score: {best_score}")
@@ -0,0 +1,114 @@
+"""
+warm standby Pod pool 상태 관리.
+
+- profile: 같은 standby Pod를 재사용할 수 있는 조건 묶음 (node, image, GPU 수, CPU/메모리 limit).
+  Pod env/volume/resource는 생성 후 바꿀 수 없으므로 profile이 같은 요청만 standby Pod를 가져갈 수 있다.
+- 수요(demand): /create-pod가 profile별로 Redis sorted set에 기록하고, refill 작업이 최근 window의
+  요청 수로 profile별 목표 standby 수를 정한다.
+- claim: standby Pod의 라벨을 resourceVersion 조건부 patch로 바꿔 여러 gunicorn worker 중 하나만 가져가게 한다.
+"""
+import hashlib
+import json
+import math
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from kubernetes import client
+
+from redis_client import r
+
+PROFILE_LABEL = "pool-profile"
+STATE_LABEL = "pool-state"
+PROFILE_ANNOTATION = "ailab.dgu/pool-profile"
+
+STATE_STANDBY = "standby"
+STATE_CLAIMED = "claimed"
+
+_PROFILES_KEY = "warm_pool:profiles"
+
+
+def _demand_key(key: str) -> str:
+    return f"warm_pool:demand:{key}"
+
+
+def pool_profile(node: str, image: str, num_gpu: int, cpu_limit: str, memory_limit: str) -> dict:
+    return {
+        "node": node,
+        "image": image,
+        "num_gpu": int(num_gpu),
+        "cpu_limit": str(cpu_limit),
+        "memory_limit": str(memory_limit),
+    }
+
+
+def profile_key(profile: dict) -> str:
+    raw = json.dumps(profile, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def record_demand(profile: dict) -> None:
+    """profile에 대한 Pod 생성 요청 1건을 기록한다. Redis 장애는 Pod 생성을 막지 않는다."""
+    key = profile_key(profile)
+    try:
+        pipe = r.pipeline()
+        pipe.hset(_PROFILES_KEY, key, json.dumps(profile, sort_keys=True))
+        pipe.zadd(_demand_key(key), {uuid.uuid4().hex: time.time()})
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def demand_count(key: str, window_sec: float) -> int:
+    """최근 window_sec 동안의 요청 수. window 밖의 기록은 이때 정리한다."""
+    dkey = _demand_key(key)
+    r.zremrangebyscore(dkey, "-inf", time.time() - window_sec)
+    return int(r.zcard(dkey))
+
+
+def target_size(demand: int, factor: float, min_size: int, max_size: int) -> int:
+    return max(min_size, min(max_size, math.ceil(demand * factor)))
+
+
+def known_profiles() -> Dict[str, dict]:
+    return {k: json.loads(v) for k, v in r.hgetall(_PROFILES_KEY).items()}
+
+
+def forget_profile(key: str) -> None:
+    r.hdel(_PROFILES_KEY, key)
+    r.delete(_demand_key(key))
+
+
+def list_pool_pods(v1, namespace: str, key: Optional[str] = None) -> List:
+    selector = f"{STATE_LABEL}={STATE_STANDBY}"
+    if key:
+        selector += f",{PROFILE_LABEL}={key}"
+    return v1.list_namespaced_pod(namespace=namespace, label_selector=selector).items
+
+
+def claim_standby_pod(v1, namespace: str, key: str, username: str, is_ready) -> Optional[str]:
+    """
+    profile의 Ready standby Pod 하나를 username 소유로 바꾼다.
+
+    라벨 patch에 읽은 시점의 resourceVersion을 넣어, 다른 worker가 먼저 바꾼 Pod는 409로 실패하게 한다.
+
+    Returns:
+        가져온 Pod 이름, 없으면 None
+    """
+    pods = [p for p in list_pool_pods(v1, namespace, key) if is_ready(p)]
+    pods.sort(key=lambda p: p.metadata.creation_timestamp)
+    for pod in pods:
+        body = {
+            "metadata": {
+                "resourceVersion": pod.metadata.resource_version,
+                "labels": {STATE_LABEL: STATE_CLAIMED, "username": username},
+            }
+        }
+        try:
+            v1.patch_namespaced_pod(pod.metadata.name, namespace, body)
+            return pod.metadata.name
+        except client.exceptions.ApiException as e:
+            if e.status in (404, 409):
+                continue
+            raise
+    return None